@@ -0,0 +1,4 @@
+"""
+VokaFlow Benchmarks
+Micro-benchmarks reproducibles de los subsistemas del backend
+"""
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Evaluación de la identificación de idioma
+Exactitud global, por idioma y por longitud del texto, calibración de la
+confianza (ECE) y latencia por llamada del identificador de n-gramas frente a
+la detección por patrones, sobre un corpus local de prueba (<idioma>.txt)
+
+Uso:
+    python -m src.backend.benchmarks.language_id_benchmark --profiles /opt/vokaflow/models/langid/ngram_profiles.npz --corpus-dir corpus/test --output langid.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+from src.backend.services.language_id import NgramLanguageIdentifier, read_corpus
+
+LENGTH_BUCKETS = [(0, 10), (11, 25), (26, 60), (61, 10**9)]
+LENGTH_LABELS = [f"{low}-{high}" if high < 10**9 else f">{low - 1}" for low, high in LENGTH_BUCKETS]
+
+def length_bucket(text: str) -> str:
+    for (low, high), label in zip(LENGTH_BUCKETS, LENGTH_LABELS):
+        if low <= len(text) <= high:
+            return label
+    return LENGTH_LABELS[-1]
+
+def expected_calibration_error(confidences: List[float], hits: List[bool], bins: int = 10) -> float:
+    """Diferencia media ponderada entre confianza y exactitud por tramos de confianza"""
+    total, error = len(confidences), 0.0
+    for b in range(bins):
+        low, high = b / bins, (b + 1) / bins
+        members = [i for i, c in enumerate(confidences) if low < c <= high or (b == 0 and c == 0)]
+        if members:
+            accuracy = sum(hits[i] for i in members) / len(members)
+            confidence = sum(confidences[i] for i in members) / len(members)
+            error += len(members) / total * abs(accuracy - confidence)
+    return error
+
+def evaluate(detect: Callable[[str], Tuple[str, float]], samples: List[Tuple[str, str]]) -> Dict[str, Any]:
+    latencies, confidences, hits = [], [], []
+    per_language: Dict[str, List[bool]] = {}
+    per_length: Dict[str, List[bool]] = {}
+    for lang, text in samples:
+        start = time.perf_counter()
+        detected, confidence = detect(text)
+        latencies.append(time.perf_counter() - start)
+        hit = detected == lang
+        confidences.append(confidence)
+        hits.append(hit)
+        per_language.setdefault(lang, []).append(hit)
+        per_length.setdefault(length_bucket(text), []).append(hit)
+
+    latencies.sort()
+    return {
+        "accuracy": round(sum(hits) / len(hits), 4),
+        "accuracy_by_language": {lang: round(sum(h) / len(h), 4) for lang, h in sorted(per_language.items())},
+        "accuracy_by_length": {
+            label: round(sum(per_length[label]) / len(per_length[label]), 4) for label in LENGTH_LABELS if label in per_length
+        },
+        "mean_confidence": round(statistics.mean(confidences), 4),
+        "ece": round(expected_calibration_error(confidences, hits), 4),
+        "latency_us": {
+            "p50": round(latencies[len(latencies) // 2] * 1e6, 1),
+            "p99": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6, 1)
+        }
+    }
+
+def run(profiles: str, corpus_dir: str, max_lines: int, baseline: bool) -> Dict[str, Any]:
+    identifier = NgramLanguageIdentifier.from_file(profiles)
+    corpus = read_corpus(corpus_dir, max_lines)
+    samples = [(lang, text) for lang, texts in corpus.items() for text in texts]
+    languages = tuple(sorted(corpus))
+
+    results = {"ngram": evaluate(lambda text: identifier.identify(text), samples)}
+    if baseline:
+        # Referencia: la detección por patrones de TranslationService (solo conoce algunos idiomas)
+        from src.backend.services.translation_service import translation_service
+        results["patterns"] = evaluate(translation_service._detect_language_patterns, samples)
+
+    return {
+        "benchmark": "language_identification",
+        "timestamp": datetime.now().isoformat(),
+        "profiles": profiles,
+        "profile_languages": len(identifier.languages),
+        "buckets": identifier.weights.shape[0],
+        "test_languages": list(languages),
+        "samples": len(samples),
+        "unknown_languages": [lang for lang in languages if lang not in identifier.languages],
+        "detectors": results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluación de la identificación de idioma por n-gramas")
+    parser.add_argument("--profiles", default="/opt/vokaflow/models/langid/ngram_profiles.npz")
+    parser.add_argument("--corpus-dir", required=True, help="Directorio con un <idioma>.txt por idioma")
+    parser.add_argument("--max-lines", type=int, default=0, help="Frases por idioma (0 = todas)")
+    parser.add_argument("--no-baseline", action="store_true", help="No comparar con la detección por patrones")
+    parser.add_argument("--output", help="Ruta del informe JSON")
+    args = parser.parse_args()
+
+    report = run(args.profiles, args.corpus_dir, args.max_lines, not args.no_baseline)
+    for name, stats in report["detectors"].items():
+        by_length = "  ".join(f"{bucket}: {acc:.3f}" for bucket, acc in stats["accuracy_by_length"].items())
+        print(f"{name:>8}: exactitud {stats['accuracy']:.4f}  ECE {stats['ece']:.4f}  "
+              f"p50 {stats['latency_us']['p50']:8.1f} µs  p99 {stats['latency_us']['p99']:8.1f} µs  [{by_length}]")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
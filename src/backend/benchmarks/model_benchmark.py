@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Benchmark de carga e inferencia de modelos (solo CPU)
+Para cada familia de ModelManager mide la carga en frío (pesos fuera de la page
+cache), la carga en caliente, la latencia de la primera inferencia y el
+throughput estable con varios tamaños de lote
+
+Sin los pesos reales en --models-dir se generan checkpoints diminutos con
+pesos aleatorios (mismas clases y mismos loaders, resultados comparables solo
+entre ejecuciones de este mismo modo)
+
+Uso:
+    python -m src.backend.benchmarks.model_benchmark --models-dir /opt/vokaflow/models --batch-sizes 1,4,8 --output models.json
+    python -m src.backend.benchmarks.model_benchmark --tiny --output models_tiny.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import torch
+
+from src.backend.benchmarks.nllb_cpu_benchmark import SENTENCES
+from src.backend.services.model_manager import WEIGHT_FILE_SUFFIXES, ModelManager, measure_model_bytes
+
+TEXTS = [text for _, _, text, _ in SENTENCES]
+SAMPLE_RATE = 16000
+
+def evict_from_page_cache(paths: List[Path]) -> int:
+    """Saca de la page cache los ficheros de pesos (sin root: posix_fadvise DONTNEED); devuelve bytes"""
+    evicted = 0
+    for root in paths:
+        if not root.exists():
+            continue
+        files = [root] if root.is_file() else [f for f in root.rglob("*") if f.is_file()]
+        for file_path in files:
+            fd = os.open(file_path, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+                evicted += os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+    return evicted
+
+def has_weights(path: Path) -> bool:
+    return path.is_dir() and any(f.suffix in WEIGHT_FILE_SUFFIXES for f in path.rglob("*"))
+
+# --- Checkpoints diminutos con pesos aleatorios -----------------------------------
+
+def build_tiny_translation(path: Path):
+    import sentencepiece as spm
+    from transformers import M2M100Config, M2M100ForConditionalGeneration, NllbTokenizer
+
+    path.mkdir(parents=True, exist_ok=True)
+    spm.SentencePieceTrainer.train(
+        sentence_iterator=iter(TEXTS + [reference for _, _, _, reference in SENTENCES]),
+        model_prefix=str(path / "sentencepiece.bpe"), vocab_size=200, model_type="bpe",
+        character_coverage=1.0, hard_vocab_limit=False
+    )
+    tokenizer = NllbTokenizer(vocab_file=str(path / "sentencepiece.bpe.model"))
+    tokenizer.save_pretrained(str(path))
+    config = M2M100Config(
+        vocab_size=len(tokenizer), d_model=64, encoder_layers=2, decoder_layers=2,
+        encoder_attention_heads=4, decoder_attention_heads=4, encoder_ffn_dim=128, decoder_ffn_dim=128,
+        max_position_embeddings=256, pad_token_id=tokenizer.pad_token_id, bos_token_id=tokenizer.bos_token_id,
+        eos_token_id=tokenizer.eos_token_id, decoder_start_token_id=tokenizer.eos_token_id
+    )
+    M2M100ForConditionalGeneration(config).save_pretrained(str(path))
+
+def build_tiny_stt(path: Path):
+    from transformers import (WhisperConfig, WhisperFeatureExtractor, WhisperForConditionalGeneration,
+                              WhisperProcessor, WhisperTokenizer)
+    from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
+
+    path.mkdir(parents=True, exist_ok=True)
+    specials = ["<|endoftext|>", "<|startoftranscript|>", "<|transcribe|>", "<|notimestamps|>"]
+    vocab = {token: index for index, token in enumerate(list(bytes_to_unicode().values()) + specials)}
+    (path / "vocab.json").write_text(json.dumps(vocab))
+    (path / "merges.txt").write_text("#version: 0.2\n")
+    tokenizer = WhisperTokenizer(
+        str(path / "vocab.json"), str(path / "merges.txt"),
+        unk_token="<|endoftext|>", bos_token="<|endoftext|>", eos_token="<|endoftext|>", pad_token="<|endoftext|>"
+    )
+    WhisperProcessor(feature_extractor=WhisperFeatureExtractor(), tokenizer=tokenizer).save_pretrained(str(path))
+
+    eot, sot = vocab["<|endoftext|>"], vocab["<|startoftranscript|>"]
+    config = WhisperConfig(
+        vocab_size=len(vocab), d_model=64, encoder_layers=2, decoder_layers=2,
+        encoder_attention_heads=4, decoder_attention_heads=4, encoder_ffn_dim=128, decoder_ffn_dim=128,
+        max_target_positions=64, pad_token_id=eot, bos_token_id=eot, eos_token_id=eot,
+        decoder_start_token_id=sot, begin_suppress_tokens=None, suppress_tokens=None
+    )
+    model = WhisperForConditionalGeneration(config)
+    model.generation_config.is_multilingual = False  # Sin tabla de idiomas: no detectar idioma
+    model.generation_config.no_timestamps_token_id = vocab["<|notimestamps|>"]
+    model.save_pretrained(str(path))
+
+def build_tiny_embeddings(path: Path):
+    from transformers import BertConfig, BertModel, BertTokenizer
+
+    path.mkdir(parents=True, exist_ok=True)
+    characters = sorted({char for text in TEXTS for char in text.lower() if not char.isspace()})
+    (path / "vocab.txt").write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + characters) + "\n")
+    tokenizer = BertTokenizer(str(path / "vocab.txt"))
+    tokenizer.save_pretrained(str(path))
+    config = BertConfig(
+        vocab_size=len(tokenizer), hidden_size=64, num_hidden_layers=2, num_attention_heads=4,
+        intermediate_size=128, max_position_embeddings=256
+    )
+    BertModel(config).save_pretrained(str(path))
+
+TINY_BUILDERS: Dict[str, Callable[[Path], None]] = {
+    "translation": build_tiny_translation,
+    "stt": build_tiny_stt,
+    "embeddings": build_tiny_embeddings
+    # XTTS no tiene una configuración aleatoria pequeña razonable: solo con checkpoint real
+}
+
+# --- Cargas de trabajo por familia (mismas llamadas que los servicios) -------------
+
+def infer_translation(model_info, batch_size: int, max_new_tokens: int):
+    tokenizer = model_info.tokenizer
+    tokenizer.src_lang = "spa_Latn"
+    texts = [TEXTS[i % len(TEXTS)] for i in range(batch_size)]
+    inputs = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=256)
+    with torch.no_grad():
+        model_info.model.generate(
+            **inputs,
+            forced_bos_token_id=tokenizer.convert_tokens_to_ids("eng_Latn"),
+            max_new_tokens=max_new_tokens,
+            num_beams=4,
+            early_stopping=True
+        )
+
+def infer_stt(model_info, batch_size: int, max_new_tokens: int):
+    rng = np.random.default_rng(0)
+    clips = [(rng.standard_normal(SAMPLE_RATE * 5) * 0.1).astype(np.float32) for _ in range(batch_size)]
+    features = model_info.processor(clips, sampling_rate=SAMPLE_RATE, return_tensors="pt").input_features
+    with torch.no_grad():
+        model_info.model.generate(features, max_new_tokens=max_new_tokens)
+
+def infer_embeddings(model_info, batch_size: int, max_new_tokens: int):
+    texts = [TEXTS[i % len(TEXTS)] for i in range(batch_size)]
+    model_info.model.encode(texts, batch_size=batch_size)
+
+def make_infer_tts(speaker_wav: Optional[str]):
+    def infer_tts(model_info, batch_size: int, max_new_tokens: int):
+        # XTTS no procesa lotes: el tamaño de lote son llamadas secuenciales
+        for i in range(batch_size):
+            model_info.model.tts(text=TEXTS[i % len(TEXTS)], speaker_wav=speaker_wav, language="es")
+    return infer_tts
+
+# --- Medición ------------------------------------------------------------------------
+
+def timed(func: Callable, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def bench_family(manager: ModelManager, name: str, path: Path, infer: Optional[Callable],
+                 batch_sizes: List[int], repeats: int, iterations: int, max_new_tokens: int) -> Dict[str, Any]:
+    config = manager.model_configs[name]
+    loader = {
+        "translation": manager._load_translation_model,
+        "stt": manager._load_stt_model,
+        "tts": manager._load_tts_model,
+        "embeddings": manager._load_embeddings_model
+    }[config["type"]]
+    cached_paths = [path, manager.converted_dir]
+
+    def load():
+        start = time.perf_counter()
+        info = loader(name, path, config)
+        return info, time.perf_counter() - start
+
+    # Primera carga del proceso: incluye imports perezosos y conversiones que luego se cachean
+    evict_from_page_cache(cached_paths)
+    model_info, first_load = load()
+    if model_info.model is None:
+        return {"status": "skipped", "reason": "el loader devolvió un modelo simulado (dependencia ausente)"}
+    result: Dict[str, Any] = {
+        "status": "ok",
+        "type": config["type"],
+        "inference_mode": (model_info.config or {}).get("inference_mode"),
+        "weights_bytes": measure_model_bytes(model_info.model) or model_info.size_bytes,
+        "first_load_seconds": round(first_load, 3)
+    }
+    if infer is not None:
+        result["first_inference_ms"] = round(timed(infer, model_info, 1, max_new_tokens) * 1000, 1)
+
+    cold, warm = [], []
+    evicted_bytes = 0
+    for _ in range(repeats):
+        del model_info
+        gc.collect()
+        evicted_bytes = evict_from_page_cache(cached_paths)
+        model_info, seconds = load()
+        cold.append(seconds)
+        del model_info
+        gc.collect()
+        model_info, seconds = load()
+        warm.append(seconds)
+    result["cold_load_seconds"] = {"median": round(statistics.median(cold), 3), "runs": [round(s, 3) for s in cold]}
+    result["warm_load_seconds"] = {"median": round(statistics.median(warm), 3), "runs": [round(s, 3) for s in warm]}
+    result["evicted_bytes"] = evicted_bytes
+
+    if infer is not None:
+        throughput = {}
+        for batch_size in batch_sizes:
+            infer(model_info, batch_size, max_new_tokens)  # calentamiento con esta forma
+            latencies = [timed(infer, model_info, batch_size, max_new_tokens) for _ in range(iterations)]
+            throughput[str(batch_size)] = {
+                "latency_ms_median": round(statistics.median(latencies) * 1000, 1),
+                "items_per_second": round(batch_size * len(latencies) / sum(latencies), 2)
+            }
+        result["throughput"] = throughput
+    return result
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+def run(models_dir: str, families: List[str], batch_sizes: List[int], repeats: int, iterations: int,
+        max_new_tokens: int, tiny: bool, threads: int, speaker_wav: Optional[str]) -> Dict[str, Any]:
+    if threads:
+        torch.set_num_threads(threads)
+    torch.cuda.is_available = lambda: False  # Solo CPU aunque haya GPU
+    torch.manual_seed(0)
+
+    tiny_dir = Path(tempfile.mkdtemp(prefix="vokaflow-tiny-models-"))
+    real_manager = ModelManager(models_dir)
+    tiny_manager = ModelManager(str(tiny_dir))
+    tiny_manager.converted_dir = tiny_dir / ".converted"
+
+    inferences = {
+        "translation": infer_translation,
+        "stt": infer_stt,
+        "tts": make_infer_tts(speaker_wav) if speaker_wav else None,
+        "embeddings": infer_embeddings
+    }
+
+    results = {}
+    for name, config in real_manager.model_configs.items():
+        family = config["type"]
+        if families and family not in families:
+            continue
+        manager = real_manager
+        path = real_manager.models_dir / config["path"]
+        if tiny or not has_weights(path):
+            if family not in TINY_BUILDERS:
+                results[name] = {"status": "skipped", "reason": "sin checkpoint local ni configuración diminuta"}
+                continue
+            manager = tiny_manager
+            path = tiny_dir / config["path"]
+            try:
+                TINY_BUILDERS[family](path)
+            except ImportError as e:
+                results[name] = {"status": "skipped", "reason": f"dependencia ausente: {e}"}
+                continue
+        print(f"⏱️  {name} ({'tiny' if manager is tiny_manager else 'real'})...")
+        try:
+            results[name] = {
+                "checkpoint": "tiny" if manager is tiny_manager else "real",
+                **bench_family(manager, name, path, inferences[family], batch_sizes, repeats, iterations, max_new_tokens)
+            }
+        except Exception as e:
+            results[name] = {"status": "error", "error": f"{type(e).__name__}: {e}"}
+
+    return {
+        "benchmark": "model_load_and_inference",
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "torch_version": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "batch_sizes": batch_sizes,
+        "repeats": repeats,
+        "iterations": iterations,
+        "max_new_tokens": max_new_tokens,
+        "models": results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga e inferencia de modelos en CPU")
+    parser.add_argument("--models-dir", default="/opt/vokaflow/models")
+    parser.add_argument("--families", default="", help="translation,stt,tts,embeddings (vacío = todas)")
+    parser.add_argument("--batch-sizes", default="1,4,8")
+    parser.add_argument("--repeats", type=int, default=3, help="Ciclos de carga fría + caliente")
+    parser.add_argument("--iterations", type=int, default=5, help="Llamadas medidas por tamaño de lote")
+    parser.add_argument("--max-new-tokens", type=int, default=32)
+    parser.add_argument("--tiny", action="store_true", help="Usar siempre checkpoints diminutos aleatorios")
+    parser.add_argument("--threads", type=int, default=0, help="Hilos de torch (0 = por defecto)")
+    parser.add_argument("--speaker-wav", help="Audio de referencia para inferencia XTTS")
+    parser.add_argument("--output", help="Ruta del informe JSON")
+    args = parser.parse_args()
+
+    report = run(
+        args.models_dir, [f for f in args.families.split(",") if f], [int(b) for b in args.batch_sizes.split(",")],
+        args.repeats, args.iterations, args.max_new_tokens, args.tiny, args.threads, args.speaker_wav
+    )
+    for name, stats in report["models"].items():
+        if stats.get("status") != "ok":
+            print(f"{name:>18}: {stats.get('status')} ({stats.get('reason') or stats.get('error')})")
+            continue
+        line = (f"{name:>18}: frío {stats['cold_load_seconds']['median']:6.2f}s  "
+                f"caliente {stats['warm_load_seconds']['median']:6.2f}s")
+        if "first_inference_ms" in stats:
+            line += f"  1ª inferencia {stats['first_inference_ms']:7.1f}ms"
+        for batch_size, entry in stats.get("throughput", {}).items():
+            line += f"  b{batch_size}: {entry['items_per_second']:.1f}/s"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Benchmark de inferencia NLLB en CPU (fp32 / int8 / ONNX)
+Latencia por frase, frases/s, memoria de pesos y calidad (chrF) frente a las
+referencias y frente a la salida fp32, sobre un conjunto fijo de frases locales
+
+Uso:
+    python -m src.backend.benchmarks.nllb_cpu_benchmark --models-dir /opt/vokaflow/models --modes fp32,int8,onnx --output nllb_cpu.json
+"""
+
+import argparse
+import json
+import statistics
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+import torch
+
+from src.backend.services.model_manager import ModelManager, measure_model_bytes
+
+MODEL_NAME = "nllb-3.3b"
+
+# (origen, destino, texto, referencia): frases cortas y medias del dominio de VokaFlow
+SENTENCES: List[Tuple[str, str, str, str]] = [
+    ("spa_Latn", "eng_Latn", "Hola, ¿cómo estás?", "Hello, how are you?"),
+    ("spa_Latn", "eng_Latn", "Nos vemos mañana en la oficina.", "See you tomorrow at the office."),
+    ("spa_Latn", "eng_Latn", "¿Dónde está la estación de tren más cercana?", "Where is the nearest train station?"),
+    ("spa_Latn", "eng_Latn", "La reunión se ha aplazado hasta el próximo lunes.", "The meeting has been postponed until next Monday."),
+    ("spa_Latn", "eng_Latn", "Necesito ayuda para configurar mi cuenta.", "I need help setting up my account."),
+    ("spa_Latn", "eng_Latn", "El pedido llegará en un plazo de tres a cinco días laborables.",
+     "The order will arrive within three to five business days."),
+    ("spa_Latn", "eng_Latn", "Por favor, habla más despacio; no entiendo bien el inglés.",
+     "Please speak more slowly; I don't understand English well."),
+    ("spa_Latn", "eng_Latn", "La calidad del audio ha mejorado mucho con la última actualización.",
+     "The audio quality has improved a lot with the latest update."),
+    ("spa_Latn", "eng_Latn", "¿Puedes enviarme la factura por correo electrónico?", "Can you send me the invoice by email?"),
+    ("spa_Latn", "eng_Latn", "Hace mucho calor hoy, vamos a la playa.", "It's very hot today, let's go to the beach."),
+    ("eng_Latn", "spa_Latn", "Thank you very much for your help.", "Muchas gracias por tu ayuda."),
+    ("eng_Latn", "spa_Latn", "The flight has been delayed by two hours.", "El vuelo se ha retrasado dos horas."),
+    ("eng_Latn", "spa_Latn", "Could you recommend a good restaurant nearby?", "¿Podrías recomendar un buen restaurante cerca?"),
+    ("eng_Latn", "spa_Latn", "Your subscription will renew automatically next month.",
+     "Tu suscripción se renovará automáticamente el próximo mes."),
+    ("eng_Latn", "spa_Latn", "The doctor will see you in ten minutes.", "El médico te atenderá en diez minutos."),
+    ("eng_Latn", "spa_Latn", "We are working to restore the service as soon as possible.",
+     "Estamos trabajando para restablecer el servicio lo antes posible."),
+    ("eng_Latn", "fra_Latn", "Good morning, I would like a coffee, please.", "Bonjour, je voudrais un café, s'il vous plaît."),
+    ("spa_Latn", "fra_Latn", "El museo abre a las diez de la mañana.", "Le musée ouvre à dix heures du matin."),
+    ("eng_Latn", "deu_Latn", "The train to Berlin leaves from platform four.", "Der Zug nach Berlin fährt von Gleis vier ab."),
+    ("spa_Latn", "ita_Latn", "¿Cuánto cuesta una habitación doble por noche?", "Quanto costa una camera doppia a notte?"),
+]
+
+def chrf(hypothesis: str, reference: str, max_order: int = 6, beta: float = 2.0) -> float:
+    """chrF (F-beta de n-gramas de caracteres, sin espacios) en 0..100"""
+    hyp = hypothesis.replace(" ", "")
+    ref = reference.replace(" ", "")
+    precisions, recalls = [], []
+    for n in range(1, max_order + 1):
+        hyp_ngrams = Counter(hyp[i:i + n] for i in range(len(hyp) - n + 1))
+        ref_ngrams = Counter(ref[i:i + n] for i in range(len(ref) - n + 1))
+        if not hyp_ngrams or not ref_ngrams:
+            continue
+        overlap = sum((hyp_ngrams & ref_ngrams).values())
+        precisions.append(overlap / sum(hyp_ngrams.values()))
+        recalls.append(overlap / sum(ref_ngrams.values()))
+    if not precisions:
+        return 0.0
+    precision = sum(precisions) / len(precisions)
+    recall = sum(recalls) / len(recalls)
+    if precision + recall == 0:
+        return 0.0
+    return 100 * (1 + beta ** 2) * precision * recall / (beta ** 2 * precision + recall)
+
+def translate(model_info, text: str, source_lang: str, target_lang: str, max_length: int = 256) -> str:
+    """Misma configuración de generación que TranslationService._translate_with_nllb"""
+    tokenizer = model_info.tokenizer
+    tokenizer.src_lang = source_lang
+    inputs = tokenizer(text, return_tensors="pt", padding=True, truncation=True, max_length=max_length)
+    with torch.no_grad():
+        outputs = model_info.model.generate(
+            **inputs,
+            forced_bos_token_id=tokenizer.convert_tokens_to_ids(target_lang),
+            max_length=max_length,
+            num_beams=4,
+            early_stopping=True,
+            do_sample=False,
+            repetition_penalty=1.1
+        )
+    return tokenizer.decode(outputs[0], skip_special_tokens=True).strip()
+
+def bench_mode(manager: ModelManager, mode: str, repeats: int) -> Dict[str, Any]:
+    config = {**manager.model_configs[MODEL_NAME], "cpu_inference": mode}
+    path = manager.get_model_path(MODEL_NAME)
+
+    start = time.perf_counter()
+    model_info = manager._load_translation_model(MODEL_NAME, path, config)
+    load_seconds = time.perf_counter() - start
+
+    source_lang, target_lang, text, _ = SENTENCES[0]
+    translate(model_info, text, source_lang, target_lang)  # calentamiento
+    latencies = []
+    outputs = []
+    for source_lang, target_lang, text, _ in SENTENCES:
+        sentence_latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            output = translate(model_info, text, source_lang, target_lang)
+            sentence_latencies.append(time.perf_counter() - start)
+        latencies.append(min(sentence_latencies))
+        outputs.append(output)
+
+    ordered = sorted(latencies)
+    return {
+        "inference_mode": model_info.config.get("inference_mode", mode),
+        "load_seconds": round(load_seconds, 2),
+        "weights_bytes": measure_model_bytes(model_info.model) or model_info.size_bytes,
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 1),
+            "p50": round(ordered[len(ordered) // 2] * 1000, 1),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1)
+        },
+        "sentences_per_second": round(len(latencies) / sum(latencies), 2),
+        "chrf_vs_reference": round(statistics.mean(
+            chrf(output, reference) for output, (_, _, _, reference) in zip(outputs, SENTENCES)
+        ), 2),
+        "outputs": outputs
+    }
+
+def run(models_dir: str, modes: List[str], repeats: int, threads: int) -> Dict[str, Any]:
+    if threads:
+        torch.set_num_threads(threads)
+    # Benchmark de CPU aunque la máquina tenga GPU
+    torch.cuda.is_available = lambda: False
+    manager = ModelManager(models_dir)
+
+    results = {mode: bench_mode(manager, mode, repeats) for mode in modes}
+
+    baseline = results.get("fp32")
+    for mode, stats in results.items():
+        if baseline and mode != "fp32":
+            stats["chrf_vs_fp32"] = round(statistics.mean(
+                chrf(output, reference) for output, reference in zip(stats["outputs"], baseline["outputs"])
+            ), 2)
+            stats["exact_match_vs_fp32"] = round(
+                sum(a == b for a, b in zip(stats["outputs"], baseline["outputs"])) / len(SENTENCES), 3
+            )
+            stats["speedup_vs_fp32"] = round(stats["sentences_per_second"] / baseline["sentences_per_second"], 2)
+            stats["memory_ratio_vs_fp32"] = round(stats["weights_bytes"] / max(baseline["weights_bytes"], 1), 3)
+
+    return {
+        "benchmark": "nllb_cpu_inference",
+        "timestamp": datetime.now().isoformat(),
+        "model": MODEL_NAME,
+        "torch_threads": torch.get_num_threads(),
+        "repeats": repeats,
+        "sentences": len(SENTENCES),
+        "modes": results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de NLLB en CPU: fp32 frente a int8 y ONNX")
+    parser.add_argument("--models-dir", default="/opt/vokaflow/models")
+    parser.add_argument("--modes", default="fp32,int8,onnx")
+    parser.add_argument("--repeats", type=int, default=3, help="Repeticiones por frase (se toma la mejor)")
+    parser.add_argument("--threads", type=int, default=0, help="Hilos de torch (0 = por defecto)")
+    parser.add_argument("--output", help="Ruta del informe JSON")
+    args = parser.parse_args()
+
+    report = run(args.models_dir, args.modes.split(","), args.repeats, args.threads)
+    for mode, stats in report["modes"].items():
+        print(f"{mode:>5}: {stats['sentences_per_second']:6.2f} frases/s  p50 {stats['latency_ms']['p50']:7.1f} ms  "
+              f"{stats['weights_bytes'] / 1024**3:5.2f} GB  chrF {stats['chrf_vs_reference']:5.1f}"
+              + (f"  x{stats['speedup_vs_fp32']} vs fp32, chrF vs fp32 {stats['chrf_vs_fp32']:.1f}"
+                 if "speedup_vs_fp32" in stats else ""))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
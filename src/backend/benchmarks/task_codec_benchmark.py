@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Micro-benchmark de codecs de tareas
+Mide bytes por tarea y ns de encode/decode por tarea para cada codec
+
+Uso:
+    python -m src.backend.benchmarks.task_codec_benchmark --iterations 20000 --output codec.json
+"""
+
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List
+
+from src.backend.core.task_codecs import TaskCodecRegistry, MSGPACK_AVAILABLE
+
+def sample_tasks() -> List[Dict[str, Any]]:
+    """Tareas representativas: sin argumentos, con texto, con kwargs y con datos de reintento/DLQ"""
+    def task(func_name, args, kwargs, **extra):
+        task_id = str(uuid.uuid4())
+        task_dict = {
+            "id": task_id,
+            "name": f"{func_name.rsplit('.', 1)[-1]}_{task_id[:8]}",
+            "func_name": func_name,
+            "args": args,
+            "kwargs": kwargs,
+            "priority": 3,
+            "worker_type": "general_purpose",
+            "max_retries": 3,
+            "timeout": None,
+            "category": "general",
+            "created_at": datetime.now().isoformat()
+        }
+        task_dict.update(extra)
+        return task_dict
+
+    return [
+        task("math.sqrt", [16], {}),
+        task("src.backend.services.translation_service.translate_text",
+             ["Hola, ¿cómo estás? Nos vemos mañana en la oficina."], {"source_lang": "es", "target_lang": "en"}),
+        task("src.backend.services.tts_service.synthesize", [], {
+            "text": "Bienvenido a VokaFlow", "voice": "speaker_es_f01", "speed": 1.0, "format": "wav"
+        }),
+        task("src.backend.services.stt_service.transcribe", ["/tmp/audio_123.wav"], {"language": "auto"},
+             current_retries=2, final_error="Timeout después de 30s", total_retries=2),
+    ]
+
+def bench_codec(registry: TaskCodecRegistry, tasks: List[Dict[str, Any]], iterations: int) -> Dict[str, Any]:
+    encoded = [registry.encode(t) for t in tasks]
+    for original, payload in zip(tasks, encoded):
+        assert registry.decode(payload) == json.loads(json.dumps(original)), "round-trip inexacto"
+
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        for t in tasks:
+            registry.encode(t)
+    encode_ns = (time.perf_counter_ns() - start) / (iterations * len(tasks))
+
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        for payload in encoded:
+            registry.decode(payload)
+    decode_ns = (time.perf_counter_ns() - start) / (iterations * len(tasks))
+
+    sizes = [len(p.encode() if isinstance(p, str) else p) for p in encoded]
+    return {
+        "bytes_per_task": sum(sizes) / len(sizes),
+        "bytes_per_task_by_sample": sizes,
+        "encode_ns_per_task": round(encode_ns, 1),
+        "decode_ns_per_task": round(decode_ns, 1)
+    }
+
+def run(iterations: int) -> Dict[str, Any]:
+    tasks = sample_tasks()
+    codec_names = ["json"] + (["msgpack", "compact"] if MSGPACK_AVAILABLE else [])
+
+    results = {}
+    for codec_name in codec_names:
+        registry = TaskCodecRegistry(codec_name)
+        # Simular funciones ya internadas (el registro real vive en Redis)
+        for i, t in enumerate(tasks, start=1):
+            registry.function_registry._remember(t["func_name"], i)
+        results[codec_name] = bench_codec(registry, tasks, iterations)
+
+    return {
+        "benchmark": "task_codec",
+        "timestamp": datetime.now().isoformat(),
+        "iterations": iterations,
+        "samples": len(tasks),
+        "codecs": results
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark de codecs de tareas VokaFlow")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--output", help="Ruta del informe JSON")
+    args = parser.parse_args()
+
+    report = run(args.iterations)
+    for codec_name, stats in report["codecs"].items():
+        print(f"{codec_name:>8}: {stats['bytes_per_task']:7.1f} B/tarea  "
+              f"encode {stats['encode_ns_per_task']:8.0f} ns  decode {stats['decode_ns_per_task']:8.0f} ns")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
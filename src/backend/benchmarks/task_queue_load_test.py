@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Prueba de carga de la cola de tareas (HighScaleTaskManager)
+Envío en bucle abierto a tasa fija contra un Redis local: tareas/s, latencia de
+dequeue, latencia extremo a extremo (p50/p95/p99) y comandos Redis por tarea
+
+Redis: --redis-url si se indica; si no, un redis-server temporal (si está en el
+PATH) o, en su defecto, el servidor TCP en proceso de fakeredis. Los números con
+fakeredis sirven para comparar commits entre sí, no como cifras de producción.
+
+Uso:
+    python -m src.backend.benchmarks.task_queue_load_test --rates 500,2000 --workers 4,16 --seconds 10 --output run.json
+    python -m src.backend.benchmarks.task_queue_load_test --priority-mix HIGH=1,NORMAL=8,LOW=1 --task-ms 5 --task-distribution exponential
+    python -m src.backend.benchmarks.task_queue_load_test --rates 1000 --baseline base.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis
+import redis.asyncio as aioredis
+from redis.asyncio.connection import AbstractConnection
+
+from src.backend.core.high_scale_task_manager import HighScaleTaskManager, TaskPriority, WorkerType
+from src.backend.core.task_dequeue import DequeueMode
+from src.backend.core.task_results import RESULT_CHANNEL
+
+try:
+    import fakeredis  # noqa: F401 (solo como servidor de reserva en un subproceso)
+    FAKEREDIS_AVAILABLE = True
+except ImportError:
+    FAKEREDIS_AVAILABLE = False
+
+LOAD_TEST_CATEGORY = "loadtest"
+
+# Inicio de cada tarea (time.time() - enviada): los workers GENERAL_PURPOSE son hilos del mismo proceso
+_dequeue_latencies: List[float] = []
+
+def load_task(submitted_at: float, duration_ms: float):
+    """Tarea sintética: registra su espera hasta empezar y ocupa al worker duration_ms"""
+    _dequeue_latencies.append(time.time() - submitted_at)
+    if duration_ms > 0:
+        time.sleep(duration_ms / 1000.0)
+
+# Redis local
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# Servidor fakeredis en su propio proceso: en el mismo intérprete competiría por el GIL con el manager
+FAKEREDIS_SERVER_CODE = """
+import sys
+from fakeredis import TcpFakeServer
+TcpFakeServer(("127.0.0.1", int(sys.argv[1])), server_type="redis").serve_forever()
+"""
+
+@contextmanager
+def local_redis(redis_url: Optional[str] = None):
+    """(url, backend) de un Redis para la prueba; los servidores arrancados aquí se paran al salir"""
+    if redis_url:
+        yield redis_url, "external"
+        return
+
+    port = _free_port()
+    binary = shutil.which("redis-server")
+    if binary:
+        command, backend = [binary, "--port", str(port), "--save", "", "--appendonly", "no"], "redis-server"
+    elif FAKEREDIS_AVAILABLE:
+        command, backend = [sys.executable, "-c", FAKEREDIS_SERVER_CODE, str(port)], "fakeredis"
+    else:
+        raise RuntimeError("Se necesita redis-server en el PATH, fakeredis instalado o --redis-url")
+
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        client = redis.Redis(port=port)
+        for _ in range(200):
+            try:
+                client.ping()
+                break
+            except redis.ConnectionError:
+                time.sleep(0.05)
+        else:
+            raise RuntimeError(f"{backend} no respondió al arrancar")
+        client.close()
+        yield f"redis://127.0.0.1:{port}", backend
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+# Contador de comandos (lado cliente: vale igual para redis-server y para fakeredis)
+
+class CommandCounter:
+    """Comandos y round trips enviados por todas las conexiones asyncio del proceso"""
+
+    def __init__(self):
+        self.commands = 0
+        self.round_trips = 0
+        self._originals = None
+
+    def reset(self):
+        self.commands = 0
+        self.round_trips = 0
+
+    def __enter__(self):
+        counter = self
+        originals = (AbstractConnection.pack_command, AbstractConnection.pack_commands,
+                     AbstractConnection.send_packed_command)
+        pack_command, pack_commands, send_packed_command = originals
+
+        def counted_pack_command(self, *args):
+            counter.commands += 1
+            return pack_command(self, *args)
+
+        def counted_pack_commands(self, commands):
+            commands = list(commands)
+            counter.commands += len(commands)
+            return pack_commands(self, commands)
+
+        async def counted_send_packed_command(self, command, check_health=True):
+            counter.round_trips += 1
+            return await send_packed_command(self, command, check_health)
+
+        AbstractConnection.pack_command = counted_pack_command
+        AbstractConnection.pack_commands = counted_pack_commands
+        AbstractConnection.send_packed_command = counted_send_packed_command
+        self._originals = originals
+        return self
+
+    def __exit__(self, *exc_info):
+        (AbstractConnection.pack_command, AbstractConnection.pack_commands,
+         AbstractConnection.send_packed_command) = self._originals
+
+# Escenarios
+
+def parse_priority_mix(text: str) -> Dict[TaskPriority, float]:
+    """'HIGH=1,NORMAL=8,LOW=1' -> pesos por prioridad"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[TaskPriority[name.strip().upper()]] = float(weight or 1)
+    return mix
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max en milisegundos (rango más cercano)"""
+    if not values:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    ordered = sorted(values)
+
+    def rank(fraction):
+        return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))] * 1000
+
+    return {
+        "p50_ms": round(rank(0.50), 3),
+        "p95_ms": round(rank(0.95), 3),
+        "p99_ms": round(rank(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+async def _collect_completions(redis_url: str, completed: Dict[str, float], ready: asyncio.Event):
+    """Instante en que cada resultado final es visible (publicación en vokaflow:notify:result)"""
+    client = aioredis.from_url(redis_url)
+    pubsub = client.pubsub()
+    await pubsub.subscribe(RESULT_CHANNEL)
+    ready.set()
+    try:
+        async for message in pubsub.listen():
+            if message["type"] == "message":
+                task_id = message["data"]
+                completed.setdefault(task_id.decode() if isinstance(task_id, bytes) else task_id, time.time())
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+async def run_scenario(redis_url: str,
+                       rate: float,
+                       seconds: float,
+                       workers: int,
+                       priority_mix: Dict[TaskPriority, float],
+                       task_ms: float = 0.0,
+                       task_distribution: str = "fixed",
+                       batch_size: int = 1,
+                       dequeue_mode: DequeueMode = DequeueMode.BLOCKING,
+                       task_codec: str = "json",
+                       partition_count: int = 16,
+                       submit_concurrency: int = 4,
+                       drain_timeout: float = 30.0,
+                       seed: int = 42) -> Dict[str, Any]:
+    """Un escenario: manager nuevo, envío a tasa fija durante seconds y espera a que se vacíe"""
+    rng = random.Random(seed)
+    priorities = list(priority_mix)
+    weights = [priority_mix[p] for p in priorities]
+    total = int(rate * seconds)
+
+    flush_client = redis.Redis.from_url(redis_url)
+    flush_client.flushdb()
+    flush_client.close()
+    _dequeue_latencies.clear()
+
+    manager = HighScaleTaskManager(
+        redis_cluster_nodes=[redis_url],
+        max_workers_per_type={
+            worker_type: workers if worker_type == WorkerType.GENERAL_PURPOSE else 1
+            for worker_type in WorkerType
+        },
+        enable_auto_scaling=False,
+        enable_monitoring=False,
+        partition_count=partition_count,
+        dequeue_modes={WorkerType.GENERAL_PURPOSE: dequeue_mode},
+        batch_sizes={WorkerType.GENERAL_PURPOSE: batch_size},
+        task_codec=task_codec,
+        enable_scheduler=False,
+        rate_limits={LOAD_TEST_CATEGORY: max(1, int(rate * 10))}
+    )
+
+    completed: Dict[str, float] = {}
+    listener_ready = asyncio.Event()
+    listener = asyncio.create_task(_collect_completions(redis_url, completed, listener_ready))
+    await listener_ready.wait()
+
+    submitted: Dict[str, Tuple[float, TaskPriority]] = {}
+    rejected = 0
+    # Envíos en vuelo acotados (como un número fijo de handlers de la API): el pool del manager es finito
+    in_flight = asyncio.Semaphore(submit_concurrency)
+
+    async def submit(priority: TaskPriority, duration_ms: float):
+        nonlocal rejected
+        async with in_flight:
+            submitted_at = time.time()
+            try:
+                task_id = await manager.submit_task(
+                    load_task, args=(submitted_at, duration_ms), priority=priority,
+                    worker_type=WorkerType.GENERAL_PURPOSE, category=LOAD_TEST_CATEGORY, max_retries=0
+                )
+            except Exception:
+                rejected += 1
+                return
+            submitted[task_id] = (submitted_at, priority)
+
+    def duration() -> float:
+        if task_distribution == "exponential" and task_ms > 0:
+            return rng.expovariate(1.0 / task_ms)
+        return task_ms
+
+    with CommandCounter() as counter:
+        await manager.initialize()
+        counter.reset()
+
+        # Bucle abierto: el envío i sale en start + i/rate aunque el sistema vaya retrasado
+        start = time.perf_counter()
+        submit_started = time.time()
+        sent = 0
+        while sent < total:
+            due = start + sent / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            batch = []
+            while sent < total and start + sent / rate <= time.perf_counter():
+                batch.append(submit(rng.choices(priorities, weights)[0], duration()))
+                sent += 1
+            await asyncio.gather(*batch)
+        submit_finished = time.time()
+
+        deadline = time.time() + drain_timeout
+        while time.time() < deadline and not all(task_id in completed for task_id in submitted):
+            await asyncio.sleep(0.05)
+        commands, round_trips = counter.commands, counter.round_trips
+
+    await manager.shutdown()
+    listener.cancel()
+    await asyncio.gather(listener, return_exceptions=True)
+
+    done = {task_id: completed[task_id] for task_id in submitted if task_id in completed}
+    end_to_end = [done[task_id] - submitted[task_id][0] for task_id in done]
+    by_priority = {}
+    for priority in priorities:
+        latencies = [done[task_id] - submitted[task_id][0] for task_id in done if submitted[task_id][1] == priority]
+        by_priority[priority.name] = {"completed": len(latencies), **percentiles(latencies)}
+
+    elapsed = (max(done.values()) if done else time.time()) - submit_started
+    return {
+        "submitted": len(submitted),
+        "rejected": rejected,
+        "completed": len(done),
+        "lost": len(submitted) - len(done),
+        "submit_rate": round(len(submitted) / max(submit_finished - submit_started, 1e-9), 1),
+        "tasks_per_second": round(len(done) / max(elapsed, 1e-9), 1),
+        "dequeue_latency": percentiles(list(_dequeue_latencies)),
+        "end_to_end": percentiles(end_to_end),
+        "end_to_end_by_priority": by_priority,
+        "redis_commands_per_task": round(commands / max(len(done), 1), 2),
+        "redis_round_trips_per_task": round(round_trips / max(len(done), 1), 2)
+    }
+
+# Informe
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def scenario_key(scenario: Dict[str, Any]) -> str:
+    return f"rate={scenario['rate']} workers={scenario['workers']}"
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Diferencias de throughput y latencia por escenario común a ambos informes"""
+    base_runs = {scenario_key(run["scenario"]): run["results"] for run in baseline["runs"]}
+    lines = [f"Comparación con {baseline.get('git_commit') or 'baseline'} ({baseline.get('redis_backend')})"]
+    for run in current["runs"]:
+        key = scenario_key(run["scenario"])
+        base = base_runs.get(key)
+        if base is None:
+            continue
+        results = run["results"]
+        lines.append(
+            f"  {key}: tareas/s {base['tasks_per_second']:.0f} -> {results['tasks_per_second']:.0f}  "
+            f"e2e p99 {base['end_to_end']['p99_ms']:.1f} -> {results['end_to_end']['p99_ms']:.1f} ms  "
+            f"cmds/tarea {base['redis_commands_per_task']:.1f} -> {results['redis_commands_per_task']:.1f}"
+        )
+    return lines
+
+async def run(args) -> Dict[str, Any]:
+    priority_mix = parse_priority_mix(args.priority_mix)
+    rates = [float(rate) for rate in args.rates.split(",")]
+    worker_counts = [int(workers) for workers in args.workers.split(",")]
+
+    runs = []
+    with local_redis(args.redis_url) as (redis_url, backend):
+        for rate in rates:
+            for workers in worker_counts:
+                scenario = {
+                    "rate": rate,
+                    "workers": workers,
+                    "seconds": args.seconds,
+                    "priority_mix": {p.name: w for p, w in priority_mix.items()},
+                    "task_ms": args.task_ms,
+                    "task_distribution": args.task_distribution,
+                    "batch_size": args.batch_size,
+                    "dequeue_mode": args.dequeue_mode,
+                    "task_codec": args.codec,
+                    "partitions": args.partitions,
+                    "submit_concurrency": args.submit_concurrency
+                }
+                results = await run_scenario(
+                    redis_url, rate, args.seconds, workers, priority_mix, args.task_ms,
+                    args.task_distribution, args.batch_size, DequeueMode(args.dequeue_mode),
+                    args.codec, args.partitions, args.submit_concurrency, args.drain_timeout, args.seed
+                )
+                runs.append({"scenario": scenario, "results": results})
+                print(f"{scenario_key(scenario):>28}: {results['tasks_per_second']:8.0f} tareas/s  "
+                      f"dequeue p99 {results['dequeue_latency']['p99_ms']:8.1f} ms  "
+                      f"e2e p50/p95/p99 {results['end_to_end']['p50_ms']:.1f}/"
+                      f"{results['end_to_end']['p95_ms']:.1f}/{results['end_to_end']['p99_ms']:.1f} ms  "
+                      f"{results['redis_commands_per_task']:.1f} cmds/tarea  perdidas {results['lost']}")
+
+    return {
+        "benchmark": "task_queue_load",
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "redis_backend": backend,
+        "runs": runs
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la cola de tareas VokaFlow")
+    parser.add_argument("--rates", default="1000", help="Tasas de envío (tareas/s), separadas por comas")
+    parser.add_argument("--workers", default="8", help="Workers GENERAL_PURPOSE, separados por comas")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duración del envío por escenario")
+    parser.add_argument("--priority-mix", default="NORMAL=1", help="Pesos por prioridad, p.ej. HIGH=1,NORMAL=8,LOW=1")
+    parser.add_argument("--task-ms", type=float, default=0.0, help="Duración media de cada tarea (ms)")
+    parser.add_argument("--task-distribution", choices=["fixed", "exponential"], default="fixed")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--dequeue-mode", choices=[mode.value for mode in DequeueMode],
+                        default=DequeueMode.BLOCKING.value)
+    parser.add_argument("--codec", default="json")
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--submit-concurrency", type=int, default=4, help="Envíos simultáneos como máximo")
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="Espera máxima a que terminen las tareas")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--redis-url", help="Redis existente (se vacía con FLUSHDB en cada escenario)")
+    parser.add_argument("--output", help="Ruta del informe JSON")
+    parser.add_argument("--baseline", help="Informe JSON anterior con el que comparar")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(run(args))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            print("\n".join(compare_reports(json.load(f), report)))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
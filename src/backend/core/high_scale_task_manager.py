@@ -30,7 +30,9 @@ import json
 import time
 import uuid
 import hashlib
+import functools
 import redis.asyncio as aioredis
+from redis.asyncio.cluster import RedisCluster, ClusterNode
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Callable, Any, Union, Set
 from enum import Enum, IntEnum
@@ -45,6 +47,48 @@ from collections import defaultdict, deque
 import psutil
 import statistics
 
+from .task_dequeue import (
+    DequeueMode,
+    QueueNotifier,
+    POP_HIGHEST_PRIORITY_LUA,
+    NOTIFY_CHANNEL_PREFIX,
+    polling_pop,
+    blocking_pop,
+    lua_pop
+)
+from .task_partitioning import (
+    PARTITION_MAP_KEY,
+    PartitionMap,
+    queue_key as partition_queue_key,
+    dlq_key as partition_dlq_key,
+    delayed_key as partition_delayed_key,
+    inflight_key as partition_inflight_key,
+    lease_attempts_key as partition_lease_attempts_key,
+    decode_queue_member,
+    queue_score as partition_queue_score,
+    score_enqueued_at,
+    legacy_queue_key,
+    legacy_dlq_key,
+    partition_slot,
+    partition_tag,
+    parse_node_url,
+    move_sorted_set,
+    move_partition_key
+)
+from .task_codecs import TaskCodecRegistry, UnknownFunctionId
+from .task_scheduler import DistributedTaskScheduler, SCHEDULER_NOTIFY_TYPE
+from .task_leases import POP_WITH_LEASE_LUA, REAP_EXPIRED_LEASES_LUA, payload_digest, lease_pop
+from .task_graph import TaskGraphEngine
+from .task_results import TaskResultStore, RESULT_NOTIFY_TYPE
+from .task_dlq import IndexedDeadLetterQueue
+from .task_rate_limit import DistributedRateLimiter, RateLimitExceeded
+from .task_scheduling_policy import (
+    SchedulingPolicy,
+    PriorityScheduler,
+    WaitTimeHistogram,
+    PROMOTE_AGED_TASKS_LUA
+)
+
 logger = logging.getLogger("vokaflow.high_scale_task_manager")
 
 class TaskPriority(IntEnum):
@@ -120,6 +164,7 @@ class ScalableTask:
     cpu_requirement: float = 0.1  # CPU cores
     created_at: datetime = None
     scheduled_for: Optional[datetime] = None
+    graph: Optional[Dict[str, Any]] = None  # {"id", "node", "parents", "results_arg"} si pertenece a un DAG
 
 class CircuitBreaker:
     """Circuit breaker para prevenir cascading failures"""
@@ -171,6 +216,33 @@ class RateLimiter:
             return True
         return False
 
+class CompletionBatcher:
+    """Acumula completaciones de tareas y las confirma en lotes"""
+    
+    def __init__(self, flush_callback: Callable, max_batch: int = 1, max_wait_ms: float = 0.0):
+        self.flush_callback = flush_callback
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait_ms / 1000.0
+        self.records = []
+        self.oldest_record_at = None
+    
+    async def add(self, record: dict):
+        if not self.records:
+            self.oldest_record_at = time.time()
+        self.records.append(record)
+        if len(self.records) >= self.max_batch or self.max_wait <= 0:
+            await self.flush()
+    
+    def is_due(self) -> bool:
+        return bool(self.records) and time.time() - self.oldest_record_at >= self.max_wait
+    
+    async def flush(self):
+        if not self.records:
+            return
+        batch, self.records = self.records, []
+        self.oldest_record_at = None
+        await self.flush_callback(batch)
+
 class HighScaleTaskManager:
     """
     Gestor de tareas de alta escala para millones de solicitudes por segundo
@@ -190,7 +262,23 @@ class HighScaleTaskManager:
                  max_workers_per_type: Dict[WorkerType, int] = None,
                  enable_auto_scaling: bool = True,
                  enable_monitoring: bool = True,
-                 partition_count: int = 16):
+                 partition_count: int = 16,
+                 cluster_mode: bool = False,
+                 dequeue_modes: Dict[WorkerType, DequeueMode] = None,
+                 blocking_timeout: float = 1.0,
+                 batch_sizes: Dict[WorkerType, int] = None,
+                 max_batch_wait_ms: float = 5.0,
+                 result_ttl: int = 3600,
+                 task_codec: str = "json",
+                 enable_scheduler: bool = True,
+                 lease_timeout: Optional[float] = 30.0,
+                 max_lease_attempts: int = 3,
+                 rate_limits: Dict[str, int] = None,
+                 tenant_rate_limits: Dict[str, int] = None,
+                 scheduling_policy: SchedulingPolicy = SchedulingPolicy.STRICT,
+                 priority_weights: Dict[TaskPriority, int] = None,
+                 aging_threshold: Optional[float] = None,
+                 aging_ceiling: TaskPriority = TaskPriority.HIGH):
         
         # Configuración de Redis (single-node por defecto)
         self.redis_cluster_nodes = redis_cluster_nodes or [
@@ -210,6 +298,40 @@ class HighScaleTaskManager:
         self.enable_monitoring = enable_monitoring
         self.partition_count = partition_count
         
+        # Redis Cluster real (slots + MOVED/ASK) o nodos independientes con mapa de particiones
+        self.cluster_mode = cluster_mode
+        self.partition_map: Optional[PartitionMap] = None
+        self.node_names_by_url = {}
+        self._next_node_index = 0
+        self.unavailable_nodes: Set[str] = set()  # Nodos del mapa sin conexión: sus particiones esperan
+        self.node_reconnect_task = None
+        self.node_reconnect_interval = 5.0
+        
+        # Motor de dequeue por pool de workers (BZPOPMIN por defecto; LUA si hay leases, ver abajo)
+        self.dequeue_modes = {
+            worker_type: DequeueMode.BLOCKING for worker_type in WorkerType
+        }
+        if dequeue_modes:
+            self.dequeue_modes.update(dequeue_modes)
+        self.blocking_timeout = blocking_timeout
+        
+        # Modo batch: tareas reclamadas por round trip y confirmaciones agrupadas
+        self.batch_sizes = {worker_type: 1 for worker_type in WorkerType}
+        if batch_sizes:
+            self.batch_sizes.update(batch_sizes)
+        self.max_batch_wait_ms = max_batch_wait_ms
+        self.result_ttl = result_ttl
+        self.completion_batchers = {
+            worker_type.value: CompletionBatcher(
+                self._flush_completions,
+                max_batch=self.batch_sizes[worker_type],
+                max_wait_ms=max_batch_wait_ms if self.batch_sizes[worker_type] > 1 else 0.0
+            )
+            for worker_type in WorkerType
+        }
+        self.completion_flush_task = None
+        self.throughput_stats = defaultdict(int)
+        
         # Pools de workers especializados
         self.worker_pools = {}
         self.worker_metrics = defaultdict(dict)
@@ -217,7 +339,49 @@ class HighScaleTaskManager:
         
         # Colas distribuidas por prioridad y tipo
         self.redis_pools = {}
+        self.redis_node_urls = {}
+        self.blocking_clients = {}  # Conexiones dedicadas para BZPOPMIN
+        self.pop_scripts = {}       # Script Lua registrado por nodo
         self.queue_keys = {}
+        self.queue_notifiers = {worker_type.value: QueueNotifier() for worker_type in WorkerType}
+        self.queue_notifiers[SCHEDULER_NOTIFY_TYPE] = QueueNotifier()
+        self.notification_tasks = []
+        self.dequeue_stats = defaultdict(int)
+        self.queue_routes = {}      # queue_key -> (partición, índice en la lista fija de la partición)
+        
+        # Leases: una tarea extraída vive en inflight hasta su ack; si el worker muere, el reaper la reencola
+        self.lease_timeout = lease_timeout
+        self.max_lease_attempts = max_lease_attempts
+        if lease_timeout:
+            # BZPOPMIN saca la tarea antes de que exista su lease: un crash entre los dos
+            # round trips la perdería. Con leases el pop va siempre en el script Lua
+            # (que la deja en inflight en la misma operación) y la espera usa el notificador
+            for worker_type, mode in self.dequeue_modes.items():
+                if mode == DequeueMode.BLOCKING:
+                    self.dequeue_modes[worker_type] = DequeueMode.LUA
+        self.lease_pop_scripts = {}
+        self.reap_scripts = {}
+        self.active_leases = {}     # miembro inflight -> partición (renovados por heartbeat)
+        self.lease_stats = defaultdict(int)
+        self.lease_heartbeat_task = None
+        self.lease_reaper_task = None
+        
+        # Planificación entre prioridades (estado por pool de workers) y aging de colas
+        self.scheduling_policy = scheduling_policy
+        self.priority_schedulers = {
+            worker_type: PriorityScheduler(
+                scheduling_policy,
+                [priority.value for priority in TaskPriority],
+                {priority.value: weight for priority, weight in (priority_weights or {}).items()}
+            )
+            for worker_type in WorkerType
+        }
+        self.wait_histograms = defaultdict(WaitTimeHistogram)  # nombre de prioridad original -> esperas
+        self.aging_threshold = aging_threshold
+        self.aging_ceiling = aging_ceiling
+        self.aging_scripts = {}
+        self.aging_stats = defaultdict(int)
+        self.aging_task = None
         
         # Métricas y monitoreo
         self.global_metrics = {
@@ -232,7 +396,11 @@ class HighScaleTaskManager:
         }
         
         # Rate limiters por categoría
+        # Rate limiting global por categoría/tenant (GCRA en Redis); el local queda como fallback sin Redis
+        self.rate_limiter = DistributedRateLimiter(self, rate_limits, tenant_rate_limits)
         self.rate_limiters = defaultdict(lambda: RateLimiter(10000))  # 10K per second default
+        for category, rate in (rate_limits or {}).items():
+            self.rate_limiters[category] = RateLimiter(rate)
         
         # Circuit breakers por función
         self.circuit_breakers = defaultdict(lambda: CircuitBreaker())
@@ -240,6 +408,22 @@ class HighScaleTaskManager:
         # Cache de funciones compiladas
         self.function_cache = {}
         
+        # Codec de escritura de tareas (la lectura detecta JSON, msgpack y compacto)
+        self.codec = TaskCodecRegistry(task_codec)
+        
+        # Tareas diferidas y recurrentes (sorted set por partición + líder único)
+        self.scheduler = DistributedTaskScheduler(self) if enable_scheduler else None
+        self.scheduler_task = None
+        
+        # Resultados completos en Redis (TTL) con espera por pub/sub
+        self.result_store = TaskResultStore(self, ttl=result_ttl)
+        
+        # Grafos de tareas (DAG) con contadores de dependencias en Redis
+        self.graph_engine = TaskGraphEngine(self)
+        
+        # Dead letter queue indexada (hash por task_id + índices por error, función y fecha)
+        self.dlq = IndexedDeadLetterQueue(self)
+        
         # Estado del sistema
         self.running = False
         self.monitoring_task = None
@@ -252,15 +436,18 @@ class HighScaleTaskManager:
     async def initialize(self):
         """Inicializar el sistema distribuido"""
         try:
+            # Configurar colas distribuidas (antes de Redis: la migración de claves las necesita)
+            await self._setup_distributed_queues()
+            
             # Conectar a Redis Cluster
             await self._setup_redis_cluster()
             
+            if self.redis_pools:
+                await self.codec.function_registry.load(self._coordinator_client())
+            
             # Inicializar worker pools
             await self._setup_worker_pools()
             
-            # Configurar colas distribuidas
-            await self._setup_distributed_queues()
-            
             # Iniciar monitoreo
             if self.enable_monitoring:
                 self.monitoring_task = asyncio.create_task(self._monitoring_loop())
@@ -269,10 +456,13 @@ class HighScaleTaskManager:
             if self.enable_auto_scaling:
                 self.auto_scaler_task = asyncio.create_task(self._auto_scaling_loop())
             
-            # Iniciar workers Redis distribuidos
+            # Iniciar workers Redis distribuidos (deben ver running=True al arrancar)
+            self.running = True
             await self._start_redis_workers()
             
-            self.running = True
+            if self.scheduler and self.redis_pools:
+                self.scheduler_task = asyncio.create_task(self.scheduler.run())
+            
             logger.info("✅ HighScaleTaskManager inicializado correctamente")
             
         except Exception as e:
@@ -281,23 +471,251 @@ class HighScaleTaskManager:
 
     async def _setup_redis_cluster(self):
         """Configurar conexiones a Redis (single-node o cluster)"""
-        for i, node_url in enumerate(self.redis_cluster_nodes):
+        if self.cluster_mode:
+            await self._setup_cluster_client()
+            return
+        
+        for node_url in self.redis_cluster_nodes:
             try:
-                pool = aioredis.ConnectionPool.from_url(
-                    node_url,
-                    max_connections=20,  # Reducido para single-node
-                    retry_on_timeout=True,
-                    health_check_interval=60  # Menos frecuente
-                )
-                redis_client = aioredis.Redis(connection_pool=pool)
-                await redis_client.ping()
-                self.redis_pools[f"node_{i}"] = redis_client
+                await self._connect_node(node_url)
                 logger.info(f"✅ Conectado a Redis node: {node_url}")
             except Exception as e:
                 logger.error(f"❌ Error conectando a Redis {node_url}: {e}")
                 # En modo single-node, esto es crítico
                 if len(self.redis_cluster_nodes) == 1:
                     logger.warning("⚠️ Redis single-node no disponible, usando modo memoria")
+        
+        if self.redis_pools:
+            await self._load_partition_map()
+
+    async def _connect_node(self, node_url: str) -> str:
+        """Conectar un nodo Redis independiente y devolver su nombre interno"""
+        if node_url in self.node_names_by_url:
+            return self.node_names_by_url[node_url]
+        
+        pool = aioredis.ConnectionPool.from_url(
+            node_url,
+            max_connections=20,  # Reducido para single-node
+            retry_on_timeout=True,
+            health_check_interval=60  # Menos frecuente
+        )
+        redis_client = aioredis.Redis(connection_pool=pool)
+        await redis_client.ping()
+        
+        node_name = f"node_{self._next_node_index}"
+        self._next_node_index += 1
+        self.redis_pools[node_name] = redis_client
+        self.redis_node_urls[node_name] = node_url
+        self.node_names_by_url[node_url] = node_name
+        return node_name
+
+    async def _setup_cluster_client(self):
+        """Conectar a Redis Cluster: el cliente mantiene el mapa de slots y sigue MOVED/ASK"""
+        startup_nodes = [ClusterNode(*parse_node_url(node_url)) for node_url in self.redis_cluster_nodes]
+        try:
+            redis_client = RedisCluster(
+                startup_nodes=startup_nodes,
+                max_connections=100,
+                cluster_error_retry_attempts=5
+            )
+            await redis_client.initialize()
+            await redis_client.ping()
+            self.redis_pools["cluster"] = redis_client
+            self.redis_node_urls["cluster"] = self.redis_cluster_nodes[0]
+            logger.info(f"✅ Conectado a Redis Cluster ({len(startup_nodes)} nodos semilla)")
+            await self._migrate_legacy_keys()
+        except Exception as e:
+            logger.error(f"❌ Error conectando a Redis Cluster: {e}")
+            logger.warning("⚠️ Redis Cluster no disponible, usando modo memoria")
+
+    def _coordinator_client(self) -> Optional['aioredis.Redis']:
+        """Nodo que guarda el estado compartido (mapa de particiones, registro de funciones...)"""
+        if not self.redis_pools:
+            return None
+        node_name = self.node_names_by_url.get(self.redis_cluster_nodes[0])
+        if node_name in self.redis_pools:
+            return self.redis_pools[node_name]
+        return next(iter(self.redis_pools.values()))
+
+    async def _load_partition_map(self):
+        """
+        Cargar el mapa partición -> nodo persistido y migrar si cambió redis_cluster_nodes
+        
+        El mapa solo cambia porque cambió la configuración (o por reshard_partitions),
+        nunca porque un nodo no respondiera al arrancar: sus particiones quedan
+        sin servicio (envíos a memoria, sin dequeue) hasta que vuelva a conectar.
+        """
+        coordinator = self._coordinator_client()
+        configured_urls = list(self.redis_cluster_nodes)
+        
+        stored = await coordinator.hgetall(PARTITION_MAP_KEY)
+        if stored and len(stored) == self.partition_count:
+            self.partition_map = PartitionMap.from_dict(self.partition_count, stored)
+            # Nodos retirados de la configuración: hay que conectarlos para vaciarlos
+            for node_url in set(self.partition_map.nodes()) - set(configured_urls):
+                try:
+                    await self._connect_node(node_url)
+                except Exception as e:
+                    logger.error(f"❌ Error conectando a Redis {node_url}: {e}")
+        else:
+            self.partition_map = PartitionMap(self.partition_count, configured_urls)
+            await coordinator.hset(PARTITION_MAP_KEY, mapping=self.partition_map.to_dict())
+        
+        self._refresh_unavailable_nodes()
+        if set(self.partition_map.nodes()) != set(configured_urls):
+            if self.unavailable_nodes:
+                logger.error(f"❌ redis_cluster_nodes cambió pero {sorted(self.unavailable_nodes)} no es accesible: "
+                             f"se mantiene el mapa guardado y el resharding queda aplazado")
+            else:
+                await self.reshard_partitions(configured_urls)
+        
+        await self._migrate_legacy_keys()
+
+    def _refresh_unavailable_nodes(self):
+        """Recalcular los nodos del mapa de particiones que no tienen conexión"""
+        self.unavailable_nodes = (
+            {url for url in self.partition_map.nodes() if url not in self.node_names_by_url}
+            if self.partition_map else set()
+        )
+        if self.unavailable_nodes:
+            partitions = [p for p in range(self.partition_count) if self._partition_unavailable(p)]
+            logger.error(f"❌ Nodos {sorted(self.unavailable_nodes)} no accesibles: "
+                         f"particiones {partitions} sin servicio hasta que vuelvan")
+
+    def _partition_unavailable(self, partition: int) -> bool:
+        return bool(self.partition_map) and self.partition_map.node_for(partition) in self.unavailable_nodes
+
+    async def _node_reconnect_loop(self):
+        """Reintentar la conexión a los nodos del mapa caídos y devolverles sus particiones"""
+        while self.running and self.unavailable_nodes:
+            try:
+                await asyncio.sleep(self.node_reconnect_interval)
+                for node_url in sorted(self.unavailable_nodes):
+                    try:
+                        node_name = await self._connect_node(node_url)
+                    except Exception as e:
+                        rate_limited_log(f"⚠️ Redis {node_url} sigue sin responder: {e}", "warning")
+                        continue
+                    await self._attach_node_engines(node_name)
+                    self.unavailable_nodes.discard(node_url)
+                    logger.info(f"✅ Reconectado a Redis node: {node_url}")
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                rate_limited_log(f"⚠️ Error reconectando nodos Redis: {e}", "warning")
+
+    async def _migrate_legacy_keys(self):
+        """Mover colas y DLQ con formato sin hash tag a las claves particionadas"""
+        moved = 0
+        for node_name, redis_client in list(self.redis_pools.items()):
+            legacy_keys = [
+                (legacy_queue_key(priority.name, worker_type.value, partition), (priority, worker_type, partition))
+                for priority in TaskPriority
+                for worker_type in WorkerType
+                for partition in range(self.partition_count)
+            ]
+            pipe = redis_client.pipeline(transaction=False)
+            for legacy_key, _ in legacy_keys:
+                pipe.exists(legacy_key)
+            exists = await pipe.execute()
+            
+            for (legacy_key, (priority, worker_type, partition)), found in zip(legacy_keys, exists):
+                # Partición en un nodo caído: la clave antigua se queda hasta el próximo arranque
+                if found and not self._partition_unavailable(partition):
+                    moved += await move_sorted_set(
+                        redis_client, self._select_redis_node(partition),
+                        legacy_key, self.queue_keys[(priority, worker_type, partition)]
+                    )
+            
+            for worker_type in WorkerType:
+                old_key = legacy_dlq_key(worker_type.value)
+                for task_data, score in await redis_client.zrange(old_key, 0, -1, withscores=True):
+                    try:
+                        partition = self._partition_for_task((await self._decode_task(task_data))["id"])
+                    except Exception:
+                        partition = 0
+                    if self._partition_unavailable(partition):
+                        continue
+                    await self._select_redis_node(partition).zadd(
+                        partition_dlq_key(worker_type.value, partition), {task_data: score}
+                    )
+                    await redis_client.zrem(old_key, task_data)
+                    moved += 1
+        
+        # DLQ crudas por tipo de worker (reaper de leases, versiones anteriores) -> DLQ indexada
+        for partition in range(self.partition_count):
+            moved += await self.dlq.ingest_raw(partition)
+        
+        if moved:
+            logger.info(f"🔀 {moved} tareas migradas a claves particionadas con hash tag")
+
+    async def reshard_partitions(self, node_urls: List[str]) -> Dict[str, Any]:
+        """
+        Redistribuir las particiones entre un conjunto nuevo de nodos sin perder tareas
+        
+        En Redis Cluster el resharding lo hace el propio cluster (los hash tags mueven
+        cada partición completa con su slot); aquí se cubre el modo de nodos independientes.
+        """
+        if self.cluster_mode:
+            return {
+                "status": "not_applicable",
+                "message": "En Redis Cluster usa redis-cli --cluster reshard; cada partición es un slot"
+            }
+        
+        for node_url in node_urls:
+            await self._connect_node(node_url)
+            await self._attach_node_engines(self.node_names_by_url[node_url])
+        
+        # Una partición en un nodo inaccesible no se puede mover: se rechaza antes de tocar el mapa
+        unreachable = [url for url in self.partition_map.nodes() if url not in self.node_names_by_url]
+        if unreachable:
+            raise ConnectionError(f"Nodos Redis no accesibles {unreachable}: resharding cancelado")
+        
+        old_map = PartitionMap.from_dict(self.partition_count, self.partition_map.to_dict())
+        moves = self.partition_map.rebalance(node_urls)
+        
+        # 1. Conmutar el enrutamiento: envíos y workers pasan al nuevo mapa
+        # 2. Esperar a que los workers terminen la espera de dequeue en curso
+        if self.running:
+            await asyncio.sleep(self.blocking_timeout + 0.1)
+        
+        # 3. Mover colas y DLQ de las particiones reasignadas
+        moved_tasks = 0
+        for partition, source_url, target_url in moves:
+            source = self.redis_pools[self.node_names_by_url[source_url]]
+            target = self.redis_pools[self.node_names_by_url[target_url]]
+            partition_keys = [
+                key for (priority, worker_type, p), key in self.queue_keys.items() if p == partition
+            ] + [partition_dlq_key(worker_type.value, partition) for worker_type in WorkerType]
+            partition_keys.append(partition_delayed_key(partition))
+            partition_keys.append(partition_inflight_key(partition))
+            for key in partition_keys:
+                moved_tasks += await move_sorted_set(source, target, key)
+            
+            # Índices de la DLQ y grafos: hashes, sets y zsets con el tag de la partición
+            tag = partition_tag(partition)
+            for pattern in (f"vokaflow:dlq:{tag}:index:*", f"vokaflow:graph:{tag}:*"):
+                async for key in source.scan_iter(match=pattern):
+                    await move_partition_key(source, target, key)
+        
+        # El coordinador es el primer nodo configurado (o el primero conectado si se retiró)
+        coordinator = self._coordinator_client()
+        await coordinator.hset(PARTITION_MAP_KEY, mapping=self.partition_map.to_dict())
+        self._refresh_unavailable_nodes()
+        
+        # 4. Desconectar nodos que ya no alojan particiones
+        for node_url in set(old_map.nodes()) - set(node_urls):
+            node_name = self.node_names_by_url.pop(node_url, None)
+            if node_name:
+                await self._detach_node(node_name)
+        
+        logger.info(f"🔀 Resharding: {len(moves)} particiones y {moved_tasks} tareas movidas a {len(node_urls)} nodos")
+        return {
+            "status": "success",
+            "moved_partitions": [{"partition": p, "from": src, "to": dst} for p, src, dst in moves],
+            "moved_tasks": moved_tasks,
+            "nodes": node_urls
+        }
 
     async def _setup_worker_pools(self):
         """Configurar pools de workers especializados"""
@@ -322,8 +740,21 @@ class HighScaleTaskManager:
         for priority in TaskPriority:
             for worker_type in WorkerType:
                 for partition in range(self.partition_count):
-                    queue_key = f"vokaflow:queue:{priority.name}:{worker_type.value}:{partition}"
+                    queue_key = partition_queue_key(priority.name, worker_type.value, partition)
                     self.queue_keys[(priority, worker_type, partition)] = queue_key
+        
+        # Índice estable de cada cola dentro de su partición (viaja en los miembros delayed/inflight)
+        for partition in range(self.partition_count):
+            for queue_index, (_, queue_key) in enumerate(self._partition_queues(partition)):
+                self.queue_routes[queue_key] = (partition, queue_index)
+
+    def _partition_queues(self, partition: int) -> List[tuple]:
+        """(worker_type, queue_key) de una partición en orden fijo (prioridad x tipo de worker)"""
+        return [
+            (worker_type.value, queue_key)
+            for (priority, worker_type, p), queue_key in self.queue_keys.items()
+            if p == partition
+        ]
 
     async def _start_redis_workers(self):
         """Iniciar workers que consumen colas Redis distribuidas"""
@@ -332,6 +763,21 @@ class HighScaleTaskManager:
         # Crear workers especializados para cada tipo
         self.worker_tasks = []
         
+        await self._setup_dequeue_engines()
+        
+        if any(size > 1 for size in self.batch_sizes.values()):
+            self.completion_flush_task = asyncio.create_task(self._completion_flush_loop())
+        
+        if self.lease_timeout and self.redis_pools:
+            self.lease_heartbeat_task = asyncio.create_task(self._lease_heartbeat_loop())
+            self.lease_reaper_task = asyncio.create_task(self._lease_reaper_loop())
+        
+        if self.aging_threshold and self.redis_pools:
+            self.aging_task = asyncio.create_task(self._queue_aging_loop())
+        
+        if self.unavailable_nodes:
+            self.node_reconnect_task = asyncio.create_task(self._node_reconnect_loop())
+        
         for worker_type, max_workers in self.max_workers_per_type.items():
             # Crear múltiples workers por tipo
             for worker_id in range(max_workers):
@@ -339,82 +785,433 @@ class HighScaleTaskManager:
                     self._redis_worker_loop(worker_type, worker_id)
                 )
                 self.worker_tasks.append(worker_task)
-                logger.info(f"👷 Worker {worker_type.value}-{worker_id} iniciado")
+                logger.info(f"👷 Worker {worker_type.value}-{worker_id} iniciado "
+                            f"(dequeue: {self.dequeue_modes[worker_type].value})")
         
         logger.info(f"✅ {len(self.worker_tasks)} workers Redis iniciados")
 
+    async def _setup_dequeue_engines(self):
+        """Preparar conexiones bloqueantes, scripts Lua y listeners de notificación"""
+        if not self.redis_pools:
+            return
+        
+        for node_name in list(self.redis_pools):
+            await self._attach_node_engines(node_name)
+
+    async def _attach_node_engines(self, node_name: str):
+        """Preparar los motores de dequeue de un nodo (idempotente)"""
+        if node_name in self.pop_scripts:
+            return
+        
+        redis_client = self.redis_pools[node_name]
+        blocking_workers = sum(
+            max_workers for worker_type, max_workers in self.max_workers_per_type.items()
+            if self.dequeue_modes[worker_type] == DequeueMode.BLOCKING
+        )
+        
+        # BZPOPMIN retiene la conexión durante la espera: pool dedicado por nodo
+        # (el cliente de cluster ya mantiene un pool por nodo del cluster)
+        if blocking_workers and not self.cluster_mode:
+            self.blocking_clients[node_name] = aioredis.Redis(
+                connection_pool=aioredis.ConnectionPool.from_url(
+                    self.redis_node_urls[node_name],
+                    max_connections=blocking_workers + 2,
+                    retry_on_timeout=True
+                )
+            )
+        
+        self.pop_scripts[node_name] = redis_client.register_script(POP_HIGHEST_PRIORITY_LUA)
+        if self.lease_timeout:
+            self.lease_pop_scripts[node_name] = redis_client.register_script(POP_WITH_LEASE_LUA)
+            self.reap_scripts[node_name] = redis_client.register_script(REAP_EXPIRED_LEASES_LUA)
+        self.aging_scripts[node_name] = redis_client.register_script(PROMOTE_AGED_TASKS_LUA)
+        
+        # Siempre hay listener: además de los workers LUA y el scheduler, lo usan las
+        # esperas de resultados (wait_for_result). PUBLISH se propaga a todo el cluster:
+        # en Redis Cluster basta con suscribirse a un nodo
+        listener_client = redis_client
+        if self.cluster_mode:
+            listener_client = aioredis.Redis.from_url(self.redis_node_urls[node_name])
+        self.notification_tasks.append(
+            asyncio.create_task(self._notification_listener(node_name, listener_client))
+        )
+
+    async def _detach_node(self, node_name: str):
+        """Cerrar las conexiones de un nodo retirado"""
+        for scripts in (self.pop_scripts, self.lease_pop_scripts, self.reap_scripts):
+            scripts.pop(node_name, None)
+        self.redis_node_urls.pop(node_name, None)
+        for clients in (self.blocking_clients, self.redis_pools):
+            redis_client = clients.pop(node_name, None)
+            if redis_client:
+                await redis_client.close()
+
+    async def _notification_listener(self, node_name: str, redis_client: 'aioredis.Redis'):
+        """Escuchar vokaflow:notify:* y despertar a los workers (o al scheduler) correspondientes"""
+        pubsub = redis_client.pubsub()
+        await pubsub.psubscribe(f"{NOTIFY_CHANNEL_PREFIX}*")
+        
+        try:
+            while self.running:
+                try:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if not message:
+                        continue
+                    
+                    channel = message["channel"]
+                    if isinstance(channel, bytes):
+                        channel = channel.decode()
+                    notify_type = channel[len(NOTIFY_CHANNEL_PREFIX):]
+                    if notify_type == RESULT_NOTIFY_TYPE:
+                        data = message["data"]
+                        self.result_store.notify(data.decode() if isinstance(data, bytes) else data)
+                        continue
+                    notifier = self.queue_notifiers.get(notify_type)
+                    if notifier:
+                        notifier.notify()
+                
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    rate_limited_log(f"⚠️ Error en listener de notificaciones {node_name}: {e}", "warning")
+                    await asyncio.sleep(1)
+        finally:
+            await pubsub.reset()
+
+    def _monitored_queues_by_node(self, worker_type: WorkerType,
+                                  priority_order: List[int] = None) -> Dict[tuple, List[str]]:
+        """
+        Colas de un tipo de worker agrupadas y ordenadas por prioridad
+        
+        Cada grupo es (node_name, partition): en nodos independientes se agrupan todas
+        las particiones del nodo (partition=None); en Redis Cluster cada partición es
+        un grupo propio porque los comandos multi-clave exigen un único slot.
+        priority_order (política de planificación) sustituye al orden estricto.
+        """
+        queues_by_node = defaultdict(list)
+        for priority in (TaskPriority(p) for p in priority_order) if priority_order else TaskPriority:
+            for partition in range(self.partition_count):
+                queue_key = self.queue_keys.get((priority, worker_type, partition))
+                if queue_key and not self._partition_unavailable(partition):
+                    group = (self._node_name_for_partition(partition),
+                             partition if self.cluster_mode else None)
+                    queues_by_node[group].append(queue_key)
+        return dict(queues_by_node)
+
+    async def _dequeue_next(self, worker_type: WorkerType, mode: DequeueMode,
+                            queues_by_node: Dict[tuple, List[str]], count: int = 1):
+        """
+        Extraer la siguiente tarea según el motor de dequeue del pool
+        
+        Returns:
+            (queue_key, [(task_data, lease, score), ...]) o None si no hubo tareas;
+            lease es el miembro inflight a confirmar (None sin leases) y score el de la cola
+        """
+        if not queues_by_node:
+            return None
+        
+        if mode == DequeueMode.POLLING:
+            for (node_name, _), queue_keys in queues_by_node.items():
+                if self.lease_timeout:
+                    result = await self._lease_pop(node_name, queue_keys, count)
+                    if result:
+                        return result
+                    continue
+                result = await polling_pop(self.redis_pools[node_name], queue_keys, count)
+                self.dequeue_stats["redis_dequeue_calls"] += 1
+                if result:
+                    queue_key, items = result
+                    return queue_key, [(task_data, None, score) for task_data, score in items]
+            return None
+        
+        if mode == DequeueMode.BLOCKING:
+            # Solo sin leases (con leases el pool usa LUA, ver __init__)
+            # Repartir la espera entre nodos para no quedar bloqueado en uno solo
+            node_timeout = self.blocking_timeout / len(queues_by_node)
+            for (node_name, _), queue_keys in queues_by_node.items():
+                redis_client = self.blocking_clients.get(node_name) or self.redis_pools[node_name]
+                result = await blocking_pop(redis_client, queue_keys, node_timeout, count)
+                self.dequeue_stats["redis_dequeue_calls"] += 1
+                if result:
+                    queue_key, items = result
+                    return queue_key, [(task_data, None, score) for task_data, score in items]
+            return None
+        
+        # DequeueMode.LUA
+        notifier = self.queue_notifiers[worker_type.value]
+        generation = notifier.generation
+        for (node_name, _), queue_keys in queues_by_node.items():
+            if self.lease_timeout:
+                result = await self._lease_pop(node_name, queue_keys, count)
+                if result:
+                    return result
+                continue
+            
+            result = await lua_pop(self.pop_scripts[node_name], queue_keys, count)
+            self.dequeue_stats["redis_dequeue_calls"] += 1
+            if result:
+                queue_key, items = result
+                return queue_key, [(task_data, None, score) for task_data, score in items]
+        
+        # Sin tareas: dormir hasta el siguiente envío (o timeout de seguridad)
+        if await notifier.wait(generation, self.blocking_timeout):
+            self.dequeue_stats["notify_wakeups"] += 1
+        return None
+
+    def _lease_expiry_ms(self) -> int:
+        return int((time.time() + self.lease_timeout) * 1000)
+
+    async def _lease_pop(self, node_name: str, queue_keys: List[str], count: int):
+        """Pop y lease en el mismo script: no hay ventana en la que la tarea no esté en Redis"""
+        routes = [self.queue_routes[queue_key] for queue_key in queue_keys]
+        result = await lease_pop(
+            self.lease_pop_scripts[node_name], queue_keys,
+            [partition_inflight_key(partition) for partition, _ in routes],
+            [queue_index for _, queue_index in routes],
+            count, self._lease_expiry_ms()
+        )
+        self.dequeue_stats["redis_dequeue_calls"] += 1
+        if not result:
+            return None
+        queue_key, members = result
+        partition = self.queue_routes[queue_key][0]
+        for member, _ in members:
+            self.active_leases[member] = partition
+        return queue_key, [
+            (payload, member, score)
+            for member, _ in members
+            for _, score, payload in [decode_queue_member(member)]
+        ]
+
+    async def _ack_lease(self, lease: bytes):
+        """Confirmar una tarea terminada: sale de inflight y se olvida su contador de intentos"""
+        partition = self.active_leases.pop(lease, None)
+        if partition is None:
+            return
+        redis_client = self._select_redis_node(partition)
+        if not redis_client:
+            return
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.zrem(partition_inflight_key(partition), lease)
+            pipe.hdel(partition_lease_attempts_key(partition), payload_digest(decode_queue_member(lease)[2]))
+            removed, _ = await pipe.execute()
+            if removed:
+                self.lease_stats["acked"] += 1
+            else:
+                # El lease expiró y otro worker ya la reencoló: habrá ejecución duplicada
+                self.lease_stats["lost"] += 1
+        except Exception as e:
+            rate_limited_log(f"⚠️ Error confirmando lease: {e}", "warning")
+
+    async def _lease_heartbeat_loop(self):
+        """Extender los leases de las tareas que este proceso tiene en curso o en buffer"""
+        interval = self.lease_timeout / 3
+        while self.running:
+            try:
+                await asyncio.sleep(interval)
+                await self._extend_leases(self._lease_expiry_ms())
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                rate_limited_log(f"⚠️ Error renovando leases: {e}", "warning")
+
+    async def _extend_leases(self, expiry_ms: int):
+        """ZADD XX con un pipeline por nodo (XX: no resucitar leases ya reencolados)"""
+        leases_by_node = defaultdict(list)
+        for member, partition in list(self.active_leases.items()):
+            leases_by_node[self._node_name_for_partition(partition)].append((member, partition))
+        
+        for node_name, leases in leases_by_node.items():
+            redis_client = self.redis_pools.get(node_name)
+            if not redis_client:
+                continue
+            pipe = redis_client.pipeline(transaction=False)
+            for member, partition in leases:
+                pipe.zadd(partition_inflight_key(partition), {member: expiry_ms}, xx=True)
+            await pipe.execute()
+            self.lease_stats["heartbeats"] += len(leases)
+
+    async def _lease_reaper_loop(self):
+        """
+        Reencolar leases vencidos (worker caído o colgado)
+        
+        Cada instancia ejecuta el reaper: el script es atómico, así que dos reapers
+        nunca reencolan la misma tarea. Tras max_lease_attempts vencimientos la
+        tarea va a la DLQ de su tipo de worker.
+        """
+        interval = max(1.0, self.lease_timeout / 2)
+        while self.running:
+            try:
+                await asyncio.sleep(interval)
+                await self._reap_expired_leases()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                rate_limited_log(f"⚠️ Error en reaper de leases: {e}", "warning")
+
+    async def _reap_expired_leases(self, limit: int = 500) -> int:
+        now_ms = int(time.time() * 1000)
+        touched_types = set()
+        requeued = 0
+        
+        for partition in range(self.partition_count):
+            node_name = self._node_name_for_partition(partition)
+            script = self.reap_scripts.get(node_name)
+            if script is None:
+                continue
+            queues = self._partition_queues(partition)
+            keys = (
+                [partition_inflight_key(partition), partition_lease_attempts_key(partition)]
+                + [queue_key for _, queue_key in queues]
+                + [partition_dlq_key(worker_type_value, partition) for worker_type_value, _ in queues]
+            )
+            dead, *queue_indexes = await script(keys=keys, args=[now_ms, limit, self.max_lease_attempts])
+            for queue_index in queue_indexes:
+                touched_types.add(queues[int(queue_index)][0])
+            requeued += len(queue_indexes)
+            self.lease_stats["reaped_requeued"] += len(queue_indexes)
+            self.lease_stats["reaped_dead"] += int(dead)
+            if int(dead):
+                await self.dlq.ingest_raw(partition)
+        
+        if touched_types:
+            redis_client = self._coordinator_client()
+            for worker_type_value in touched_types:
+                await redis_client.publish(f"{NOTIFY_CHANNEL_PREFIX}{worker_type_value}", "reaper")
+            logger.warning(f"♻️ {requeued} tareas con lease vencido reencoladas")
+        return requeued
+
+    async def _queue_aging_loop(self):
+        """Aging: cada aging_threshold segundos, lo que lleva más de ese tiempo en cola sube un nivel"""
+        instance_id = f"aging-{uuid.uuid4().hex[:12]}"
+        while self.running:
+            try:
+                await asyncio.sleep(self.aging_threshold)
+                # Una sola pasada por intervalo entre todas las réplicas: el lock caduca solo
+                if await self.acquire_distributed_lock("queue_aging", instance_id, max(1, int(self.aging_threshold))):
+                    await self._promote_aged_tasks()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                rate_limited_log(f"⚠️ Error en aging de colas: {e}", "warning")
+
+    async def _promote_aged_tasks(self, limit: int = 1000) -> int:
+        cutoff = partition_queue_score(time.time() - self.aging_threshold)
+        levels = [priority for priority in TaskPriority if priority >= self.aging_ceiling]
+        promoted = 0
+        
+        for partition in range(self.partition_count):
+            script = self.aging_scripts.get(self._node_name_for_partition(partition))
+            if script is None:
+                continue
+            keys = [
+                self.queue_keys[(priority, worker_type, partition)]
+                for worker_type in WorkerType
+                for priority in levels
+            ]
+            promoted += int(await script(keys=keys, args=[cutoff, limit, len(levels)]))
+        
+        self.aging_stats["aging_passes"] += 1
+        self.aging_stats["aged_promotions"] += promoted
+        if promoted:
+            logger.info(f"⏫ {promoted} tareas promovidas un nivel por aging (> {self.aging_threshold}s en cola)")
+        return promoted
+
     async def _redis_worker_loop(self, worker_type: WorkerType, worker_id: int):
         """Worker loop que consume tareas de Redis distribuido"""
         worker_name = f"{worker_type.value}-{worker_id}"
         logger.info(f"🔄 Worker {worker_name} iniciado")
         
-        # Configurar colas que este worker va a monitorear
-        monitored_queues = []
-        for priority in TaskPriority:
-            for partition in range(self.partition_count):
-                queue_key = self.queue_keys.get((priority, worker_type, partition))
-                if queue_key:
-                    monitored_queues.append((queue_key, priority))
+        mode = self.dequeue_modes[worker_type]
+        batch_size = self.batch_sizes[worker_type]
+        priority_scheduler = self.priority_schedulers[worker_type]
+        priority_by_key = {
+            queue_key: priority
+            for (priority, wt, partition), queue_key in self.queue_keys.items()
+            if wt == worker_type
+        }
         
-        # Ordenar por prioridad (menor valor = mayor prioridad)
-        monitored_queues.sort(key=lambda x: x[1].value)
+        # Buffer local acotado: se rellena con un solo round trip de hasta batch_size tareas
+        local_buffer = deque()
         
         consecutive_empty_polls = 0
         max_empty_polls = 30  # 30 polls vacíos antes de aumentar el sleep
         
         while self.running:
             try:
-                task_processed = False
-                
-                # Procesar colas en orden de prioridad
-                for queue_key, priority in monitored_queues:
-                    # Seleccionar nodo Redis para esta cola
-                    redis_client = self._select_redis_node(
-                        hash(queue_key) % len(self.redis_pools) if self.redis_pools else 0
+                if local_buffer:
+                    task_data, priority, lease, score = local_buffer.popleft()
+                    await self._process_redis_task(
+                        task_data, worker_name, priority, score_enqueued_at(score, priority.value)
                     )
-                    
-                    if not redis_client:
-                        continue
-                    
-                    try:
-                        # ZPOPMIN para obtener tarea con mayor prioridad (menor score)
-                        result = await redis_client.zpopmin(queue_key, count=1)
-                        
-                        if result:
-                            task_data, score = result[0]  # (task_json, score)
-                            await self._process_redis_task(task_data, worker_name, priority)
-                            task_processed = True
-                            consecutive_empty_polls = 0
-                            break  # Procesar una tarea a la vez
-                    
-                    except Exception as e:
-                        logger.error(f"❌ Error en worker {worker_name} procesando cola {queue_key}: {e}")
-                        continue
+                    if lease is not None:
+                        await self._ack_lease(lease)
+                    continue
+                
+                if not self.redis_pools:
+                    await asyncio.sleep(1.0)
+                    continue
+                
+                priority_order = priority_scheduler.order()
+                queues_by_node = self._monitored_queues_by_node(worker_type, priority_order)
+                result = None
+                
+                try:
+                    result = await self._dequeue_next(worker_type, mode, queues_by_node, count=batch_size)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"❌ Error en worker {worker_name} extrayendo tareas ({mode.value}): {e}")
+                    await asyncio.sleep(1.0)
+                    continue
+                
+                priority_scheduler.record(
+                    priority_order[0], priority_by_key[result[0]].value if result else None,
+                    len(result[1]) if result else 0
+                )
+                
+                if result:
+                    queue_key, items = result
+                    self.dequeue_stats["tasks_dequeued"] += len(items)
+                    self.throughput_stats["batches_claimed"] += 1
+                    self.throughput_stats["tasks_claimed"] += len(items)
+                    consecutive_empty_polls = 0
+                    priority = priority_by_key[queue_key]
+                    local_buffer.extend((task_data, priority, lease, score) for task_data, lease, score in items)
+                    continue
+                
+                self.dequeue_stats["empty_dequeues"] += 1
                 
-                # Gestión de sleep dinámico
-                if not task_processed:
+                # Los motores BLOCKING y LUA ya esperan dentro de _dequeue_next
+                if mode == DequeueMode.POLLING:
                     consecutive_empty_polls += 1
                     if consecutive_empty_polls < max_empty_polls:
                         await asyncio.sleep(0.1)  # Poll rápido si hay actividad reciente
                     else:
                         await asyncio.sleep(1.0)   # Sleep más largo si no hay tareas
-                else:
-                    await asyncio.sleep(0.01)  # Sleep mínimo entre tareas
                 
+            except asyncio.CancelledError:
+                break
             except Exception as e:
                 logger.error(f"❌ Error crítico en worker {worker_name}: {e}")
                 await asyncio.sleep(5)  # Sleep antes de reintentar
         
         logger.info(f"🛑 Worker {worker_name} detenido")
 
-    async def _process_redis_task(self, task_data: str, worker_name: str, priority: TaskPriority):
+    async def _process_redis_task(self, task_data: str, worker_name: str, priority: TaskPriority,
+                                  enqueued_at: Optional[float] = None):
         """Procesar una tarea obtenida de Redis"""
         start_time = time.time()
         task_dict = None
         
         try:
-            # Deserializar tarea
-            task_dict = json.loads(task_data)
+            # Deserializar tarea (JSON, msgpack o compacto)
+            task_dict = await self._decode_task(task_data)
+            
+            # Espera en cola por prioridad original (las tareas promovidas por aging cuentan en la suya)
+            if enqueued_at is not None:
+                self.wait_histograms[TaskPriority(task_dict["priority"]).name].observe(start_time - enqueued_at)
             task_id = task_dict["id"]
             task_name = task_dict["name"]
             
@@ -431,25 +1228,29 @@ class HighScaleTaskManager:
             # Aplicar timeout si está especificado
             timeout = task_dict.get("timeout")
             
-            # Ejecutar tarea
+            # Nodos de un DAG: resultados de los padres leídos por referencia
+            call_kwargs = task_dict["kwargs"]
+            graph_ref = task_dict.get("graph")
+            if graph_ref and graph_ref.get("parents"):
+                call_kwargs = {
+                    **call_kwargs,
+                    graph_ref.get("results_arg", "parent_results"): await self.graph_engine.parent_results(graph_ref)
+                }
+            
+            # Ejecutar tarea (run_in_executor no acepta kwargs: se empaquetan con partial)
+            call = functools.partial(circuit_breaker.call, func, *task_dict["args"], **call_kwargs)
             if timeout:
                 result = await asyncio.wait_for(
                     asyncio.get_event_loop().run_in_executor(
                         self.worker_pools.get(WorkerType(task_dict["worker_type"])),
-                        circuit_breaker.call,
-                        func,
-                        *task_dict["args"],
-                        **task_dict["kwargs"]
+                        call
                     ),
                     timeout=timeout
                 )
             else:
                 result = await asyncio.get_event_loop().run_in_executor(
                     self.worker_pools.get(WorkerType(task_dict["worker_type"])),
-                    circuit_breaker.call,
-                    func,
-                    *task_dict["args"],
-                    **task_dict["kwargs"]
+                    call
                 )
             
             processing_time = time.time() - start_time
@@ -457,11 +1258,16 @@ class HighScaleTaskManager:
             # Registrar tarea completada
             await self._record_task_completion(task_dict, result, processing_time, worker_name, "completed")
             
+            # Liberar los hijos del DAG cuyas dependencias quedan satisfechas
+            if graph_ref:
+                await self.graph_engine.complete_node(graph_ref, result)
+            
             logger.info(f"✅ Worker {worker_name} completó {task_name} ({task_id}) en {processing_time:.3f}s")
             
         except asyncio.TimeoutError:
             processing_time = time.time() - start_time
             error_msg = f"Timeout después de {task_dict.get('timeout', 'N/A')}s"
+            task_dict["error_class"] = "TimeoutError"
             
             await self._record_task_completion(task_dict, None, processing_time, worker_name, "timeout", error_msg)
             await self._handle_failed_task(task_dict, error_msg)
@@ -471,6 +1277,8 @@ class HighScaleTaskManager:
         except Exception as e:
             processing_time = time.time() - start_time
             error_msg = str(e)
+            if task_dict is not None:
+                task_dict["error_class"] = type(e).__name__
             
             await self._record_task_completion(task_dict, None, processing_time, worker_name, "failed", error_msg)
             await self._handle_failed_task(task_dict, error_msg)
@@ -527,25 +1335,85 @@ class HighScaleTaskManager:
         }
         
         if result is not None:
-            completion_record["result"] = str(result)[:1000]  # Limitar tamaño del resultado
+            completion_record["result"] = str(result)[:1000]  # Vista previa para el historial en memoria
+            completion_record["value"] = result               # Valor completo para el almacén de resultados
         
         if error:
             completion_record["error"] = error[:500]  # Limitar tamaño del error
         
-        # Agregar a historial de tareas procesadas
-        self.processed_tasks.append(completion_record)
+        # Un fallo con reintentos pendientes no es el resultado final (no despierta a los waiters)
+        completion_record["final"] = status == "completed" or (
+            task_dict.get("current_retries", 0) >= task_dict.get("max_retries", 3)
+        )
+        
+        # Confirmación agrupada por tipo de worker (lote de 1 si el pool no usa batch)
+        batcher = self.completion_batchers.get(task_dict["worker_type"])
+        if batcher:
+            await batcher.add(completion_record)
+        else:
+            await self._flush_completions([completion_record])
+
+    async def _flush_completions(self, records: List[dict]):
+        """Aplicar un lote de completaciones: historial, métricas y escritura pipelined en Redis"""
+        # Agregar a historial de tareas procesadas (sin el valor completo, que vive en Redis)
+        self.processed_tasks.extend(
+            {k: v for k, v in record.items() if k not in ("value", "final")} for record in records
+        )
         
         # Mantener solo las últimas 10000 tareas para evitar memory leak
         if len(self.processed_tasks) > 10000:
             self.processed_tasks = self.processed_tasks[-5000:]
         
         # Actualizar métricas globales
-        if status == "completed":
-            self.global_metrics["completed_tasks"] += 1
-        elif status in ["failed", "timeout"]:
-            self.global_metrics["failed_tasks"] += 1
+        for record in records:
+            if record["status"] == "completed":
+                self.global_metrics["completed_tasks"] += 1
+            elif record["status"] in ["failed", "timeout"]:
+                self.global_metrics["failed_tasks"] += 1
         
         self.global_metrics["active_workers"] = len([t for t in self.worker_tasks if not t.done()])
+        self.throughput_stats["completion_flushes"] += 1
+        self.throughput_stats["completions_flushed"] += len(records)
+        
+        await self._persist_completions(records)
+
+    async def _persist_completions(self, records: List[dict]):
+        """Escribir registros de completación agrupados por nodo en un único pipeline"""
+        if not self.redis_pools:
+            return
+        
+        records_by_node = defaultdict(list)
+        for record in records:
+            partition = self._partition_for_task(record["task_id"])
+            records_by_node[self._node_name_for_partition(partition)].append(record)
+        
+        for node_name, node_records in records_by_node.items():
+            try:
+                pipe = self.redis_pools[node_name].pipeline(transaction=False)
+                status_counts = defaultdict(int)
+                for record in node_records:
+                    self.result_store.add_to_pipeline(pipe, record)
+                    status_counts[record["status"]] += 1
+                for status_name, count in status_counts.items():
+                    pipe.hincrby("vokaflow:hs:metrics:completions", status_name, count)
+                await pipe.execute()
+                self.throughput_stats["completion_pipelines"] += 1
+            except Exception as e:
+                rate_limited_log(f"⚠️ Error persistiendo completaciones en {node_name}: {e}", "warning")
+
+    async def _completion_flush_loop(self):
+        """Vaciar periódicamente los lotes de completación que superan max_batch_wait_ms"""
+        interval = max(self.max_batch_wait_ms / 1000.0, 0.001)
+        while self.running:
+            try:
+                await asyncio.sleep(interval)
+                for batcher in self.completion_batchers.values():
+                    if batcher.is_due():
+                        await batcher.flush()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                rate_limited_log(f"❌ Error vaciando lotes de completación: {e}", "error")
 
     async def _handle_failed_task(self, task_dict: dict, error: str):
         """Manejar tarea fallida - reintento o dead letter queue"""
@@ -559,19 +1427,20 @@ class HighScaleTaskManager:
             
             logger.info(f"🔄 Reintentando tarea {task_dict['name']} en {retry_delay}s (intento {current_retries + 1}/{max_retries})")
             
-            # Programar reintento
-            await asyncio.sleep(retry_delay)
-            await self._requeue_task(task_dict)
+            # Programar reintento (sorted set delayed: el worker no queda bloqueado esperando)
+            if not self.scheduler:
+                await asyncio.sleep(retry_delay)
+            await self._requeue_task(task_dict, delay=retry_delay)
         else:
             # Enviar a Dead Letter Queue
             await self._send_to_dlq(task_dict, error)
 
-    async def _requeue_task(self, task_dict: dict):
-        """Reencolar tarea para reintento"""
+    async def _requeue_task(self, task_dict: dict, delay: float = 0.0):
+        """Reencolar tarea para reintento (tras delay segundos si hay scheduler)"""
         try:
             # Seleccionar partición y cola
             task_id = task_dict["id"]
-            partition = int(hashlib.md5(task_id.encode()).hexdigest(), 16) % self.partition_count
+            partition = self._partition_for_task(task_id)
             priority = TaskPriority(task_dict["priority"])
             worker_type = WorkerType(task_dict["worker_type"])
             
@@ -580,10 +1449,18 @@ class HighScaleTaskManager:
             
             if redis_client:
                 # Re-serializar tarea actualizada
-                task_data = json.dumps(task_dict)
-                score = -time.time() + (priority.value * 1000000)  # Mantener orden de prioridad
+                task_data = self.codec.encode(task_dict)
+                
+                if delay > 0 and self.scheduler:
+                    due_at = time.time() + delay
+                    score = partition_queue_score(due_at)
+                    await self.scheduler.schedule(partition, queue_key, score, task_data, due_at)
+                    logger.debug(f"⏰ Reintento de {task_dict['name']} programado en {delay}s")
+                    return
                 
+                score = partition_queue_score(time.time())
                 await redis_client.zadd(queue_key, {task_data: score})
+                await redis_client.publish(f"{NOTIFY_CHANNEL_PREFIX}{worker_type.value}", task_id)
                 logger.debug(f"🔄 Tarea {task_dict['name']} reencolada para reintento")
             
         except Exception as e:
@@ -592,102 +1469,114 @@ class HighScaleTaskManager:
     async def _send_to_dlq(self, task_dict: dict, error: str):
         """Enviar tarea fallida a Dead Letter Queue"""
         try:
-            dlq_key = f"vokaflow:dlq:{task_dict['worker_type']}"
-            redis_client = self._select_redis_node(0)  # Usar primer nodo para DLQ
-            
-            if redis_client:
+            if self._select_redis_node(self._partition_for_task(task_dict["id"])):
                 # Agregar información del error
                 dlq_record = {
                     **task_dict,
                     "final_error": error,
+                    "error_class": task_dict.get("error_class", "Exception"),
                     "dlq_timestamp": datetime.now().isoformat(),
+                    "failed_at": time.time(),
                     "total_retries": task_dict.get("current_retries", 0)
                 }
                 
-                # Almacenar en DLQ con timestamp como score
-                await redis_client.zadd(dlq_key, {
-                    json.dumps(dlq_record): time.time()
-                })
+                # Hash por task_id + índices por fecha, error, función y tipo (recortado por partición)
+                await self.dlq.add(dlq_record)
                 
                 logger.warning(f"💀 Tarea {task_dict['name']} enviada a DLQ después de {dlq_record['total_retries']} reintentos")
                 
-                # Mantener DLQ limpio (solo últimas 1000 tareas fallidas)
-                await redis_client.zremrangebyrank(dlq_key, 0, -1001)
+                if task_dict.get("graph"):
+                    await self.graph_engine.fail_node(task_dict["graph"], error)
             
         except Exception as e:
             logger.error(f"❌ Error enviando tarea a DLQ: {e}")
 
+    def _worker_type_value(self, worker_type: Optional[str]) -> Optional[str]:
+        """Aceptar tanto el nombre del enum (router) como su valor"""
+        if worker_type and worker_type.upper() in WorkerType.__members__:
+            return WorkerType[worker_type.upper()].value
+        return worker_type
+
     async def get_dlq_tasks(self, worker_type: str = None, limit: int = 100) -> List[dict]:
         """Obtener tareas de Dead Letter Queue"""
+        page = await self.query_dlq(worker_type=worker_type, limit=limit)
+        return page["tasks"]
+
+    async def query_dlq(self,
+                        worker_type: str = None,
+                        error_class: str = None,
+                        func_name: str = None,
+                        since: float = None,
+                        until: float = None,
+                        limit: int = 100,
+                        cursor: str = None) -> Dict[str, Any]:
+        """Página filtrada de la DLQ: {"tasks": [...], "next_cursor": str | None}"""
+        if not self.redis_pools:
+            return {"tasks": [], "next_cursor": None}
         try:
-            if worker_type:
-                dlq_keys = [f"vokaflow:dlq:{worker_type}"]
-            else:
-                dlq_keys = [f"vokaflow:dlq:{wt.value}" for wt in WorkerType]
-            
-            dlq_tasks = []
-            redis_client = self._select_redis_node(0)
-            
-            if redis_client:
-                for dlq_key in dlq_keys:
-                    # Obtener tareas más recientes (mayor score = más reciente)
-                    tasks = await redis_client.zrevrange(dlq_key, 0, limit-1, withscores=True)
-                    
-                    for task_data, timestamp in tasks:
-                        try:
-                            task_record = json.loads(task_data)
-                            task_record["dlq_timestamp"] = timestamp
-                            dlq_tasks.append(task_record)
-                        except Exception as e:
-                            logger.error(f"❌ Error deserializando tarea DLQ: {e}")
-            
-            return sorted(dlq_tasks, key=lambda x: x.get("dlq_timestamp", 0), reverse=True)[:limit]
-            
+            return await self.dlq.query(
+                error_class=error_class,
+                func_name=func_name,
+                worker_type=self._worker_type_value(worker_type),
+                since=since,
+                until=until,
+                limit=limit,
+                cursor=cursor
+            )
         except Exception as e:
             logger.error(f"❌ Error obteniendo tareas DLQ: {e}")
-            return []
+            return {"tasks": [], "next_cursor": None}
 
     async def retry_dlq_task(self, task_id: str) -> bool:
         """Reintentar tarea desde Dead Letter Queue"""
         try:
-            # Buscar tarea en todas las DLQs
-            redis_client = self._select_redis_node(0)
-            if not redis_client:
+            # Lectura O(1) por task_id en el hash de su partición
+            record = await self.dlq.get(task_id)
+            if record is None:
                 return False
             
-            for worker_type in WorkerType:
-                dlq_key = f"vokaflow:dlq:{worker_type.value}"
-                tasks = await redis_client.zrange(dlq_key, 0, -1, withscores=True)
-                
-                for task_data, score in tasks:
-                    try:
-                        task_record = json.loads(task_data)
-                        if task_record["id"] == task_id:
-                            # Remover de DLQ
-                            await redis_client.zrem(dlq_key, task_data)
-                            
-                            # Resetear contadores y reencolar
-                            task_record.pop("current_retries", None)
-                            task_record.pop("final_error", None)
-                            task_record.pop("dlq_timestamp", None)
-                            
-                            await self._requeue_task(task_record)
-                            
-                            logger.info(f"🔄 Tarea {task_id} reintentada desde DLQ")
-                            return True
-                    except Exception as e:
-                        logger.error(f"❌ Error procesando tarea DLQ: {e}")
-            
-            return False
+            await self.dlq.requeue([record])
+            logger.info(f"🔄 Tarea {task_id} reintentada desde DLQ")
+            return True
             
         except Exception as e:
             logger.error(f"❌ Error reintentando tarea DLQ {task_id}: {e}")
             return False
 
+    async def replay_dlq(self,
+                         worker_type: str = None,
+                         error_class: str = None,
+                         func_name: str = None,
+                         since: float = None,
+                         until: float = None,
+                         max_tasks: Optional[int] = None,
+                         rate_per_second: Optional[float] = None,
+                         batch_size: int = 500) -> Dict[str, Any]:
+        """Reencolar en bloque las tareas DLQ que cumplen los filtros, con ritmo limitado"""
+        if not self.redis_pools:
+            return {"replayed": 0, "batches": 0, "duration_seconds": 0.0}
+        return await self.dlq.replay(
+            error_class=error_class,
+            func_name=func_name,
+            worker_type=self._worker_type_value(worker_type),
+            since=since,
+            until=until,
+            max_tasks=max_tasks,
+            rate_per_second=rate_per_second,
+            batch_size=batch_size
+        )
+
+    async def get_dlq_stats(self) -> Dict[str, Any]:
+        """Totales de la DLQ por clase de error, función y tipo de worker"""
+        if not self.redis_pools:
+            return {"total": 0}
+        return await self.dlq.stats_summary()
+
     async def acquire_distributed_lock(self, lock_key: str, worker_id: str, timeout: int = 30) -> bool:
         """Adquirir lock distribuido usando Redis"""
         try:
-            redis_client = self._select_redis_node(hash(lock_key) % len(self.redis_pools) if self.redis_pools else 0)
+            # md5 y no hash(): hash() varía entre procesos y cada réplica elegiría otro nodo
+            redis_client = self._select_redis_node(self._partition_for_task(lock_key))
             if not redis_client:
                 return False
             
@@ -732,7 +1621,8 @@ class HighScaleTaskManager:
     async def release_distributed_lock(self, lock_key: str, worker_id: str) -> bool:
         """Liberar lock distribuido"""
         try:
-            redis_client = self._select_redis_node(hash(lock_key) % len(self.redis_pools) if self.redis_pools else 0)
+            # md5 y no hash(): hash() varía entre procesos y cada réplica elegiría otro nodo
+            redis_client = self._select_redis_node(self._partition_for_task(lock_key))
             if not redis_client:
                 return False
             
@@ -766,6 +1656,38 @@ class HighScaleTaskManager:
             logger.error(f"❌ Error liberando lock {lock_key}: {e}")
             return False
 
+    async def renew_distributed_lock(self, lock_key: str, worker_id: str, timeout: int = 30) -> bool:
+        """Extender la expiración de un lock propio (False si ya no lo posee)"""
+        try:
+            redis_client = self._select_redis_node(self._partition_for_task(lock_key))
+            if not redis_client:
+                return False
+            
+            full_lock_key = f"vokaflow:lock:{lock_key}"
+            
+            # Script Lua para renovar atómicamente (solo si somos el owner)
+            lua_script = """
+            local lock_data = redis.call('GET', KEYS[1])
+            if lock_data then
+                local lock_info = cjson.decode(lock_data)
+                if lock_info.worker_id == ARGV[1] then
+                    lock_info.expires_at = tonumber(ARGV[3])
+                    redis.call('SET', KEYS[1], cjson.encode(lock_info), 'EX', tonumber(ARGV[2]))
+                    return 1
+                end
+            end
+            return 0
+        """
+            
+            result = await redis_client.eval(
+                lua_script, 1, full_lock_key, worker_id, int(timeout), time.time() + timeout
+            )
+            return bool(result)
+            
+        except Exception as e:
+            logger.error(f"❌ Error renovando lock {lock_key}: {e}")
+            return False
+
     async def execute_with_lock(self, lock_key: str, worker_id: str, func: Callable, 
                               *args, timeout: int = 30, **kwargs) -> Any:
         """Ejecutar función con lock distribuido"""
@@ -799,52 +1721,44 @@ class HighScaleTaskManager:
                          **task_options) -> str:
         """
         Enviar tarea optimizada para alta escala
-        """
-        # Rate limiting por categoría
-        if not self.rate_limiters[category].is_allowed():
-            raise Exception(f"Rate limit exceeded for category: {category}")
         
-        # Generar ID único
-        task_id = str(uuid.uuid4())
+        Para ejecución diferida usar delay (segundos) o scheduled_for (datetime):
+        la tarea espera en el sorted set delayed de su partición hasta vencer.
+        """
+        # Rate limiting por categoría (y por tenant si se indica)
+        tenant = task_options.pop("tenant", None)
+        await self._check_rate_limit(category, tenant)
         
-        if name is None:
-            name = f"{func.__name__}_{task_id[:8]}"
+        delay = task_options.pop("delay", None)
+        if delay:
+            task_options["scheduled_for"] = datetime.now() + timedelta(seconds=delay)
+        scheduled_for = task_options.get("scheduled_for")
+        due_at = scheduled_for.timestamp() if scheduled_for else None
+        if due_at is not None and due_at <= time.time():
+            due_at = None
         
-        # Crear tarea escalable
-        task = ScalableTask(
-            id=task_id,
-            name=name,
-            func=func,
-            args=args,
-            kwargs=kwargs or {},
-            priority=priority,
-            worker_type=worker_type,
-            category=category,
-            rate_limit=rate_limit,
-            created_at=datetime.now(),
-            **task_options
+        prepared = await self._prepare_task(
+            func, args, kwargs, priority, worker_type, name, category, rate_limit, **task_options
         )
-        
-        # Determinar partición basada en el task_id para distribución uniforme
-        partition = int(hashlib.md5(task_id.encode()).hexdigest(), 16) % self.partition_count
-        
-        # Seleccionar nodo Redis
+        task = prepared["task"]
+        task_id, name, task_data = task.id, task.name, prepared["task_data"]
+        partition = prepared["route"]["partition"]
         redis_client = self._select_redis_node(partition)
         
-        # Serializar tarea
-        task_data = self._serialize_task(task)
-        
         # Encolar en Redis con prioridad (si está disponible)
         if redis_client:
             queue_key = self.queue_keys[(priority, worker_type, partition)]
             
-            # Usar timestamp negativo para ordenación por prioridad (menor = mayor prioridad)
-            score = -time.time() + (priority.value * 1000000)
+            # Score = instante de encolado: FIFO dentro de cada cola de prioridad
+            score = partition_queue_score(due_at or time.time())
             
             try:
-                await redis_client.zadd(queue_key, {task_data: score})
-                # Notificar a workers
-                await redis_client.publish(f"vokaflow:notify:{worker_type.value}", task_id)
+                if due_at is not None and self.scheduler:
+                    await self.scheduler.schedule(partition, queue_key, score, task_data, due_at)
+                else:
+                    await redis_client.zadd(queue_key, {task_data: score})
+                    # Notificar a workers
+                    await redis_client.publish(f"{NOTIFY_CHANNEL_PREFIX}{worker_type.value}", task_id)
             except Exception as e:
                 logger.warning(f"Redis no disponible, usando cola en memoria: {e}")
                 # Fallback a cola en memoria
@@ -856,7 +1770,7 @@ class HighScaleTaskManager:
             if not hasattr(self, 'memory_queues'):
                 self.memory_queues = defaultdict(list)
             queue_key = f"memory:{priority.name}:{worker_type.value}:{partition}"
-            score = -time.time() + (priority.value * 1000000)
+            score = partition_queue_score(time.time())
             self.memory_queues[queue_key].append((score, task_data))
         
         # Actualizar métricas
@@ -868,21 +1782,198 @@ class HighScaleTaskManager:
         
         # Si estamos usando memoria, procesar la tarea inmediatamente (modo demostración)
         if not redis_client:
-            asyncio.create_task(self._process_memory_task(task_id, task))
+            delay = max(0.0, due_at - time.time()) if due_at else 0.0
+            asyncio.create_task(self._process_memory_task(task_id, task, delay))
         
         return task_id
 
-    async def _process_memory_task(self, task_id: str, task: ScalableTask):
+    async def _check_rate_limit(self, category: str, tenant: Optional[str] = None):
+        """Admitir un envío o lanzar RateLimitExceeded (límite global entre todas las réplicas)"""
+        if self.redis_pools:
+            try:
+                retry_after = await self.rate_limiter.acquire(category, tenant)
+            except Exception as e:
+                rate_limited_log(f"⚠️ Rate limiter distribuido no disponible, usando límite local: {e}", "warning")
+            else:
+                if retry_after > 0:
+                    raise RateLimitExceeded(category, tenant, retry_after)
+                return
+        
+        if not self.rate_limiters[category].is_allowed():
+            raise RateLimitExceeded(category, tenant, self.rate_limiters[category].window_size)
+
+    async def _prepare_task(self,
+                            func: Callable,
+                            args: tuple = (),
+                            kwargs: Dict[str, Any] = None,
+                            priority: TaskPriority = TaskPriority.NORMAL,
+                            worker_type: WorkerType = WorkerType.GENERAL_PURPOSE,
+                            name: str = None,
+                            category: str = "general",
+                            rate_limit: Optional[int] = None,
+                            **task_options) -> Dict[str, Any]:
+        """Crear y serializar una tarea sin encolarla (envío directo, grafos...)"""
+        # Generar ID único
+        task_id = str(uuid.uuid4())
+        
+        if name is None:
+            name = f"{func.__name__}_{task_id[:8]}"
+        
+        # Crear tarea escalable
+        task = ScalableTask(
+            id=task_id,
+            name=name,
+            func=func,
+            args=args,
+            kwargs=kwargs or {},
+            priority=priority,
+            worker_type=worker_type,
+            category=category,
+            rate_limit=rate_limit,
+            created_at=datetime.now(),
+            **task_options
+        )
+        
+        # Determinar partición basada en el task_id para distribución uniforme
+        partition = self._partition_for_task(task_id)
+        
+        # Serializar tarea (internando la ruta de la función si el codec lo usa)
+        if self.redis_pools and self.codec.uses_function_ids:
+            await self.codec.function_registry.register(
+                self._coordinator_client(), self._function_path(func)
+            )
+        
+        return {
+            "task": task,
+            "task_id": task_id,
+            "task_data": self._serialize_task(task),
+            "route": {
+                "partition": partition,
+                "queue_key": self.queue_keys[(priority, worker_type, partition)],
+                "priority": priority.value,
+                "worker_type": worker_type.value
+            }
+        }
+
+    def _task_route(self, task_dict: dict) -> Dict[str, Any]:
+        """Ruta (partición, cola) de una tarea ya serializada, como la de _prepare_task"""
+        partition = self._partition_for_task(task_dict["id"])
+        priority = TaskPriority(task_dict["priority"])
+        worker_type = WorkerType(task_dict["worker_type"])
+        return {
+            "partition": partition,
+            "queue_key": self.queue_keys[(priority, worker_type, partition)],
+            "priority": priority.value,
+            "worker_type": worker_type.value
+        }
+
+    async def _enqueue_prepared(self, route: Dict[str, Any], task_data: Union[str, bytes]):
+        """Encolar una tarea ya serializada en su cola y notificar a los workers"""
+        redis_client = self._select_redis_node(route["partition"])
+        score = partition_queue_score(time.time())
+        await redis_client.zadd(route["queue_key"], {task_data: score})
+        await redis_client.publish(f"{NOTIFY_CHANNEL_PREFIX}{route['worker_type']}", "")
+        self.global_metrics["total_tasks"] += 1
+        self.global_metrics["queue_lengths"][route["queue_key"]] += 1
+
+    async def get_task_result(self, task_id: str, include_value: bool = True) -> Optional[Dict[str, Any]]:
+        """Resultado almacenado de una tarea (None si no existe o expiró)"""
+        return await self.result_store.get_result(task_id, include_value)
+
+    async def wait_for_result(self, task_id: str, timeout: float = 30.0) -> Optional[Dict[str, Any]]:
+        """Esperar el resultado final de una tarea por pub/sub (None si vence timeout)"""
+        if not self.redis_pools:
+            return None
+        return await self.result_store.wait_for_result(task_id, timeout)
+
+    async def submit_graph(self,
+                           nodes: Dict[str, Dict[str, Any]],
+                           edges: List[tuple] = ()) -> Dict[str, Any]:
+        """
+        Enviar un DAG de tareas (p.ej. STT -> traducción -> TTS)
+        
+        Args:
+            nodes: {nombre: {"func": callable, "args": ..., "kwargs": ..., "priority": ..., ...}}
+            edges: [(padre, hijo), ...]; cada hijo recibe {padre: resultado} en el kwarg
+                   'parent_results' (configurable con 'results_arg' en su spec)
+        
+        Returns:
+            {"graph_id": ..., "task_ids": {nombre: task_id}}
+        """
+        return await self.graph_engine.submit(nodes, list(edges))
+
+    async def get_graph_status(self, graph_id: str) -> Optional[Dict[str, Any]]:
+        if not self.redis_pools:
+            return None
+        return await self.graph_engine.status(graph_id)
+
+    async def schedule_recurring(self,
+                                 func: Callable,
+                                 cron: str,
+                                 args: tuple = (),
+                                 kwargs: Dict[str, Any] = None,
+                                 priority: TaskPriority = TaskPriority.NORMAL,
+                                 worker_type: WorkerType = WorkerType.GENERAL_PURPOSE,
+                                 name: str = None,
+                                 category: str = "general") -> str:
+        """
+        Registrar una tarea recurrente con expresión cron de 5 campos
+        
+        La definición se guarda en Redis: cualquier proceso puede registrarla y
+        el líder del scheduler la lanza en cada vencimiento.
+        """
+        if not self.scheduler or not self.redis_pools:
+            raise Exception("Las tareas recurrentes requieren Redis y el scheduler habilitado")
+        
+        func_name = self._function_path(func)
+        return await self.scheduler.schedule_recurring({
+            "name": name or func.__name__,
+            "func_name": func_name,
+            "cron": cron,
+            "args": list(args),
+            "kwargs": kwargs or {},
+            "priority": priority.value,
+            "worker_type": worker_type.value,
+            "category": category,
+            "created_at": datetime.now().isoformat()
+        })
+
+    async def cancel_recurring(self, schedule_id: str) -> bool:
+        if not self.scheduler or not self.redis_pools:
+            return False
+        return await self.scheduler.cancel_recurring(schedule_id)
+
+    async def list_recurring(self) -> List[Dict[str, Any]]:
+        if not self.scheduler or not self.redis_pools:
+            return []
+        return await self.scheduler.list_recurring()
+
+    async def submit_recurring_instance(self, definition: Dict[str, Any]) -> str:
+        """Encolar una ejecución de una tarea recurrente (llamado por el líder del scheduler)"""
+        func = await self._resolve_function(definition["func_name"])
+        if func is None:
+            raise Exception(f"Función no encontrada: {definition['func_name']}")
+        return await self.submit_task(
+            func,
+            args=tuple(definition.get("args", ())),
+            kwargs=definition.get("kwargs") or {},
+            priority=TaskPriority(definition["priority"]),
+            worker_type=WorkerType(definition["worker_type"]),
+            name=f"{definition['name']}_{datetime.now().strftime('%Y%m%d%H%M')}",
+            category=definition.get("category", "general")
+        )
+
+    async def _process_memory_task(self, task_id: str, task: ScalableTask, delay: float = 0.0):
         """Procesar tarea en memoria (modo demostración sin Redis)"""
         try:
+            if delay:
+                await asyncio.sleep(delay)
             start_time = time.time()
             
             # Simular procesamiento de la tarea
             result = await asyncio.get_event_loop().run_in_executor(
                 self.worker_pools.get(task.worker_type, self.worker_pools[WorkerType.GENERAL_PURPOSE]),
-                task.func,
-                *task.args,
-                **task.kwargs
+                functools.partial(task.func, *task.args, **task.kwargs)
             )
             
             processing_time = time.time() - start_time
@@ -920,19 +2011,46 @@ class HighScaleTaskManager:
             self.global_metrics["failed_tasks"] += 1
             logger.error(f"❌ Error procesando tarea {task.name} ({task_id}): {e}")
 
+    def _partition_for_task(self, task_id: str) -> int:
+        """Partición determinista de una tarea (md5 del task_id)"""
+        return int(hashlib.md5(task_id.encode()).hexdigest(), 16) % self.partition_count
+
+    def _node_name_for_partition(self, partition: int) -> str:
+        """Nombre del nodo Redis que aloja una partición"""
+        if not self.redis_pools:
+            return ""
+        if self.cluster_mode:
+            # El cliente de cluster enruta por slot (hash tag de la partición)
+            return "cluster"
+        if self.partition_map:
+            # "" si el nodo está caído: sin cliente, el envío cae a memoria y no hay dequeue
+            return self.node_names_by_url.get(self.partition_map.node_for(partition), "")
+        return f"node_{partition % len(self.redis_pools)}"
+
     def _select_redis_node(self, partition: int) -> 'aioredis.Redis':
         """Seleccionar nodo Redis basado en partición"""
         if not self.redis_pools:
             # Si no hay pools Redis disponibles, usar el primer nodo por defecto
             return None
-        node_index = partition % len(self.redis_pools)
-        node_key = f"node_{node_index}"
-        return self.redis_pools.get(node_key)
+        return self.redis_pools.get(self._node_name_for_partition(partition))
 
-    def _serialize_task(self, task: ScalableTask) -> str:
+    @staticmethod
+    def _function_path(func: Callable) -> str:
+        return f"{func.__module__}.{func.__name__}"
+
+    async def _decode_task(self, task_data: Union[str, bytes]) -> dict:
+        """Decodificar un payload de tarea; resuelve IDs de función nuevos contra Redis"""
+        try:
+            return self.codec.decode(task_data)
+        except UnknownFunctionId as e:
+            if not await self.codec.function_registry.fetch(self._coordinator_client(), e.func_id):
+                raise
+            return self.codec.decode(task_data)
+
+    def _serialize_task(self, task: ScalableTask) -> Union[str, bytes]:
         """Serializar tarea para Redis"""
         # Convertir función a string para serialización
-        func_name = f"{task.func.__module__}.{task.func.__name__}"
+        func_name = self._function_path(task.func)
         
         task_dict = {
             "id": task.id,
@@ -947,29 +2065,51 @@ class HighScaleTaskManager:
             "category": task.category,
             "created_at": task.created_at.isoformat()
         }
+        if task.graph:
+            task_dict["graph"] = task.graph
         
-        return json.dumps(task_dict)
+        return self.codec.encode(task_dict)
+
+    async def _queue_lengths(self) -> Dict[str, int]:
+        """ZCARD de todas las colas con un pipeline por nodo"""
+        keys_by_node = defaultdict(list)
+        for (priority, worker_type, partition), queue_key in self.queue_keys.items():
+            if not self._partition_unavailable(partition):
+                keys_by_node[self._node_name_for_partition(partition)].append(queue_key)
+        
+        lengths = {}
+        for node_name, queue_keys in keys_by_node.items():
+            try:
+                pipe = self.redis_pools[node_name].pipeline(transaction=False)
+                for queue_key in queue_keys:
+                    pipe.zcard(queue_key)
+                lengths.update(zip(queue_keys, await pipe.execute()))
+            except Exception as redis_error:
+                # Si Redis no está disponible, continuar sin error
+                rate_limited_log(f"⚠️ Error al obtener longitudes de colas en {node_name}: {redis_error}", "warning")
+        return lengths
 
     async def _monitoring_loop(self):
         """Loop de monitoreo en tiempo real"""
+        last_sample_time = time.time()
+        last_finished = 0
+        
         while self.running:
             try:
                 # Calcular métricas de throughput
                 current_time = time.time()
+                finished = self.global_metrics["completed_tasks"] + self.global_metrics["failed_tasks"]
+                elapsed = current_time - last_sample_time
+                if elapsed > 0:
+                    self.global_metrics["throughput_per_second"] = (finished - last_finished) / elapsed
+                last_sample_time, last_finished = current_time, finished
                 
                 # Obtener longitudes de colas
                 total_queue_length = 0
                 
                 # Solo intentar obtener métricas de Redis si hay conexiones disponibles
                 if self.redis_pools:
-                    for queue_key in self.queue_keys.values():
-                        redis_client = self._select_redis_node(0)  # Usar primer nodo para métricas
-                        if redis_client:  # Verificar que redis_client no sea None
-                            try:
-                                length = await redis_client.zcard(queue_key)
-                                total_queue_length += length
-                            except Exception as redis_error:
-                                rate_limited_log(f"⚠️ Error al obtener métricas de Redis para {queue_key}: {redis_error}", "warning")
+                    total_queue_length = sum((await self._queue_lengths()).values())
                 else:
                     # Modo memoria: contar tareas en memory_queues
                     total_queue_length = sum(len(queue) for queue in self.memory_queues.values())
@@ -1047,16 +2187,7 @@ class HighScaleTaskManager:
         # Obtener estadísticas de todas las colas
         total_pending = 0
         if self.redis_pools and self.queue_keys:
-            for queue_key in self.queue_keys.values():
-                redis_client = self._select_redis_node(0)
-                if redis_client:
-                    try:
-                        pending = await redis_client.zcard(queue_key)
-                        total_pending += pending
-                    except Exception as redis_error:
-                        # Si Redis no está disponible, continuar sin error
-                        rate_limited_log(f"⚠️ Error al obtener estadísticas de Redis para {queue_key}: {redis_error}", "warning")
-                        pass
+            total_pending = sum((await self._queue_lengths()).values())
         
         # Agregar información sobre tareas en memoria
         memory_queue_lengths = {k: len(v) for k, v in self.memory_queues.items()}
@@ -1068,6 +2199,50 @@ class HighScaleTaskManager:
             "total_pending_tasks": total_pending + sum(memory_queue_lengths.values()),
             "redis_nodes": len(self.redis_pools),
             "partitions": self.partition_count,
+            "partitioning": {
+                "cluster_mode": self.cluster_mode,
+                "slots": {partition: partition_slot(partition) for partition in range(self.partition_count)},
+                "assignments": self.partition_map.to_dict() if self.partition_map else {},
+                "unavailable_nodes": sorted(self.unavailable_nodes)
+            },
+            "task_codec": self.codec.writer.name,
+            "graphs": dict(self.graph_engine.stats),
+            "dlq": dict(self.dlq.stats),
+            "rate_limits": dict(self.rate_limiter.stats),
+            "results": {
+                "result_ttl": self.result_ttl,
+                "waiting": sum(len(waiters) for waiters in self.result_store.waiters.values()),
+                **self.result_store.stats
+            },
+            "scheduler": await self._scheduler_status(),
+            "leases": {
+                "enabled": bool(self.lease_timeout),
+                "lease_timeout": self.lease_timeout,
+                "max_lease_attempts": self.max_lease_attempts,
+                "active": len(self.active_leases),
+                **self.lease_stats
+            },
+            "scheduling": {
+                "policy": self.scheduling_policy.value,
+                "aging_threshold": self.aging_threshold,
+                "aging_ceiling": self.aging_ceiling.name,
+                **self.aging_stats,
+                "pools": {wt.value: scheduler.snapshot() for wt, scheduler in self.priority_schedulers.items()},
+                "wait_histograms": {name: histogram.snapshot() for name, histogram in self.wait_histograms.items()}
+            },
+            "dequeue": {
+                "modes": {wt.value: mode.value for wt, mode in self.dequeue_modes.items()},
+                **self.dequeue_stats
+            },
+            "batching": {
+                "batch_sizes": {wt.value: size for wt, size in self.batch_sizes.items()},
+                "max_batch_wait_ms": self.max_batch_wait_ms,
+                "avg_batch_size": (
+                    self.throughput_stats["tasks_claimed"] / self.throughput_stats["batches_claimed"]
+                    if self.throughput_stats["batches_claimed"] else 0.0
+                ),
+                **self.throughput_stats
+            },
             "worker_pools": {
                 worker_type.value: {
                     "max_workers": max_workers,
@@ -1093,6 +2268,22 @@ class HighScaleTaskManager:
         
         return metrics
 
+    async def _scheduler_status(self) -> Dict[str, Any]:
+        if not self.scheduler:
+            return {"enabled": False}
+        status = {
+            "enabled": True,
+            "instance_id": self.scheduler.instance_id,
+            "is_leader": self.scheduler.is_leader,
+            **self.scheduler.stats
+        }
+        if self.redis_pools:
+            try:
+                status["pending_delayed"] = await self.scheduler.pending_delayed()
+            except Exception as e:
+                logger.debug(f"No se pudo contar tareas diferidas: {e}")
+        return status
+
     async def shutdown(self):
         """Shutdown graceful del sistema"""
         logger.info("🛑 Iniciando shutdown del HighScaleTaskManager...")
@@ -1105,6 +2296,18 @@ class HighScaleTaskManager:
         if self.auto_scaler_task:
             self.auto_scaler_task.cancel()
         
+        # Detener el scheduler (libera el liderazgo si lo tenía)
+        if self.scheduler_task:
+            self.scheduler_task.cancel()
+            await asyncio.gather(self.scheduler_task, return_exceptions=True)
+        
+        # Cancelar listeners de notificación
+        for task in self.notification_tasks:
+            task.cancel()
+        if self.notification_tasks:
+            await asyncio.gather(*self.notification_tasks, return_exceptions=True)
+        self.notification_tasks = []
+        
         # Cancelar workers Redis
         if hasattr(self, 'worker_tasks'):
             for task in self.worker_tasks:
@@ -1114,6 +2317,27 @@ class HighScaleTaskManager:
             if self.worker_tasks:
                 await asyncio.gather(*self.worker_tasks, return_exceptions=True)
         
+        # Leases: los que siguen activos (tareas interrumpidas o en buffer) vencen ya
+        # para que cualquier instancia viva las reencole en su próxima pasada del reaper
+        for task in (self.lease_heartbeat_task, self.lease_reaper_task, self.aging_task, self.node_reconnect_task):
+            if task:
+                task.cancel()
+        if self.active_leases:
+            try:
+                await self._extend_leases(0)
+            except Exception as e:
+                logger.error(f"❌ Error liberando leases activos: {e}")
+            self.active_leases.clear()
+        
+        # Confirmar completaciones pendientes antes de cerrar Redis
+        if self.completion_flush_task:
+            self.completion_flush_task.cancel()
+        for batcher in self.completion_batchers.values():
+            try:
+                await batcher.flush()
+            except Exception as e:
+                logger.error(f"❌ Error vaciando lote de completaciones: {e}")
+        
         # Cerrar worker pools
         for worker_type, pool in self.worker_pools.items():
             logger.info(f"🔄 Cerrando pool {worker_type.value}")
@@ -1122,12 +2346,31 @@ class HighScaleTaskManager:
         # Cerrar conexiones Redis
         for node_name, redis_client in self.redis_pools.items():
             await redis_client.close()
+        for node_name, redis_client in self.blocking_clients.items():
+            await redis_client.close()
         
         logger.info("✅ HighScaleTaskManager shutdown completado")
 
 # Instancia global - REACTIVADA con configuración optimizada
 high_scale_task_manager = None
 
+def load_rate_limit_config() -> tuple:
+    """
+    Límites por categoría ("rate_limiting") y por tenant ("tenant_rate_limiting",
+    categoría -> tasa por tenant, "default" para el resto) de configs/high_scale_config.json
+    """
+    config_path = os.getenv(
+        "VOKAFLOW_HIGH_SCALE_CONFIG",
+        os.path.join(os.path.dirname(__file__), "..", "..", "..", "configs", "high_scale_config.json")
+    )
+    try:
+        with open(config_path) as config_file:
+            config = json.load(config_file)
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ No se pudo leer {config_path}: {e}. Límites por defecto")
+        return {}, {}
+    return config.get("rate_limiting", {}), config.get("tenant_rate_limiting", {})
+
 def create_optimized_high_scale_manager():
     """Crear high scale manager con configuración optimizada para Redis single-node"""
     # Configuración optimizada para evitar sobrecarga
@@ -1141,6 +2384,26 @@ def create_optimized_high_scale_manager():
     }
     
     logger.info(f"🚀 Configuración optimizada: {sum(optimized_workers.values())} workers totales")
+    rate_limits, tenant_rate_limits = load_rate_limit_config()
+    scheduling_policy = SchedulingPolicy(os.getenv("VOKAFLOW_SCHEDULING_POLICY", "strict"))
+    aging_threshold = float(os.getenv("VOKAFLOW_AGING_THRESHOLD", "0")) or None
+    
+    # Redis Cluster si se indican nodos (p.ej. los 6 de configs/high_scale_config.json)
+    cluster_nodes = os.getenv("VOKAFLOW_REDIS_CLUSTER_NODES")
+    if cluster_nodes:
+        return HighScaleTaskManager(
+            redis_cluster_nodes=[node.strip() for node in cluster_nodes.split(",") if node.strip()],
+            max_workers_per_type=optimized_workers,
+            enable_auto_scaling=False,
+            enable_monitoring=True,
+            partition_count=16,
+            cluster_mode=True,
+            task_codec=os.getenv("VOKAFLOW_TASK_CODEC", "json"),
+            rate_limits=rate_limits,
+            tenant_rate_limits=tenant_rate_limits,
+            scheduling_policy=scheduling_policy,
+            aging_threshold=aging_threshold
+        )
     
     # Configuración para Redis single-node
     redis_nodes = ["redis://localhost:6379"]  # Single Redis instance
@@ -1150,7 +2413,12 @@ def create_optimized_high_scale_manager():
         max_workers_per_type=optimized_workers,
         enable_auto_scaling=False,  # Deshabilitado para evitar sobrecarga
         enable_monitoring=True,
-        partition_count=4  # Reducido para single-node
+        partition_count=4,  # Reducido para single-node
+        task_codec=os.getenv("VOKAFLOW_TASK_CODEC", "json"),
+        rate_limits=rate_limits,
+        tenant_rate_limits=tenant_rate_limits,
+        scheduling_policy=scheduling_policy,
+        aging_threshold=aging_threshold
     )
 
 # Funciones de conveniencia para alta escala
@@ -1162,6 +2430,10 @@ async def submit_high_scale_task(*args, **kwargs) -> str:
         await high_scale_task_manager.initialize()
     return await high_scale_task_manager.submit_task(*args, **kwargs)
 
+def get_high_scale_manager() -> Optional[HighScaleTaskManager]:
+    """Instancia global actual (None si el sistema no está inicializado)"""
+    return high_scale_task_manager
+
 async def get_scale_metrics() -> Dict[str, Any]:
     """Obtener métricas de alta escala"""
     if high_scale_task_manager is None:
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Codecs de serialización de tareas para el High Scale Task Manager
+JSON (formato original), msgpack y formato compacto versionado con funciones internadas
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Union
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+logger = logging.getLogger("vokaflow.task_codecs")
+
+# Cabecera binaria: byte mágico + identificador de codec/versión.
+# Los payloads JSON antiguos empiezan por '{' y se siguen decodificando.
+CODEC_MAGIC = 0xF5
+CODEC_ID_MSGPACK = 0x01
+CODEC_ID_COMPACT_V1 = 0x02
+
+# Tabla fija del formato compacto v1 (no reordenar: cambiaría el significado de payloads encolados)
+WORKER_TYPES_V1 = ("cpu_intensive", "io_intensive", "memory_intensive", "network_intensive", "general_purpose")
+
+# Campos posicionales del formato compacto v1
+COMPACT_V1_FIELDS = frozenset(("id", "name", "func_name", "args", "kwargs", "priority",
+                               "worker_type", "max_retries", "timeout", "category", "created_at"))
+
+FUNCTION_REGISTRY_KEYS = (
+    "vokaflow:{codec}:functions",     # path -> id
+    "vokaflow:{codec}:function_ids",  # id -> path
+    "vokaflow:{codec}:function_seq"
+)
+
+# Asigna un ID estable a una ruta de función (idempotente y atómico)
+REGISTER_FUNCTION_LUA = """
+local existing = redis.call('HGET', KEYS[1], ARGV[1])
+if existing then
+    return tonumber(existing)
+end
+local new_id = redis.call('INCR', KEYS[3])
+redis.call('HSET', KEYS[1], ARGV[1], new_id)
+redis.call('HSET', KEYS[2], new_id, ARGV[1])
+return new_id
+"""
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+def _pack_timestamp(iso_value: Optional[str]):
+    """ISO naive -> microsegundos enteros (exacto, sin depender de la zona horaria)"""
+    if not iso_value:
+        return None
+    value = datetime.fromisoformat(iso_value)
+    if value.tzinfo is not None:
+        return iso_value
+    return (value - _EPOCH) // _MICROSECOND
+
+def _unpack_timestamp(packed):
+    if packed is None or isinstance(packed, str):
+        return packed
+    return (_EPOCH + timedelta(microseconds=packed)).isoformat()
+
+def _pack_uuid(task_id: str):
+    """UUID canónico (minúsculas con guiones) -> 16 bytes; cualquier otro ID se guarda tal cual"""
+    if (len(task_id) == 36 and task_id[8] == task_id[13] == task_id[18] == task_id[23] == "-"
+            and task_id == task_id.lower()):
+        try:
+            return bytes.fromhex(task_id.replace("-", ""))
+        except ValueError:
+            pass
+    return task_id
+
+def _unpack_uuid(packed: bytes) -> str:
+    h = packed.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+class UnknownFunctionId(Exception):
+    """El payload compacto referencia un ID de función que no está en la caché local"""
+
+    def __init__(self, func_id: int):
+        super().__init__(f"ID de función desconocido: {func_id}")
+        self.func_id = func_id
+
+class FunctionRegistry:
+    """Registro ruta de función <-> ID entero, compartido entre procesos vía Redis"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.paths: Dict[int, str] = {}
+        self._register_script = None
+
+    async def load(self, redis_client):
+        """Cargar el registro completo (una llamada al arrancar)"""
+        for func_id, path in (await redis_client.hgetall(FUNCTION_REGISTRY_KEYS[1])).items():
+            self._remember(path, func_id)
+
+    async def register(self, redis_client, path: str) -> int:
+        if path in self.ids:
+            return self.ids[path]
+        if self._register_script is None:
+            self._register_script = redis_client.register_script(REGISTER_FUNCTION_LUA)
+        func_id = await self._register_script(keys=list(FUNCTION_REGISTRY_KEYS), args=[path])
+        self._remember(path, func_id)
+        return int(func_id)
+
+    async def fetch(self, redis_client, func_id: int) -> Optional[str]:
+        path = await redis_client.hget(FUNCTION_REGISTRY_KEYS[1], func_id)
+        if path is not None:
+            self._remember(path, func_id)
+        return self.paths.get(func_id)
+
+    def _remember(self, path, func_id):
+        path = path.decode() if isinstance(path, bytes) else path
+        func_id = int(func_id)
+        self.ids[path] = func_id
+        self.paths[func_id] = path
+
+class TaskCodec:
+    """Interfaz de codec: dict de tarea <-> payload almacenado en Redis"""
+    name = "base"
+
+    def encode(self, task_dict: Dict[str, Any]) -> Union[str, bytes]:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        raise NotImplementedError
+
+class JsonTaskCodec(TaskCodec):
+    """Formato original (texto JSON)"""
+    name = "json"
+
+    def encode(self, task_dict):
+        return json.dumps(task_dict)
+
+    def decode(self, data):
+        return json.loads(data)
+
+class MsgpackTaskCodec(TaskCodec):
+    """Mismo dict que JSON, en msgpack (sin parseo de texto)"""
+    name = "msgpack"
+    header = bytes([CODEC_MAGIC, CODEC_ID_MSGPACK])
+
+    def encode(self, task_dict):
+        return self.header + msgpack.packb(task_dict, use_bin_type=True)
+
+    def decode(self, data):
+        return msgpack.unpackb(data[2:], raw=False, strict_map_key=False)
+
+class CompactTaskCodec(TaskCodec):
+    """
+    Formato compacto v1: array msgpack posicional
+
+    - task_id como 16 bytes en lugar de 36 caracteres
+    - ruta de función internada como entero (FunctionRegistry)
+    - worker_type como índice y created_at como microsegundos desde epoch
+    - nombre omitido si es el generado por defecto
+    - campos adicionales (reintentos, datos de DLQ...) en un dict final
+    """
+    name = "compact"
+    header = bytes([CODEC_MAGIC, CODEC_ID_COMPACT_V1])
+
+    def __init__(self, registry: FunctionRegistry):
+        self.registry = registry
+
+    def encode(self, task_dict):
+        func_name = task_dict["func_name"]
+        func_id = self.registry.ids.get(func_name)
+        task_id = task_dict["id"]
+        packed_id = _pack_uuid(task_id)
+
+        name = task_dict.get("name")
+        default_name = f"{func_name.rsplit('.', 1)[-1]}_{task_id[:8]}"
+
+        extras = {k: v for k, v in task_dict.items() if k not in COMPACT_V1_FIELDS}
+        if func_id is None:
+            # Función aún no registrada: viaja la ruta completa
+            extras["func_name"] = func_name
+
+        worker_type = task_dict["worker_type"]
+        record = [
+            packed_id,
+            None if name == default_name else name,
+            func_id,
+            list(task_dict.get("args") or ()),
+            task_dict.get("kwargs") or {},
+            task_dict["priority"],
+            WORKER_TYPES_V1.index(worker_type) if worker_type in WORKER_TYPES_V1 else worker_type,
+            task_dict.get("max_retries", 3),
+            task_dict.get("timeout"),
+            task_dict.get("category", "general"),
+            _pack_timestamp(task_dict.get("created_at")),
+            extras or None
+        ]
+        return self.header + msgpack.packb(record, use_bin_type=True)
+
+    def decode(self, data):
+        (packed_id, name, func_id, args, kwargs, priority, worker_type,
+         max_retries, timeout, category, created_at, extras) = msgpack.unpackb(
+            data[2:], raw=False, strict_map_key=False
+        )
+        extras = extras or {}
+
+        func_name = extras.pop("func_name", None)
+        if func_name is None:
+            func_name = self.registry.paths.get(func_id)
+            if func_name is None:
+                raise UnknownFunctionId(func_id)
+
+        task_id = _unpack_uuid(packed_id) if isinstance(packed_id, bytes) else packed_id
+        task_dict = {
+            "id": task_id,
+            "name": name if name is not None else f"{func_name.rsplit('.', 1)[-1]}_{task_id[:8]}",
+            "func_name": func_name,
+            "args": args,
+            "kwargs": kwargs,
+            "priority": priority,
+            "worker_type": WORKER_TYPES_V1[worker_type] if isinstance(worker_type, int) else worker_type,
+            "max_retries": max_retries,
+            "timeout": timeout,
+            "category": category,
+            "created_at": _unpack_timestamp(created_at)
+        }
+        task_dict.update(extras)
+        return task_dict
+
+class TaskCodecRegistry:
+    """Selecciona el codec de escritura y detecta el formato de cualquier payload al leer"""
+
+    def __init__(self, codec_name: str = "json", function_registry: FunctionRegistry = None):
+        self.function_registry = function_registry or FunctionRegistry()
+        self.codecs = {"json": JsonTaskCodec()}
+        if MSGPACK_AVAILABLE:
+            self.codecs["msgpack"] = MsgpackTaskCodec()
+            self.codecs["compact"] = CompactTaskCodec(self.function_registry)
+        elif codec_name != "json":
+            logger.warning(f"⚠️ msgpack no instalado, codec '{codec_name}' no disponible: usando json")
+            codec_name = "json"
+
+        if codec_name not in self.codecs:
+            raise ValueError(f"Codec de tareas desconocido: {codec_name}")
+        self.writer = self.codecs[codec_name]
+        self._by_id = {
+            CODEC_ID_MSGPACK: self.codecs.get("msgpack"),
+            CODEC_ID_COMPACT_V1: self.codecs.get("compact")
+        }
+
+    @property
+    def uses_function_ids(self) -> bool:
+        return self.writer.name == "compact"
+
+    def encode(self, task_dict: Dict[str, Any]) -> Union[str, bytes]:
+        return self.writer.encode(task_dict)
+
+    def decode(self, data: Union[str, bytes]) -> Dict[str, Any]:
+        if isinstance(data, str) or not data or data[0] != CODEC_MAGIC:
+            return json.loads(data)
+        codec = self._by_id.get(data[1])
+        if codec is None:
+            raise ValueError(f"Payload con codec no soportado (id={data[1]}); ¿falta msgpack?")
+        return codec.decode(data)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Motores de extracción (dequeue) para el High Scale Task Manager
+Polling clásico, BZPOPMIN bloqueante y pop atómico con script Lua
+"""
+
+import asyncio
+import logging
+from enum import Enum
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger("vokaflow.task_dequeue")
+
+class DequeueMode(Enum):
+    """Motores de dequeue seleccionables por pool de workers"""
+    POLLING = "polling"      # ZPOPMIN cola por cola con sleep entre pasadas (modo original)
+    BLOCKING = "blocking"    # BZPOPMIN sobre las colas ordenadas por prioridad
+    LUA = "lua"              # Script Lua + despertar por pub/sub
+
+# Recorre KEYS en el orden recibido (prioridad) y extrae hasta ARGV[1] elementos
+# de la primera cola no vacía. Devuelve {key, member1, score1, member2, score2, ...}
+POP_HIGHEST_PRIORITY_LUA = """
+local count = tonumber(ARGV[1])
+for i = 1, #KEYS do
+    local items = redis.call('ZPOPMIN', KEYS[i], count)
+    if #items > 0 then
+        local out = {KEYS[i]}
+        for j = 1, #items do
+            out[#out + 1] = items[j]
+        end
+        return out
+    end
+end
+return nil
+"""
+
+NOTIFY_CHANNEL_PREFIX = "vokaflow:notify:"
+
+def _to_str(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+def parse_lua_pop(raw) -> Optional[Tuple[str, List[Tuple[bytes, float]]]]:
+    """Convertir la respuesta del script Lua en (queue_key, [(task_data, score), ...])"""
+    if not raw:
+        return None
+    queue_key = _to_str(raw[0])
+    items = [(raw[i], float(raw[i + 1])) for i in range(1, len(raw) - 1, 2)]
+    return queue_key, items
+
+class QueueNotifier:
+    """
+    Despertador de workers de un tipo concreto.
+
+    El contador de generación permite detectar envíos que llegaron entre el
+    último pop vacío y el inicio de la espera, sin perder notificaciones.
+    """
+
+    def __init__(self):
+        self.generation = 0
+        self._event = asyncio.Event()
+
+    def notify(self):
+        self.generation += 1
+        # set() despierta a todos los waiters actuales; clear() prepara el siguiente pulso
+        self._event.set()
+        self._event.clear()
+
+    async def wait(self, since_generation: int, timeout: float) -> bool:
+        """Esperar una notificación posterior a since_generation (True si llegó)"""
+        if self.generation != since_generation:
+            return True
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+async def polling_pop(redis_client, queue_keys: List[str], count: int = 1):
+    """ZPOPMIN secuencial sobre las colas (una llamada por cola hasta encontrar tareas)"""
+    for queue_key in queue_keys:
+        result = await redis_client.zpopmin(queue_key, count=count)
+        if result:
+            return queue_key, [(member, float(score)) for member, score in result]
+    return None
+
+async def blocking_pop(redis_client, queue_keys: List[str], timeout: float, count: int = 1):
+    """BZPOPMIN: Redis devuelve el elemento de la primera cola no vacía en el orden de queue_keys"""
+    result = await redis_client.bzpopmin(queue_keys, timeout=max(timeout, 0.01))
+    if not result:
+        return None
+    queue_key, member, score = result
+    queue_key = _to_str(queue_key)
+    items = [(member, float(score))]
+    if count > 1:
+        # Completar el lote desde la misma cola sin bloquear
+        extra = await redis_client.zpopmin(queue_key, count=count - 1)
+        items.extend((m, float(s)) for m, s in extra)
+    return queue_key, items
+
+async def lua_pop(pop_script, queue_keys: List[str], count: int = 1):
+    """Pop atómico de la tarea más prioritaria en un único round trip"""
+    raw = await pop_script(keys=queue_keys, args=[count])
+    return parse_lua_pop(raw)
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Dead Letter Queue indexado para el High Scale Task Manager
+Hash task_id -> payload, índices secundarios (tiempo, clase de error, función,
+tipo de worker), paginación por cursor y replay masivo con control de ritmo
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .task_dequeue import NOTIFY_CHANNEL_PREFIX
+from .task_partitioning import dlq_index_key, dlq_key, queue_score
+
+logger = logging.getLogger("vokaflow.task_dlq")
+
+# Campos añadidos al entrar en la DLQ (se eliminan al reencolar)
+DLQ_FIELDS = ("final_error", "error_class", "dlq_timestamp", "failed_at", "total_retries", "current_retries")
+
+class IndexedDeadLetterQueue:
+    """
+    DLQ con acceso O(1) por task_id y O(log n + k) por filtro (con varios, acotado por el índice menor)
+
+    Por partición (mismo hash tag, mismo nodo/slot):
+        index:tasks            hash   task_id -> payload
+        index:time             zset   task_id -> failed_at
+        index:error:<clase>    zset   task_id -> failed_at
+        index:func:<función>   zset   task_id -> failed_at
+        index:worker:<tipo>    zset   task_id -> failed_at
+        index:errors / funcs   sets   valores conocidos (facetas)
+        index:tmp:<uuid>       zset   intersección de filtros durante un replay (TTL corto)
+
+    Las colas DLQ "crudas" por tipo de worker (vokaflow:dlq:{pNN}:<tipo>) quedan
+    como entrada: el reaper de leases deposita ahí los payloads sin decodificar
+    y ingest_raw los indexa.
+    """
+
+    def __init__(self, manager, max_entries_per_partition: int = 10000):
+        self.manager = manager
+        self.max_entries_per_partition = max_entries_per_partition
+        self.stats = defaultdict(int)
+
+    # Escritura
+
+    async def add(self, record: Dict[str, Any]):
+        """Indexar un registro de DLQ (task_dict + final_error, error_class...)"""
+        partition = self.manager._partition_for_task(record["id"])
+        redis_client = self.manager._select_redis_node(partition)
+        failed_at = record.setdefault("failed_at", time.time())
+        record.setdefault("error_class", "Exception")
+
+        pipe = redis_client.pipeline(transaction=False)
+        self._write_entry(pipe, partition, record, failed_at)
+        pipe.zcard(dlq_index_key(partition, "time"))
+        size = (await pipe.execute())[-1]
+        self.stats["added"] += 1
+
+        if size > self.max_entries_per_partition:
+            await self._trim(partition, size - self.max_entries_per_partition)
+
+    def _write_entry(self, pipe, partition: int, record: Dict[str, Any], failed_at: float):
+        task_id = record["id"]
+        pipe.hset(dlq_index_key(partition, "tasks"), task_id, self.manager.codec.encode(record))
+        for index_key in self._index_keys(partition, record):
+            pipe.zadd(index_key, {task_id: failed_at})
+        pipe.sadd(dlq_index_key(partition, "errors"), record["error_class"])
+        pipe.sadd(dlq_index_key(partition, "funcs"), record["func_name"])
+
+    @staticmethod
+    def _index_keys(partition: int, record: Dict[str, Any]) -> List[str]:
+        return [
+            dlq_index_key(partition, "time"),
+            dlq_index_key(partition, "error", record.get("error_class", "Exception")),
+            dlq_index_key(partition, "func", record["func_name"]),
+            dlq_index_key(partition, "worker", record["worker_type"])
+        ]
+
+    def _remove_entry(self, pipe, partition: int, record: Dict[str, Any]):
+        pipe.hdel(dlq_index_key(partition, "tasks"), record["id"])
+        for index_key in self._index_keys(partition, record):
+            pipe.zrem(index_key, record["id"])
+
+    async def _trim(self, partition: int, overflow: int):
+        """Descartar las entradas más antiguas de una partición"""
+        redis_client = self.manager._select_redis_node(partition)
+        oldest = await redis_client.zrange(dlq_index_key(partition, "time"), 0, overflow - 1)
+        records = await self._load(redis_client, partition, oldest)
+        pipe = redis_client.pipeline(transaction=False)
+        for task_id in oldest:
+            pipe.zrem(dlq_index_key(partition, "time"), task_id)
+        for record in records.values():
+            self._remove_entry(pipe, partition, record)
+        await pipe.execute()
+        self.stats["trimmed"] += len(oldest)
+
+    async def ingest_raw(self, partition: int, batch_size: int = 500) -> int:
+        """Indexar payloads depositados en las DLQ crudas por tipo de worker"""
+        redis_client = self.manager._select_redis_node(partition)
+        if redis_client is None:
+            return 0
+
+        ingested = 0
+        for worker_type_value in self._worker_types():
+            raw_key = dlq_key(worker_type_value, partition)
+            while True:
+                items = await redis_client.zrange(raw_key, 0, batch_size - 1, withscores=True)
+                if not items:
+                    break
+                pipe = redis_client.pipeline(transaction=False)
+                for task_data, score in items:
+                    try:
+                        record = await self.manager._decode_task(task_data)
+                    except Exception as e:
+                        logger.error(f"❌ Entrada DLQ ilegible descartada de {raw_key}: {e}")
+                        continue
+                    if "id" not in record:
+                        logger.error(f"❌ Entrada DLQ sin id descartada de {raw_key}")
+                        continue
+                    record.setdefault("func_name", "unknown")
+                    record.setdefault("worker_type", worker_type_value)
+                    # Sin final_error: la dejó el reaper tras agotar los leases
+                    record.setdefault("error_class", "Exception" if "final_error" in record else "LeaseExpired")
+                    record.setdefault("final_error", "Lease expirado demasiadas veces")
+                    record.setdefault("dlq_timestamp", datetime.fromtimestamp(score).isoformat())
+                    record["failed_at"] = score
+                    self._write_entry(pipe, partition, record, score)
+                pipe.zrem(raw_key, *[task_data for task_data, _ in items])
+                await pipe.execute()
+                ingested += len(items)
+
+        if ingested:
+            self.stats["ingested_raw"] += ingested
+            logger.info(f"💀 {ingested} entradas DLQ indexadas en la partición {partition}")
+        return ingested
+
+    def _worker_types(self) -> List[str]:
+        """Tipos de worker distintos, en el orden de la lista fija de colas"""
+        return list(dict.fromkeys(wt for wt, _ in self.manager._partition_queues(0)))
+
+    # Lectura
+
+    async def _load(self, redis_client, partition: int, task_ids: List) -> Dict[str, Dict[str, Any]]:
+        if not task_ids:
+            return {}
+        payloads = await redis_client.hmget(dlq_index_key(partition, "tasks"), task_ids)
+        records = {}
+        for task_id, payload in zip(task_ids, payloads):
+            if payload is None:
+                continue
+            try:
+                records[_to_str(task_id)] = await self.manager._decode_task(payload)
+            except Exception as e:
+                logger.error(f"❌ Error deserializando tarea DLQ {_to_str(task_id)}: {e}")
+        return records
+
+    async def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        partition = self.manager._partition_for_task(task_id)
+        redis_client = self.manager._select_redis_node(partition)
+        if redis_client is None:
+            return None
+        return (await self._load(redis_client, partition, [task_id])).get(task_id)
+
+    async def query(self,
+                    error_class: str = None,
+                    func_name: str = None,
+                    worker_type: str = None,
+                    since: float = None,
+                    until: float = None,
+                    limit: int = 100,
+                    cursor: str = None) -> Dict[str, Any]:
+        """
+        Página de entradas DLQ, más recientes primero
+
+        Cada partición recorre el índice más pequeño de los filtros pedidos y
+        comprueba la pertenencia a los demás con ZMSCORE (un round trip por
+        bloque), devolviendo solo (failed_at, task_id). Tras mezclar las
+        particiones se cargan los payloads de las `limit` entradas elegidas:
+        O(k) payloads por página; el recorrido de índices termina en cuanto hay
+        `limit` coincidencias. El cursor ("<failed_at>:<task_id>") es estable
+        aunque entren fallos nuevos.
+        """
+        indexes = self._filter_indexes(error_class, func_name, worker_type)
+
+        max_score, cursor_id = float("inf"), None
+        if cursor:
+            score_text, cursor_id = cursor.split(":", 1)
+            max_score = float(score_text)
+        if until is not None:
+            if until < max_score:
+                max_score, cursor_id = until, None
+        min_score = since if since is not None else float("-inf")
+
+        partitions = self._available_partitions()
+        pages = await asyncio.gather(*[
+            self._partition_ids(partition, [dlq_index_key(partition, *index) for index in indexes],
+                                max_score, cursor_id, min_score, limit)
+            for partition in partitions
+        ])
+        entries = sorted(
+            ((score, task_id, partition) for partition, page in zip(partitions, pages) for score, task_id in page),
+            reverse=True
+        )[:limit]
+
+        ids_by_partition = defaultdict(list)
+        for _, task_id, partition in entries:
+            ids_by_partition[partition].append(task_id)
+        records = {}
+        for partition, task_ids in ids_by_partition.items():
+            records.update(await self._load(self.manager._select_redis_node(partition), partition, task_ids))
+
+        tasks = []
+        for score, task_id, _ in entries:
+            record = records.get(task_id)
+            if record is None:
+                continue  # Borrada entre la lectura del índice y la del payload
+            record["dlq_score"] = score
+            tasks.append(record)
+        next_cursor = f"{entries[-1][0]!r}:{entries[-1][1]}" if len(entries) == limit else None
+        return {"tasks": tasks, "next_cursor": next_cursor}
+
+    @staticmethod
+    def _filter_indexes(error_class: Optional[str], func_name: Optional[str],
+                        worker_type: Optional[str]) -> List[tuple]:
+        return [
+            (name, value) for name, value in
+            (("error", error_class), ("func", func_name), ("worker", worker_type)) if value
+        ] or [("time",)]
+
+    def _available_partitions(self) -> List[int]:
+        return [
+            partition for partition in range(self.manager.partition_count)
+            if self.manager._select_redis_node(partition) is not None
+        ]
+
+    async def _partition_ids(self, partition: int, index_keys: List[str],
+                             max_score: float, cursor_id: Optional[str], min_score: float,
+                             limit: int) -> List[Tuple[float, str]]:
+        """(failed_at, task_id) de hasta `limit` entradas que están en todos los índices"""
+        redis_client = self.manager._select_redis_node(partition)
+        if len(index_keys) > 1:
+            # Recorrer el índice más pequeño: acota lo que se lee aunque haya pocas coincidencias
+            pipe = redis_client.pipeline(transaction=False)
+            for index_key in index_keys:
+                pipe.zcard(index_key)
+            sizes = await pipe.execute()
+            index_keys = sorted(index_keys, key=lambda key: sizes[index_keys.index(key)])
+        walk_key, others = index_keys[0], index_keys[1:]
+
+        results = []
+        offset = 0
+        chunk = max(limit, 50)
+        while len(results) < limit:
+            items = await redis_client.zrevrangebyscore(
+                walk_key, _score_bound(max_score), _score_bound(min_score),
+                start=offset, num=chunk, withscores=True
+            )
+            if not items:
+                break
+            offset += len(items)
+
+            # Con score igual al del cursor, ZREVRANGEBYSCORE ordena por task_id descendente
+            candidates = [
+                (score, _to_str(task_id)) for task_id, score in items
+                if cursor_id is None or score < max_score or _to_str(task_id) < cursor_id
+            ]
+            if others and candidates:
+                pipe = redis_client.pipeline(transaction=False)
+                for other_key in others:
+                    pipe.zmscore(other_key, [task_id for _, task_id in candidates])
+                memberships = await pipe.execute()
+                candidates = [
+                    candidate for position, candidate in enumerate(candidates)
+                    if all(scores[position] is not None for scores in memberships)
+                ]
+            results.extend(candidates)
+
+            if len(items) < chunk:
+                break
+        return results[:limit]
+
+    async def stats_summary(self) -> Dict[str, Any]:
+        """Totales por clase de error, función y tipo de worker"""
+        totals = {"total": 0, "by_error_class": defaultdict(int), "by_function": defaultdict(int),
+                  "by_worker_type": defaultdict(int)}
+        worker_types = self._worker_types()
+        for partition in range(self.manager.partition_count):
+            redis_client = self.manager._select_redis_node(partition)
+            if redis_client is None:
+                continue
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.zcard(dlq_index_key(partition, "time"))
+            pipe.smembers(dlq_index_key(partition, "errors"))
+            pipe.smembers(dlq_index_key(partition, "funcs"))
+            total, errors, funcs = await pipe.execute()
+            totals["total"] += total
+
+            errors = [_to_str(e) for e in errors]
+            funcs = [_to_str(f) for f in funcs]
+            pipe = redis_client.pipeline(transaction=False)
+            for error_class in errors:
+                pipe.zcard(dlq_index_key(partition, "error", error_class))
+            for func_name in funcs:
+                pipe.zcard(dlq_index_key(partition, "func", func_name))
+            for worker_type_value in worker_types:
+                pipe.zcard(dlq_index_key(partition, "worker", worker_type_value))
+            counts = await pipe.execute()
+            for name, count in zip(errors, counts[:len(errors)]):
+                totals["by_error_class"][name] += count
+            for name, count in zip(funcs, counts[len(errors):len(errors) + len(funcs)]):
+                totals["by_function"][name] += count
+            for name, count in zip(worker_types, counts[len(errors) + len(funcs):]):
+                totals["by_worker_type"][name] += count
+
+        return {
+            "total": totals["total"],
+            **{key: {k: v for k, v in value.items() if v} for key, value in totals.items() if key != "total"}
+        }
+
+    # Replay
+
+    async def replay(self,
+                     error_class: str = None,
+                     func_name: str = None,
+                     worker_type: str = None,
+                     since: float = None,
+                     until: float = None,
+                     max_tasks: Optional[int] = None,
+                     rate_per_second: Optional[float] = None,
+                     batch_size: int = 500) -> Dict[str, Any]:
+        """
+        Reencolar las entradas que cumplen los filtros, por lotes pipelined
+
+        Partición a partición: con varios filtros la intersección de sus índices
+        se calcula una sola vez (ZINTERSTORE en index:tmp:<uuid>, con TTL) y se
+        vacía por lotes; con uno se lee su índice, del que requeue va quitando lo
+        reencolado. Cada lote lee solo los ids que se van a reencolar, así que el
+        coste total es O(n) en tareas reencoladas (más una intersección por
+        partición). rate_per_second limita el ritmo para no saturar a los
+        workers tras una caída.
+        """
+        indexes = self._filter_indexes(error_class, func_name, worker_type)
+        max_bound = _score_bound(until if until is not None else float("inf"))
+        min_bound = _score_bound(since if since is not None else float("-inf"))
+        replayed = 0
+        batches = 0
+        started_at = time.time()
+
+        for partition in self._available_partitions():
+            if max_tasks is not None and replayed >= max_tasks:
+                break
+            redis_client = self.manager._select_redis_node(partition)
+            index_keys = [dlq_index_key(partition, *index) for index in indexes]
+            drain_key = index_keys[0]
+            if len(index_keys) > 1:
+                drain_key = dlq_index_key(partition, "tmp", uuid.uuid4().hex)
+                pipe = redis_client.pipeline(transaction=False)
+                pipe.zinterstore(drain_key, index_keys, aggregate="MAX")
+                pipe.expire(drain_key, 300)  # Por si este proceso muere antes del DEL
+                await pipe.execute()
+                self.stats["intersections"] += 1
+
+            try:
+                while max_tasks is None or replayed < max_tasks:
+                    size = batch_size if max_tasks is None else min(batch_size, max_tasks - replayed)
+                    task_ids = await redis_client.zrevrangebyscore(drain_key, max_bound, min_bound, start=0, num=size)
+                    if not task_ids:
+                        break
+
+                    batch_started = time.time()
+                    records = list((await self._load(redis_client, partition, task_ids)).values())
+                    if drain_key not in index_keys:
+                        await redis_client.zrem(drain_key, *task_ids)
+                    if records:
+                        await self.requeue(records)
+                        replayed += len(records)
+                        batches += 1
+
+                    if rate_per_second:
+                        await asyncio.sleep(max(0.0, len(records) / rate_per_second - (time.time() - batch_started)))
+                    if len(task_ids) < size:
+                        break
+                    if drain_key in index_keys and len(records) < len(task_ids):
+                        # Ids sin payload en un índice real: requeue no los quita, se limpian aquí
+                        await redis_client.zrem(drain_key, *task_ids)
+            finally:
+                if drain_key not in index_keys:
+                    await redis_client.delete(drain_key)
+
+        if replayed:
+            logger.info(f"🔄 Replay DLQ: {replayed} tareas reencoladas en {batches} lotes")
+        return {
+            "replayed": replayed,
+            "batches": batches,
+            "duration_seconds": round(time.time() - started_at, 3)
+        }
+
+    async def requeue(self, records: List[Dict[str, Any]]):
+        """Sacar registros de la DLQ y devolverlos a su cola (un pipeline por partición)"""
+        by_partition = defaultdict(list)
+        for record in records:
+            by_partition[self.manager._partition_for_task(record["id"])].append(record)
+
+        worker_types = set()
+        for partition, partition_records in by_partition.items():
+            redis_client = self.manager._select_redis_node(partition)
+            pipe = redis_client.pipeline(transaction=False)
+            for record in partition_records:
+                self._remove_entry(pipe, partition, record)
+                task_dict = {k: v for k, v in record.items() if k not in DLQ_FIELDS and k != "dlq_score"}
+                route = self.manager._task_route(task_dict)
+                pipe.zadd(route["queue_key"], {self.manager.codec.encode(task_dict): queue_score(time.time())})
+                worker_types.add(route["worker_type"])
+            await pipe.execute()
+
+        for record in records:
+            if record.get("graph"):
+                await self.manager.graph_engine.reopen(record["graph"])
+
+        redis_client = self.manager._coordinator_client()
+        for worker_type_value in worker_types:
+            await redis_client.publish(f"{NOTIFY_CHANNEL_PREFIX}{worker_type_value}", "dlq_replay")
+        self.stats["replayed"] += len(records)
+
+def _score_bound(score: float) -> str:
+    if score == float("inf"):
+        return "+inf"
+    if score == float("-inf"):
+        return "-inf"
+    return repr(score)
+
+def _to_str(value):
+    return value.decode() if isinstance(value, bytes) else value
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Ejecución de grafos de tareas (DAG) para el High Scale Task Manager
+Contadores de dependencias pendientes en Redis y liberación atómica de hijos
+"""
+
+import json
+import logging
+import uuid
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .task_partitioning import partition_tag
+
+logger = logging.getLogger("vokaflow.task_graph")
+
+GRAPH_KEY_FIELDS = ("meta", "pending", "children", "payloads", "routes", "results")
+
+# KEYS[1] = results, KEYS[2] = pending, KEYS[3] = children, KEYS[4] = meta
+# ARGV[1] = nodo completado, ARGV[2] = resultado (JSON), ARGV[3] = fecha de fin
+# Idempotente: una segunda ejecución del mismo nodo (lease reencolado) no libera nada.
+# Devuelve los hijos cuyo contador llegó a cero.
+COMPLETE_NODE_LUA = """
+if redis.call('HSETNX', KEYS[1], ARGV[1], ARGV[2]) == 0 then
+    return {}
+end
+local released = {}
+local children = redis.call('HGET', KEYS[3], ARGV[1])
+if children then
+    for _, child in ipairs(cjson.decode(children)) do
+        if redis.call('HINCRBY', KEYS[2], child, -1) == 0 then
+            released[#released + 1] = child
+        end
+    end
+end
+local completed = redis.call('HINCRBY', KEYS[4], 'completed', 1)
+if completed == tonumber(redis.call('HGET', KEYS[4], 'total'))
+        and redis.call('HGET', KEYS[4], 'status') == 'running' then
+    redis.call('HSET', KEYS[4], 'status', 'completed', 'finished_at', ARGV[3])
+end
+return released
+"""
+
+def graph_keys(graph_id: str, partition: int) -> Dict[str, str]:
+    """Claves del grafo, todas en el slot de su partición"""
+    return {
+        field: f"vokaflow:graph:{partition_tag(partition)}:{graph_id}:{field}"
+        for field in GRAPH_KEY_FIELDS
+    }
+
+def topological_order(node_names: Sequence[str], edges: Sequence[Tuple[str, str]]) -> List[str]:
+    """Orden topológico (Kahn); ValueError si hay nodos desconocidos o ciclos"""
+    children = defaultdict(list)
+    indegree = {name: 0 for name in node_names}
+    for parent, child in edges:
+        if parent not in indegree or child not in indegree:
+            raise ValueError(f"Arista con nodo desconocido: {parent} -> {child}")
+        children[parent].append(child)
+        indegree[child] += 1
+
+    ready = deque(name for name in node_names if indegree[name] == 0)
+    order = []
+    while ready:
+        name = ready.popleft()
+        order.append(name)
+        for child in children[name]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                ready.append(child)
+
+    if len(order) != len(indegree):
+        raise ValueError("El grafo de tareas contiene ciclos")
+    return order
+
+class TaskGraphEngine:
+    """
+    Motor de DAGs sobre HighScaleTaskManager
+
+    Las raíces se encolan al enviar el grafo; el resto espera serializado en
+    Redis con un contador de padres pendientes. Al completarse un nodo, un
+    script Lua guarda su resultado y decrementa los contadores de sus hijos en
+    una sola operación: los hijos que llegan a cero se encolan sin polling.
+    Los hijos reciben los resultados de sus padres por referencia (se leen del
+    hash del grafo al ejecutarse, no viajan copiados en cada mensaje).
+    """
+
+    def __init__(self, manager, ttl: int = 86400):
+        self.manager = manager
+        self.ttl = ttl
+        self.complete_scripts = {}
+        self.stats = defaultdict(int)
+
+    def _graph_location(self, graph_id: str):
+        partition = self.manager._partition_for_task(graph_id)
+        return self.manager._select_redis_node(partition), graph_keys(graph_id, partition)
+
+    async def submit(self, nodes: Dict[str, Dict[str, Any]], edges: Sequence[Tuple[str, str]]) -> Dict[str, Any]:
+        """
+        Enviar un grafo: nodes = {nombre: spec}, edges = [(padre, hijo), ...]
+
+        spec admite las mismas opciones que submit_task (func, args, kwargs, priority,
+        worker_type, name, category, max_retries, timeout...) y 'results_arg': nombre
+        del kwarg con el que el nodo recibe {padre: resultado} (por defecto 'parent_results').
+        """
+        order = topological_order(list(nodes), edges)
+        graph_id = uuid.uuid4().hex
+        redis_client, keys = self._graph_location(graph_id)
+        if redis_client is None:
+            raise Exception("La ejecución de grafos requiere Redis")
+
+        parents = defaultdict(list)
+        children = defaultdict(list)
+        for parent, child in edges:
+            parents[child].append(parent)
+            children[parent].append(child)
+
+        prepared = {}
+        for node_name in order:
+            spec = dict(nodes[node_name])
+            graph_ref = {
+                "id": graph_id,
+                "node": node_name,
+                "parents": parents[node_name],
+                "results_arg": spec.pop("results_arg", "parent_results")
+            }
+            prepared[node_name] = await self.manager._prepare_task(
+                spec.pop("func"), graph=graph_ref, **spec
+            )
+
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hset(keys["meta"], mapping={
+            "status": "running",
+            "total": len(order),
+            "completed": 0,
+            "failed": 0,
+            "created_at": datetime.now().isoformat(),
+            "task_ids": json.dumps({name: prepared[name]["task_id"] for name in order})
+        })
+        pipe.hset(keys["children"], mapping={name: json.dumps(children[name]) for name in order})
+        waiting = [name for name in order if parents[name]]
+        if waiting:
+            pipe.hset(keys["pending"], mapping={name: len(parents[name]) for name in waiting})
+            pipe.hset(keys["payloads"], mapping={name: prepared[name]["task_data"] for name in waiting})
+            pipe.hset(keys["routes"], mapping={name: json.dumps(prepared[name]["route"]) for name in waiting})
+        for key in keys.values():
+            pipe.expire(key, self.ttl)
+        await pipe.execute()
+
+        for node_name in order:
+            if not parents[node_name]:
+                await self.manager._enqueue_prepared(prepared[node_name]["route"], prepared[node_name]["task_data"])
+
+        self.stats["graphs_submitted"] += 1
+        logger.info(f"🕸️ Grafo {graph_id} enviado: {len(order)} nodos, {len(edges)} dependencias")
+        return {
+            "graph_id": graph_id,
+            "task_ids": {name: prepared[name]["task_id"] for name in order}
+        }
+
+    async def complete_node(self, graph_ref: Dict[str, Any], result: Any) -> List[str]:
+        """Registrar el resultado de un nodo y encolar los hijos liberados"""
+        graph_id = graph_ref["id"]
+        redis_client, keys = self._graph_location(graph_id)
+        node_name = self.manager._node_name_for_partition(self.manager._partition_for_task(graph_id))
+
+        script = self.complete_scripts.get(node_name)
+        if script is None:
+            script = redis_client.register_script(COMPLETE_NODE_LUA)
+            self.complete_scripts[node_name] = script
+
+        released = await script(
+            keys=[keys["results"], keys["pending"], keys["children"], keys["meta"]],
+            args=[graph_ref["node"], json.dumps(result, default=str), datetime.now().isoformat()]
+        )
+        released = [child.decode() if isinstance(child, bytes) else child for child in released or []]
+        if not released:
+            return []
+
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hmget(keys["payloads"], released)
+        pipe.hmget(keys["routes"], released)
+        payloads, routes = await pipe.execute()
+        for child, task_data, route in zip(released, payloads, routes):
+            if task_data is None or route is None:
+                logger.error(f"❌ Nodo {child} del grafo {graph_id} liberado sin payload (¿grafo expirado?)")
+                continue
+            await self.manager._enqueue_prepared(json.loads(route), task_data)
+        await redis_client.hdel(keys["payloads"], *released)
+
+        self.stats["nodes_released"] += len(released)
+        return released
+
+    async def fail_node(self, graph_ref: Dict[str, Any], error: str):
+        """Un nodo agotó sus reintentos: sus descendientes ya no se liberarán"""
+        redis_client, keys = self._graph_location(graph_ref["id"])
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrby(keys["meta"], "failed", 1)
+        pipe.hset(keys["meta"], mapping={
+            "status": "failed",
+            "failed_node": graph_ref["node"],
+            "error": error[:500],
+            "finished_at": datetime.now().isoformat()
+        })
+        await pipe.execute()
+        self.stats["graphs_failed"] += 1
+
+    async def reopen(self, graph_ref: Dict[str, Any]):
+        """Un nodo fallido vuelve a la cola desde la DLQ: el grafo sigue en curso"""
+        redis_client, keys = self._graph_location(graph_ref["id"])
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hset(keys["meta"], "status", "running")
+        pipe.hdel(keys["meta"], "failed_node", "error", "finished_at")
+        await pipe.execute()
+
+    async def parent_results(self, graph_ref: Dict[str, Any]) -> Dict[str, Any]:
+        """Resultados de los padres de un nodo (lectura por referencia)"""
+        parents = graph_ref.get("parents") or []
+        if not parents:
+            return {}
+        redis_client, keys = self._graph_location(graph_ref["id"])
+        values = await redis_client.hmget(keys["results"], parents)
+        return {
+            parent: json.loads(value) if value is not None else None
+            for parent, value in zip(parents, values)
+        }
+
+    async def status(self, graph_id: str) -> Optional[Dict[str, Any]]:
+        redis_client, keys = self._graph_location(graph_id)
+        if redis_client is None:
+            return None
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hgetall(keys["meta"])
+        pipe.hgetall(keys["pending"])
+        pipe.hkeys(keys["results"])
+        meta, pending, finished = await pipe.execute()
+        if not meta:
+            return None
+
+        meta = {_to_str(k): _to_str(v) for k, v in meta.items()}
+        task_ids = json.loads(meta.pop("task_ids", "{}"))
+        finished = {_to_str(name) for name in finished}
+        pending = {_to_str(k): int(v) for k, v in pending.items()}
+
+        nodes = {}
+        for name, task_id in task_ids.items():
+            if name in finished:
+                state = "completed"
+            elif name == meta.get("failed_node"):
+                state = "failed"
+            elif pending.get(name, 0) > 0:
+                state = "waiting"
+            else:
+                state = "queued"
+            nodes[name] = {"task_id": task_id, "state": state, "pending_parents": pending.get(name, 0)}
+
+        return {
+            "graph_id": graph_id,
+            **meta,
+            "total": int(meta.get("total", 0)),
+            "completed": int(meta.get("completed", 0)),
+            "failed": int(meta.get("failed", 0)),
+            "nodes": nodes
+        }
+
+def _to_str(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Leases con visibility timeout para tareas en ejecución
+Sorted set "inflight" por partición (score = expiración del lease en epoch ms),
+heartbeats de los workers y reaper que reencola los leases vencidos
+"""
+
+import hashlib
+import logging
+from typing import List, Optional, Tuple
+
+from .task_dequeue import parse_lua_pop
+
+logger = logging.getLogger("vokaflow.task_leases")
+
+# KEYS[1..n] = colas en orden de prioridad, KEYS[n+1..2n] = inflight de la partición de cada cola.
+# ARGV[1] = count, ARGV[2] = expiración del lease (ms), ARGV[3..n+2] = índice de cada cola en su partición.
+# Extrae de la primera cola no vacía y registra el lease en la misma operación atómica.
+# Devuelve {key, miembro_inflight1, score1, ...}: el miembro lleva índice y score para volver a su cola.
+POP_WITH_LEASE_LUA = """
+local n = #KEYS / 2
+local count = tonumber(ARGV[1])
+for i = 1, n do
+    local items = redis.call('ZPOPMIN', KEYS[i], count)
+    if #items > 0 then
+        local out = {KEYS[i]}
+        for j = 1, #items, 2 do
+            local member = ARGV[i + 2] .. '\\0' .. items[j + 1] .. '\\0' .. items[j]
+            redis.call('ZADD', KEYS[n + i], ARGV[2], member)
+            out[#out + 1] = member
+            out[#out + 1] = items[j + 1]
+        end
+        return out
+    end
+end
+return nil
+"""
+
+# KEYS[1] = inflight, KEYS[2] = intentos, KEYS[3..m+2] = colas de la partición,
+# KEYS[m+3..2m+2] = DLQ del tipo de worker de cada cola.
+# ARGV[1] = ahora (ms), ARGV[2] = límite por pasada, ARGV[3] = máximo de intentos.
+# Devuelve {muertas, índice_cola_reencolada1, ...}.
+REAP_EXPIRED_LEASES_LUA = """
+local m = (#KEYS - 2) / 2
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local dead = 0
+local out = {0}
+for i = 1, #expired do
+    local member = expired[i]
+    local sep1 = string.find(member, '\\0', 1, true)
+    local sep2 = string.find(member, '\\0', sep1 + 1, true)
+    local queue_index = tonumber(string.sub(member, 1, sep1 - 1))
+    local score = string.sub(member, sep1 + 1, sep2 - 1)
+    local payload = string.sub(member, sep2 + 1)
+    local digest = redis.sha1hex(payload)
+    local attempts = redis.call('HINCRBY', KEYS[2], digest, 1)
+    if attempts >= tonumber(ARGV[3]) then
+        redis.call('ZADD', KEYS[m + 3 + queue_index], tonumber(ARGV[1]) / 1000, payload)
+        redis.call('HDEL', KEYS[2], digest)
+        dead = dead + 1
+    else
+        redis.call('ZADD', KEYS[3 + queue_index], score, payload)
+        out[#out + 1] = queue_index
+    end
+    redis.call('ZREM', KEYS[1], member)
+end
+out[1] = dead
+return out
+"""
+
+def payload_digest(task_data: bytes) -> str:
+    """Clave del contador de intentos (igual que redis.sha1hex en el reaper)"""
+    if isinstance(task_data, str):
+        task_data = task_data.encode()
+    return hashlib.sha1(task_data).hexdigest()
+
+async def lease_pop(pop_script, queue_keys: List[str], inflight_keys: List[str],
+                    queue_indexes: List[int], count: int, lease_expiry_ms: int
+                    ) -> Optional[Tuple[str, List[Tuple[bytes, float]]]]:
+    """Pop atómico + lease: devuelve (queue_key, [(miembro_inflight, score), ...])"""
+    raw = await pop_script(
+        keys=list(queue_keys) + list(inflight_keys),
+        args=[count, lease_expiry_ms] + list(queue_indexes)
+    )
+    return parse_lua_pop(raw)
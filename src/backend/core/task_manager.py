@@ -9,14 +9,17 @@ import logging
 import json
 import time
 import uuid
+import heapq
+import itertools
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Callable, Any, Union
+from typing import Dict, List, Optional, Callable, Any, Union, Set
 from enum import Enum
 from dataclasses import dataclass, asdict
 from concurrent.futures import ThreadPoolExecutor
 import threading
 import queue
 import os
+from collections import OrderedDict
 
 logger = logging.getLogger("vokaflow.task_manager")
 
@@ -84,6 +87,135 @@ class Task:
         if self.depends_on is None:
             self.depends_on = []
 
+class ResultCache:
+    """LRU en proceso de los resultados recientes (lecturas sin ir a Redis)"""
+    
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self._items: "OrderedDict[str, TaskResult]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, task_id: str) -> Optional[TaskResult]:
+        with self._lock:
+            result = self._items.get(task_id)
+            if result is not None:
+                self._items.move_to_end(task_id)
+            return result
+    
+    def put(self, task_id: str, result: TaskResult):
+        with self._lock:
+            self._items[task_id] = result
+            self._items.move_to_end(task_id)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+    
+    def __contains__(self, task_id: str) -> bool:
+        with self._lock:
+            return task_id in self._items
+    
+    def items(self) -> List[tuple]:
+        with self._lock:
+            return list(self._items.items())
+    
+    def __len__(self) -> int:
+        return len(self._items)
+
+class ResultPersister:
+    """
+    Persistencia write-behind en Redis
+    
+    Los workers solo encolan (clave, campos); un hilo de fondo escribe en lotes
+    pipelined (HSET + EXPIRE por registro, un round trip por lote), vaciando por
+    tamaño o por tiempo. La cola está acotada: si Redis no da abasto, los
+    workers esperan (back-pressure) en lugar de acumular memoria sin límite.
+    stop() vacía todo lo pendiente antes de salir.
+    """
+    
+    _STOP = object()
+    
+    def __init__(self, redis_client, ttl: int = 86400, batch_size: int = 100,
+                 flush_interval: float = 0.05, max_pending: int = 10000):
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.thread = None
+        self.stats = {"enqueued": 0, "written": 0, "batches": 0, "errors": 0, "backpressure_waits": 0}
+    
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._flush_loop, name="ResultPersister", daemon=True)
+        self.thread.start()
+    
+    def enqueue(self, key: str, fields: Dict[str, Any]):
+        try:
+            self.pending.put_nowait((key, fields))
+        except queue.Full:
+            self.stats["backpressure_waits"] += 1
+            self.pending.put((key, fields))
+        self.stats["enqueued"] += 1
+    
+    def stop(self, timeout: float = 10.0):
+        """Vaciar lo pendiente y detener el hilo"""
+        if not self.thread:
+            return
+        self.pending.put(self._STOP)
+        self.thread.join(timeout=timeout)
+        if self.thread.is_alive():
+            logger.warning(f"⚠️ Persistencia de resultados no vaciada a tiempo ({self.pending.qsize()} pendientes)")
+        self.thread = None
+    
+    def _flush_loop(self):
+        stopping = False
+        while not stopping:
+            first = self.pending.get()
+            if first is self._STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self.pending.get(timeout=remaining) if remaining > 0 else self.pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+        
+        # Vaciado final: lo que quedara en la cola tras la señal de parada
+        leftovers = []
+        while True:
+            try:
+                item = self.pending.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                leftovers.append(item)
+        for start in range(0, len(leftovers), self.batch_size):
+            self._write(leftovers[start:start + self.batch_size])
+    
+    def _write(self, batch: List[tuple]):
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, fields in batch:
+                pipe.hset(key, mapping=fields)
+                pipe.expire(key, self.ttl)
+            pipe.execute()
+            self.stats["written"] += len(batch)
+            self.stats["batches"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Error persistiendo lote de {len(batch)} registros: {e}")
+
+def _encode_fields(data: Dict[str, Any]) -> Dict[str, str]:
+    """Valores de hash Redis: JSON por campo (None, dicts y resultados arbitrarios incluidos)"""
+    return {key: json.dumps(value, default=str) for key, value in data.items()}
+
 class VokaFlowTaskManager:
     """
     Gestor de tareas en segundo plano optimizado para VokaFlow
@@ -101,25 +233,34 @@ class VokaFlowTaskManager:
     def __init__(self, 
                  max_workers: int = 4,
                  enable_redis: bool = True,
-                 redis_url: str = "redis://localhost:6379/1"):
+                 redis_url: str = "redis://localhost:6379/1",
+                 result_cache_size: int = 10000):
         
         self.max_workers = max_workers
         self.enable_redis = enable_redis
         self.redis_url = redis_url
         
-        # Colas por prioridad
-        self.task_queues = {
-            TaskPriority.CRITICAL: queue.PriorityQueue(),
-            TaskPriority.HIGH: queue.PriorityQueue(),
-            TaskPriority.NORMAL: queue.PriorityQueue(),
-            TaskPriority.LOW: queue.PriorityQueue()
-        }
+        # Heap único multinivel: (-prioridad, secuencia FIFO, tarea); los workers
+        # duermen en la condición y submit despierta a uno solo (sin polling)
+        self.ready_heap: List[tuple] = []
+        self.ready_condition = threading.Condition()
+        self.queued_by_priority = {priority: 0 for priority in TaskPriority}
+        self._sequence = itertools.count()
         
         # Almacenamiento de tareas y resultados
         self.tasks: Dict[str, Task] = {}
-        self.results: Dict[str, TaskResult] = {}
+        self.results = ResultCache(result_cache_size)  # LRU; los más antiguos se leen de Redis
+        self.unfinished: Set[str] = set()  # Enviadas aquí y sin estado final: sin resultado que buscar en Redis
         self.scheduled_tasks: Dict[str, Task] = {}
         
+        # Timer: heap (vencimiento, secuencia, task_id, tarea); el scheduler duerme hasta el primero.
+        # Las entradas de tareas canceladas o reprogramadas se descartan al salir del heap.
+        self.timer_heap: List[tuple] = []
+        self.timer_condition = threading.Condition()
+        
+        # Tareas esperando dependencias: dependencia -> tareas a revisar cuando termine
+        self.dependents: Dict[str, set] = {}
+        
         # Workers y control
         self.workers: List[threading.Thread] = []
         self.executor = ThreadPoolExecutor(max_workers=max_workers)
@@ -132,10 +273,14 @@ class VokaFlowTaskManager:
             "queue_sizes": {}
         }
         
-        # Redis para persistencia (opcional)
+        # Redis para persistencia (opcional, write-behind)
         self.redis_client = None
+        self.persister = None
         if enable_redis:
             self._setup_redis()
+        if self.redis_client:
+            self.persister = ResultPersister(self.redis_client)
+            self.persister.start()
         
         # Scheduler para tareas programadas
         self.scheduler_thread = None
@@ -151,6 +296,7 @@ class VokaFlowTaskManager:
             logger.info("✅ Redis conectado para persistencia de tareas")
         except Exception as e:
             logger.warning(f"⚠️ Redis no disponible, usando memoria: {e}")
+            self.redis_client = None
             self.enable_redis = False
 
     def start(self):
@@ -161,6 +307,9 @@ class VokaFlowTaskManager:
         
         self.running = True
         
+        if self.persister:
+            self.persister.start()
+        
         # Iniciar workers
         for i in range(self.max_workers):
             worker = threading.Thread(
@@ -186,6 +335,12 @@ class VokaFlowTaskManager:
         logger.info("🛑 Deteniendo TaskManager...")
         self.running = False
         
+        # Despertar a los hilos dormidos para que vean running = False
+        with self.ready_condition:
+            self.ready_condition.notify_all()
+        with self.timer_condition:
+            self.timer_condition.notify_all()
+        
         # Esperar a que terminen los workers
         for worker in self.workers:
             worker.join(timeout=timeout/len(self.workers))
@@ -194,6 +349,10 @@ class VokaFlowTaskManager:
             self.scheduler_thread.join(timeout=5.0)
         
         self.executor.shutdown(wait=True)
+        
+        # Vaciado durable de los resultados pendientes
+        if self.persister:
+            self.persister.stop()
         logger.info("✅ TaskManager detenido")
 
     def submit_task(self,
@@ -244,14 +403,15 @@ class VokaFlowTaskManager:
             depends_on=depends_on or []
         )
         
+        self.tasks[task_id] = task
+        self.unfinished.add(task_id)
+        
         # Programar si hay delay
         if delay:
-            task.scheduled_for = datetime.now() + timedelta(seconds=delay)
-            self.scheduled_tasks[task_id] = task
+            self._schedule_task(task, datetime.now() + timedelta(seconds=delay))
         else:
             self._queue_task(task)
-        
-        self.tasks[task_id] = task
+
         self.stats["total_tasks"] += 1
         
         # Persistir en Redis si está disponible
@@ -263,22 +423,57 @@ class VokaFlowTaskManager:
 
     def _queue_task(self, task: Task):
         """Agrega una tarea a la cola apropiada"""
-        if self._check_dependencies(task):
-            priority_value = task.priority.value
-            timestamp = time.time()  # Para orden FIFO en misma prioridad
-            self.task_queues[task.priority].put((priority_value, timestamp, task))
-            self._update_queue_stats()
-        else:
-            # Re-programar si las dependencias no están listas
-            task.scheduled_for = datetime.now() + timedelta(seconds=5)
+        if task.depends_on:
+            # Comprobar y registrar bajo el lock: un resultado que llegue entre medias no se pierde
+            with self.timer_condition:
+                if not self._check_dependencies(task):
+                    # Esperar a que terminen las dependencias (se revisa al registrar cada resultado)
+                    task.scheduled_for = None
+                    self.scheduled_tasks[task.id] = task
+                    for dep_id in task.depends_on:
+                        self.dependents.setdefault(dep_id, set()).add(task.id)
+                    return
+        
+        with self.ready_condition:
+            # Secuencia para orden FIFO en misma prioridad
+            heapq.heappush(self.ready_heap, (-task.priority.value, next(self._sequence), task))
+            self.queued_by_priority[task.priority] += 1
+            self.ready_condition.notify()
+
+    def _schedule_task(self, task: Task, due: datetime):
+        """Programa una tarea para que pase a la cola en due"""
+        with self.timer_condition:
+            task.scheduled_for = due
             self.scheduled_tasks[task.id] = task
+            heapq.heappush(self.timer_heap, (due.timestamp(), next(self._sequence), task.id, task))
+            # Solo hace falta despertar al scheduler si esta tarea vence antes que la que espera
+            if self.timer_heap[0][3] is task:
+                self.timer_condition.notify()
+
+    def _release_dependents(self, task_id: str):
+        """Encolar las tareas que esperaban a task_id y ya tienen todas sus dependencias"""
+        with self.timer_condition:
+            waiting = [
+                self.scheduled_tasks[dependent_id]
+                for dependent_id in self.dependents.pop(task_id, ())
+                if dependent_id in self.scheduled_tasks and self.scheduled_tasks[dependent_id].scheduled_for is None
+            ]
+            ready = [task for task in waiting if self._check_dependencies(task)]
+            for task in ready:
+                del self.scheduled_tasks[task.id]
+        for task in ready:
+            self._queue_task(task)
 
     def _check_dependencies(self, task: Task) -> bool:
         """Verifica si las dependencias de una tarea están completadas"""
         for dep_id in task.depends_on:
-            if dep_id not in self.results:
-                return False
-            if self.results[dep_id].status != TaskStatus.COMPLETED:
+            result = self.results.get(dep_id)
+            if result is None:
+                if dep_id in self.unfinished:
+                    return False  # Aún pendiente aquí: no hay nada que leer de Redis
+                # Resultado expulsado del LRU o de otra instancia: lectura de Redis
+                result = self.get_task_status(dep_id)
+            if result is None or result.status != TaskStatus.COMPLETED:
                 return False
         return True
 
@@ -291,8 +486,7 @@ class VokaFlowTaskManager:
             try:
                 task = self._get_next_task()
                 if task is None:
-                    time.sleep(0.1)  # No hay tareas, esperar
-                    continue
+                    continue  # Despertado por stop()
                 
                 self.stats["active_workers"] += 1
                 self._execute_task(task)
@@ -304,26 +498,27 @@ class VokaFlowTaskManager:
         
         logger.debug(f"👷 Worker {worker_name} terminado")
 
-    def _get_next_task(self) -> Optional[Task]:
-        """Obtiene la siguiente tarea de mayor prioridad"""
-        # Revisar en orden de prioridad
-        for priority in [TaskPriority.CRITICAL, TaskPriority.HIGH, 
-                        TaskPriority.NORMAL, TaskPriority.LOW]:
-            try:
-                if not self.task_queues[priority].empty():
-                    _, _, task = self.task_queues[priority].get_nowait()
-                    self._update_queue_stats()
-                    return task
-            except queue.Empty:
-                continue
-        return None
+    def _get_next_task(self, timeout: Optional[float] = None) -> Optional[Task]:
+        """Obtiene la siguiente tarea de mayor prioridad (bloquea hasta que haya una o stop())"""
+        with self.ready_condition:
+            while self.running and not self.ready_heap:
+                if not self.ready_condition.wait(timeout):
+                    return None
+            if not self.ready_heap:
+                return None
+            _, _, task = heapq.heappop(self.ready_heap)
+            self.queued_by_priority[task.priority] -= 1
+            return task
 
     def _execute_task(self, task: Task):
         """Ejecuta una tarea individual"""
+        # Solo el LRU: los reintentos dejan ahí su resultado y la primera ejecución no tiene
+        previous = self.results.get(task.id)
         result = TaskResult(
             task_id=task.id,
             status=TaskStatus.RUNNING,
             start_time=datetime.now(),
+            retries=previous.retries if previous else 0,
             metadata={"category": task.category, "worker": threading.current_thread().name}
         )
         
@@ -361,41 +556,50 @@ class VokaFlowTaskManager:
                 
                 # Re-programar con delay exponencial
                 delay = task.retry_delay * (2 ** (result.retries - 1))
-                task.scheduled_for = datetime.now() + timedelta(seconds=delay)
-                self.scheduled_tasks[task.id] = task
+                self._schedule_task(task, datetime.now() + timedelta(seconds=delay))
                 
                 logger.info(f"🔄 Reintentando tarea {task.name} en {delay}s (intento {result.retries}/{task.max_retries})")
             else:
                 result.status = TaskStatus.FAILED
                 self.stats["failed_tasks"] += 1
         
-        self.results[task.id] = result
+        self.results.put(task.id, result)
+        if result.status != TaskStatus.RETRYING:
+            self.unfinished.discard(task.id)
+        
+        if result.status == TaskStatus.COMPLETED:
+            self._release_dependents(task.id)
         
         # Persistir resultado si Redis está disponible
         if self.redis_client:
             self._persist_result(result)
 
     def _scheduler_loop(self):
-        """Loop del programador de tareas"""
+        """Loop del programador de tareas: duerme exactamente hasta el próximo vencimiento"""
         logger.debug("📅 Scheduler iniciado")
         
         while self.running:
             try:
-                now = datetime.now()
-                tasks_to_schedule = []
-                
-                # Buscar tareas programadas listas para ejecutar
-                for task_id, task in list(self.scheduled_tasks.items()):
-                    if task.scheduled_for and task.scheduled_for <= now:
-                        tasks_to_schedule.append(task_id)
+                due_tasks = []
+                with self.timer_condition:
+                    now = time.time()
+                    while self.timer_heap and self.timer_heap[0][0] <= now:
+                        due_at, _, task_id, task = heapq.heappop(self.timer_heap)
+                        # Entrada obsoleta: tarea cancelada o reprogramada después
+                        if self.scheduled_tasks.get(task_id) is not task or task.scheduled_for is None \
+                                or task.scheduled_for.timestamp() != due_at:
+                            continue
+                        del self.scheduled_tasks[task_id]
+                        due_tasks.append(task)
+                    
+                    if not due_tasks:
+                        timeout = self.timer_heap[0][0] - now if self.timer_heap else None
+                        self.timer_condition.wait(timeout)
                 
-                # Mover tareas a las colas
-                for task_id in tasks_to_schedule:
-                    task = self.scheduled_tasks.pop(task_id)
+                # Mover tareas a las colas (fuera del lock del timer)
+                for task in due_tasks:
                     self._queue_task(task)
                 
-                time.sleep(1)  # Revisar cada segundo
-                
             except Exception as e:
                 logger.error(f"❌ Error en scheduler: {e}")
         
@@ -403,54 +607,70 @@ class VokaFlowTaskManager:
 
     def _update_queue_stats(self):
         """Actualiza estadísticas de las colas"""
-        self.stats["queue_sizes"] = {
-            priority.name: self.task_queues[priority].qsize()
-            for priority in TaskPriority
-        }
+        with self.ready_condition:
+            self.stats["queue_sizes"] = {
+                priority.name: count for priority, count in self.queued_by_priority.items()
+            }
 
     def _persist_task(self, task: Task):
-        """Persiste una tarea en Redis"""
-        try:
-            key = f"vokaflow:task:{task.id}"
-            data = {
-                "id": task.id,
-                "name": task.name,
-                "category": task.category,
-                "priority": task.priority.name,
-                "created_at": task.created_at.isoformat(),
-                "max_retries": task.max_retries
-            }
-            self.redis_client.hset(key, mapping=data)
-            self.redis_client.expire(key, 86400)  # 24 horas
-        except Exception as e:
-            logger.error(f"Error persistiendo tarea {task.id}: {e}")
+        """Persiste una tarea en Redis (write-behind)"""
+        data = {
+            "id": task.id,
+            "name": task.name,
+            "category": task.category,
+            "priority": task.priority.name,
+            "created_at": task.created_at.isoformat(),
+            "max_retries": task.max_retries
+        }
+        self.persister.enqueue(f"vokaflow:task:{task.id}", _encode_fields(data))
 
     def _persist_result(self, result: TaskResult):
-        """Persiste un resultado en Redis"""
+        """Persiste un resultado en Redis (write-behind)"""
+        self.persister.enqueue(f"vokaflow:result:{result.task_id}", _encode_fields(result.to_dict()))
+
+    def _load_result(self, task_id: str) -> Optional[TaskResult]:
+        """Leer un resultado persistido (fuera del LRU)"""
         try:
-            key = f"vokaflow:result:{result.task_id}"
-            self.redis_client.hset(key, mapping=result.to_dict())
-            self.redis_client.expire(key, 86400)  # 24 horas
+            raw = self.redis_client.hgetall(f"vokaflow:result:{task_id}")
         except Exception as e:
-            logger.error(f"Error persistiendo resultado {result.task_id}: {e}")
+            logger.error(f"Error leyendo resultado {task_id}: {e}")
+            return None
+        if not raw:
+            return None
+        try:
+            data = {key: json.loads(value) for key, value in raw.items()}
+        except ValueError:
+            return None  # Formato anterior (sin JSON por campo)
+        data["status"] = TaskStatus(data["status"])
+        for field in ("start_time", "end_time"):
+            if data.get(field):
+                data[field] = datetime.fromisoformat(data[field])
+        return TaskResult(**data)
 
     # API Pública
     
     def get_task_status(self, task_id: str) -> Optional[TaskResult]:
-        """Obtiene el estado de una tarea"""
-        return self.results.get(task_id)
+        """Obtiene el estado de una tarea (LRU en memoria, luego Redis)"""
+        result = self.results.get(task_id)
+        if result is None and self.redis_client:
+            result = self._load_result(task_id)
+            if result is not None:
+                self.results.put(task_id, result)
+        return result
 
     def cancel_task(self, task_id: str) -> bool:
         """Cancela una tarea (solo si no ha empezado)"""
-        if task_id in self.scheduled_tasks:
-            del self.scheduled_tasks[task_id]
-            
+        with self.timer_condition:
+            cancelled = self.scheduled_tasks.pop(task_id, None) is not None
+        if cancelled:
+            # Su entrada en el heap del timer se descarta al vencer
             result = TaskResult(
                 task_id=task_id,
                 status=TaskStatus.CANCELLED,
                 end_time=datetime.now()
             )
-            self.results[task_id] = result
+            self.results.put(task_id, result)
+            self.unfinished.discard(task_id)
             return True
         return False
 
@@ -461,7 +681,9 @@ class VokaFlowTaskManager:
             **self.stats,
             "scheduled_tasks": len(self.scheduled_tasks),
             "running": self.running,
-            "workers_count": len(self.workers)
+            "workers_count": len(self.workers),
+            "cached_results": len(self.results),
+            "persistence": dict(self.persister.stats, pending=self.persister.pending.qsize()) if self.persister else None
         }
 
     def list_tasks(self, 
@@ -472,6 +694,8 @@ class VokaFlowTaskManager:
         tasks = []
         
         for task_id, result in self.results.items():
+            if task_id not in self.tasks:
+                continue
             if category and self.tasks[task_id].category != category:
                 continue
             if status and result.status != status:
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Particionado de colas consciente de Redis Cluster
+Hash tags por partición, mapa partición -> nodo y migración de particiones
+"""
+
+import logging
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse
+
+from redis.crc import key_slot
+
+logger = logging.getLogger("vokaflow.task_partitioning")
+
+PARTITION_MAP_KEY = "vokaflow:partition_map"
+
+def partition_tag(partition: int) -> str:
+    """Hash tag de la partición: todas sus claves caen en el mismo slot del cluster"""
+    return f"{{p{partition:02d}}}"
+
+def queue_key(priority_name: str, worker_type_value: str, partition: int) -> str:
+    return f"vokaflow:queue:{partition_tag(partition)}:{priority_name}:{worker_type_value}"
+
+def dlq_key(worker_type_value: str, partition: int) -> str:
+    return f"vokaflow:dlq:{partition_tag(partition)}:{worker_type_value}"
+
+def delayed_key(partition: int) -> str:
+    """Tareas diferidas de la partición (score = epoch ms de vencimiento)"""
+    return f"vokaflow:delayed:{partition_tag(partition)}"
+
+def dlq_index_key(partition: int, *parts: str) -> str:
+    """Estructuras del DLQ indexado: index:tasks, index:time, index:error:<clase>..."""
+    return ":".join([f"vokaflow:dlq:{partition_tag(partition)}:index", *parts])
+
+def inflight_key(partition: int) -> str:
+    """Tareas en ejecución de la partición (score = epoch ms de expiración del lease)"""
+    return f"vokaflow:inflight:{partition_tag(partition)}"
+
+def lease_attempts_key(partition: int) -> str:
+    return f"vokaflow:lease_attempts:{partition_tag(partition)}"
+
+def result_key(task_id: str, partition: int) -> str:
+    return f"vokaflow:hs:result:{partition_tag(partition)}:{task_id}"
+
+def legacy_queue_key(priority_name: str, worker_type_value: str, partition: int) -> str:
+    """Formato anterior (sin hash tag), solo para migrar colas existentes"""
+    return f"vokaflow:queue:{priority_name}:{worker_type_value}:{partition}"
+
+def legacy_dlq_key(worker_type_value: str) -> str:
+    return f"vokaflow:dlq:{worker_type_value}"
+
+def queue_score(enqueued_at: float) -> float:
+    """Score de una tarea en su cola: instante de encolado (ZPOPMIN extrae la más antigua, FIFO)"""
+    return enqueued_at
+
+def score_enqueued_at(score: float, priority_value: int) -> float:
+    """Instante de encolado a partir del score (también del formato anterior: -t + prioridad * 10^6)"""
+    if score < 0:
+        return priority_value * 1000000 - score
+    return score
+
+def encode_queue_member(queue_index: int, queue_score: float, task_data) -> bytes:
+    """
+    Miembro con destino: "<índice de cola>\\0<score de cola>\\0<payload>"
+
+    El índice apunta a la lista fija de colas de la partición (prioridad x tipo),
+    así un script Lua puede devolver la tarea a su cola sin decodificarla.
+    """
+    if isinstance(task_data, str):
+        task_data = task_data.encode()
+    return f"{queue_index}\0{queue_score!r}\0".encode() + task_data
+
+def decode_queue_member(member: bytes) -> Tuple[int, float, bytes]:
+    """(queue_index, queue_score, task_data) de un miembro con destino"""
+    queue_index, queue_score, task_data = member.split(b"\0", 2)
+    return int(queue_index), float(queue_score), task_data
+
+def partition_slot(partition: int) -> int:
+    """Slot de Redis Cluster (CRC16 % 16384) que aloja una partición"""
+    return key_slot(partition_tag(partition).encode())
+
+def parse_node_url(node_url: str) -> Tuple[str, int]:
+    parsed = urlparse(node_url)
+    return parsed.hostname or "localhost", parsed.port or 6379
+
+class PartitionMap:
+    """
+    Asignación explícita partición -> nodo (URL) para despliegues multi-nodo
+    sin Redis Cluster. Se persiste en Redis para sobrevivir a cambios en el
+    número de nodos: el módulo `partition % len(nodes)` reubicaría casi todas
+    las particiones y dejaría tareas huérfanas en los nodos antiguos.
+    """
+
+    def __init__(self, partition_count: int, node_urls: List[str]):
+        self.partition_count = partition_count
+        self.assignments = {
+            partition: node_urls[partition % len(node_urls)]
+            for partition in range(partition_count)
+        }
+
+    @classmethod
+    def from_dict(cls, partition_count: int, data: Dict) -> "PartitionMap":
+        partition_map = cls.__new__(cls)
+        partition_map.partition_count = partition_count
+        partition_map.assignments = {
+            int(_to_str(partition)): _to_str(node_url) for partition, node_url in data.items()
+        }
+        return partition_map
+
+    def to_dict(self) -> Dict[str, str]:
+        return {str(partition): node_url for partition, node_url in self.assignments.items()}
+
+    def node_for(self, partition: int) -> str:
+        return self.assignments[partition]
+
+    def nodes(self) -> List[str]:
+        return sorted(set(self.assignments.values()))
+
+    def rebalance(self, node_urls: List[str]) -> List[Tuple[int, str, str]]:
+        """
+        Reasignar particiones a node_urls moviendo el mínimo posible
+
+        Returns:
+            Lista de movimientos (partition, nodo_origen, nodo_destino)
+        """
+        base, extra = divmod(self.partition_count, len(node_urls))
+
+        # Los nodos que ya tienen más particiones reciben las cuotas grandes
+        current_counts = {node_url: 0 for node_url in node_urls}
+        for node_url in self.assignments.values():
+            if node_url in current_counts:
+                current_counts[node_url] += 1
+        ranked = sorted(node_urls, key=lambda n: (-current_counts[n], node_urls.index(n)))
+        quotas = {node_url: base + (1 if i < extra else 0) for i, node_url in enumerate(ranked)}
+
+        new_assignments = {}
+        counts = {node_url: 0 for node_url in node_urls}
+        orphans = []
+        for partition in range(self.partition_count):
+            node_url = self.assignments.get(partition)
+            if node_url in quotas and counts[node_url] < quotas[node_url]:
+                new_assignments[partition] = node_url
+                counts[node_url] += 1
+            else:
+                orphans.append(partition)
+
+        moves = []
+        for partition in orphans:
+            target = next(n for n in ranked if counts[n] < quotas[n])
+            new_assignments[partition] = target
+            counts[target] += 1
+            moves.append((partition, self.assignments.get(partition), target))
+
+        self.assignments = new_assignments
+        return moves
+
+def _to_str(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+async def move_partition_key(source, target, key: str, batch_size: int = 500) -> int:
+    """Mover una clave zset, hash o set entre nodos (mismo criterio: copiar antes de borrar)"""
+    key_type = _to_str(await source.type(key))
+    ttl_ms = await source.pttl(key)
+    moved = 0
+    if key_type == "zset":
+        moved = await move_sorted_set(source, target, key, batch_size=batch_size)
+    elif key_type == "hash":
+        async for field, value in source.hscan_iter(key, count=batch_size):
+            await target.hset(key, field, value)
+            await source.hdel(key, field)
+            moved += 1
+    elif key_type == "set":
+        async for member in source.sscan_iter(key, count=batch_size):
+            await target.sadd(key, member)
+            await source.srem(key, member)
+            moved += 1
+    elif key_type != "none":
+        logger.warning(f"⚠️ Tipo de clave no migrable {key_type}: {key}")
+    if moved and ttl_ms and ttl_ms > 0:
+        await target.pexpire(key, ttl_ms)
+    return moved
+
+async def move_sorted_set(source, target, source_key: str, target_key: str = None,
+                          batch_size: int = 500) -> int:
+    """
+    Mover un sorted set entre nodos/claves por lotes (ZRANGE + ZADD + ZREM)
+
+    Se copia antes de borrar: si el proceso cae a mitad, un lote puede quedar
+    duplicado pero nunca se pierde. Debe ejecutarse cuando ningún worker
+    consume ya de source_key.
+    """
+    target_key = target_key or source_key
+    if source is target and source_key == target_key:
+        return 0
+    moved = 0
+    while True:
+        items = await source.zrange(source_key, 0, batch_size - 1, withscores=True)
+        if not items:
+            break
+        await target.zadd(target_key, {member: score for member, score in items})
+        await source.zrem(source_key, *[member for member, _ in items])
+        moved += len(items)
+    return moved
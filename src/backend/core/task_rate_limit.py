@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Rate limiting distribuido para el High Scale Task Manager
+GCRA (token bucket equivalente) en un único script Lua por comprobación,
+buckets por categoría y por tenant, y pre-fetch local de tokens
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger("vokaflow.task_rate_limit")
+
+# KEYS[i] = TAT (theoretical arrival time, µs) de cada bucket
+# ARGV[1] = tokens pedidos, ARGV[2i] = intervalo por token (µs), ARGV[2i+1] = ráfaga (tokens) del bucket i
+# Concede el máximo de tokens disponible en TODOS los buckets (0..pedidos) y los carga en todos.
+# Reloj del servidor (TIME): todas las réplicas comparten la misma referencia.
+# Devuelve {concedidos, µs hasta el siguiente token si faltaron}.
+GCRA_ACQUIRE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+local wanted = tonumber(ARGV[1])
+local granted = wanted
+local tats = {}
+for i = 1, #KEYS do
+    local interval = tonumber(ARGV[i * 2])
+    local tolerance = interval * tonumber(ARGV[i * 2 + 1])
+    local tat = tonumber(redis.call('GET', KEYS[i]) or now)
+    if tat < now then tat = now end
+    tats[i] = tat
+    local available = math.floor((now + tolerance - tat) / interval)
+    if available < granted then granted = math.max(available, 0) end
+end
+local retry_after = 0
+for i = 1, #KEYS do
+    local interval = tonumber(ARGV[i * 2])
+    local tolerance = interval * tonumber(ARGV[i * 2 + 1])
+    local tat = tats[i] + granted * interval
+    if granted > 0 then
+        redis.call('SET', KEYS[i], string.format('%.0f', tat), 'PX', math.ceil((tat - now) / 1000) + 1000)
+    end
+    if granted < wanted then
+        retry_after = math.max(retry_after, tat + interval - tolerance - now)
+    end
+end
+return {granted, math.ceil(retry_after)}
+"""
+
+def rate_limit_key(category: str, tenant: Optional[str] = None) -> str:
+    """Buckets de una categoría en el mismo slot: categoría y tenants se comprueban en un solo script"""
+    if tenant is None:
+        return f"vokaflow:{{rl:{category}}}:bucket"
+    return f"vokaflow:{{rl:{category}}}:tenant:{tenant}"
+
+class RateLimitExceeded(Exception):
+    """Límite de la categoría (o del tenant) agotado; retry_after en segundos"""
+
+    def __init__(self, category: str, tenant: Optional[str] = None, retry_after: float = 0.0):
+        scope = f"{category}/{tenant}" if tenant else category
+        super().__init__(f"Rate limit exceeded for category: {scope}")
+        self.category = category
+        self.tenant = tenant
+        self.retry_after = retry_after
+
+class DistributedRateLimiter:
+    """
+    Rate limiter global (todas las réplicas) sobre Redis
+
+    Cada comprobación es un EVALSHA del script GCRA contra el bucket de la
+    categoría y, si hay tenant, el suyo. Con tasas altas cada réplica reserva
+    de una vez los tokens de prefetch_window segundos y los consume en local:
+    un round trip por lote de admisiones. Los tokens reservados ya están
+    descontados en Redis, así que la tasa global nunca se supera (como mucho
+    se pierde capacidad si una réplica no llega a usar su reserva). Tras una
+    denegación la réplica no vuelve a consultar Redis hasta retry_after.
+    """
+
+    def __init__(self,
+                 manager,
+                 rate_limits: Dict[str, int] = None,
+                 tenant_rate_limits: Dict[str, int] = None,
+                 default_rate: int = 10000,
+                 burst_seconds: float = 1.0,
+                 prefetch_window: float = 0.05,
+                 max_prefetch: int = 1000,
+                 local_token_ttl: float = 1.0):
+        self.manager = manager
+        self.rate_limits = dict(rate_limits or {})
+        self.tenant_rate_limits = dict(tenant_rate_limits or {})
+        self.default_rate = default_rate
+        self.burst_seconds = burst_seconds
+        self.prefetch_window = prefetch_window
+        self.max_prefetch = max_prefetch
+        self.local_token_ttl = local_token_ttl
+        self.acquire_script = None
+
+        # (categoría, tenant) -> [tokens reservados, caducidad]; y -> denegado hasta
+        self.local_tokens: Dict[Tuple[str, Optional[str]], list] = {}
+        self.denied_until: Dict[Tuple[str, Optional[str]], float] = {}
+        self.refill_locks = defaultdict(asyncio.Lock)
+        self.stats = defaultdict(int)
+
+    def rate_for(self, category: str) -> int:
+        return self.rate_limits.get(category, self.default_rate)
+
+    def tenant_rate_for(self, category: str) -> Optional[int]:
+        """Tasa por tenant de la categoría ('default' aplica a todas las demás)"""
+        return self.tenant_rate_limits.get(category, self.tenant_rate_limits.get("default"))
+
+    def _buckets(self, category: str, tenant: Optional[str]) -> list:
+        """[(clave, tasa)] a comprobar juntos"""
+        buckets = [(rate_limit_key(category), self.rate_for(category))]
+        tenant_rate = self.tenant_rate_for(category) if tenant else None
+        if tenant_rate:
+            buckets.append((rate_limit_key(category, tenant), tenant_rate))
+        return buckets
+
+    def _prefetch_size(self, buckets: list) -> int:
+        slowest = min(rate for _, rate in buckets)
+        return max(1, min(self.max_prefetch, int(slowest * self.prefetch_window)))
+
+    async def acquire(self, category: str, tenant: Optional[str] = None) -> float:
+        """
+        Admitir una tarea: 0.0 si pasa; si no, segundos hasta el próximo token
+
+        Primero se consumen tokens locales; el script solo se ejecuta al agotarse.
+        """
+        bucket_id = (category, tenant)
+        now = time.monotonic()
+
+        if self._take_local(bucket_id, now):
+            self.stats["local_admissions"] += 1
+            return 0.0
+        if self.denied_until.get(bucket_id, 0.0) > now:
+            self.stats["local_denials"] += 1
+            return self.denied_until[bucket_id] - now
+
+        # Un solo refill por bucket en vuelo: el resto de corrutinas reutiliza su resultado
+        async with self.refill_locks[bucket_id]:
+            now = time.monotonic()
+            if self._take_local(bucket_id, now):
+                self.stats["local_admissions"] += 1
+                return 0.0
+            if self.denied_until.get(bucket_id, 0.0) > now:
+                self.stats["local_denials"] += 1
+                return self.denied_until[bucket_id] - now
+
+            buckets = self._buckets(category, tenant)
+            wanted = self._prefetch_size(buckets)
+            granted, retry_after_us = await self._acquire_remote(buckets, wanted)
+            self.stats["redis_round_trips"] += 1
+
+            if granted > 0:
+                # Uno se consume ahora; el resto queda reservado en local
+                if granted > 1:
+                    self.local_tokens[bucket_id] = [granted - 1, now + self.local_token_ttl]
+                self.stats["tokens_prefetched"] += granted - 1
+                self.stats["remote_admissions"] += 1
+                return 0.0
+
+            retry_after = retry_after_us / 1000000.0
+            self.denied_until[bucket_id] = now + retry_after
+            self.stats["remote_denials"] += 1
+            return retry_after
+
+    def _take_local(self, bucket_id, now: float) -> bool:
+        reserved = self.local_tokens.get(bucket_id)
+        if not reserved:
+            return False
+        if reserved[1] < now:
+            self.stats["tokens_expired"] += reserved[0]
+            del self.local_tokens[bucket_id]
+            return False
+        reserved[0] -= 1
+        if reserved[0] <= 0:
+            del self.local_tokens[bucket_id]
+        return True
+
+    async def _acquire_remote(self, buckets: list, wanted: int) -> Tuple[int, int]:
+        if self.acquire_script is None:
+            self.acquire_script = self.manager._coordinator_client().register_script(GCRA_ACQUIRE_LUA)
+
+        args = [wanted]
+        for _, rate in buckets:
+            args.append(1000000.0 / rate)
+            args.append(max(1, int(rate * self.burst_seconds)))
+        granted, retry_after_us = await self.acquire_script(keys=[key for key, _ in buckets], args=args)
+        return int(granted), int(retry_after_us)
+
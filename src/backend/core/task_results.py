@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Almacén de resultados de tareas para el High Scale Task Manager
+Resultado completo en un hash de Redis con TTL, payloads grandes fuera de línea
+y espera por pub/sub (sin polling) para long-poll y SSE
+"""
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from .task_dequeue import NOTIFY_CHANNEL_PREFIX
+from .task_partitioning import partition_tag, result_key
+
+logger = logging.getLogger("vokaflow.task_results")
+
+RESULT_NOTIFY_TYPE = "result"
+RESULT_CHANNEL = f"{NOTIFY_CHANNEL_PREFIX}{RESULT_NOTIFY_TYPE}"
+
+def result_blob_key(task_id: str, partition: int) -> str:
+    """Payload de resultado grande, fuera del hash (HGETALL del estado no lo arrastra)"""
+    return f"vokaflow:hs:result_blob:{partition_tag(partition)}:{task_id}"
+
+def encode_result_value(value: Any) -> Dict[str, str]:
+    """JSON si es posible; si no, repr textual marcado como tal"""
+    try:
+        return {"value": json.dumps(value), "value_encoding": "json"}
+    except (TypeError, ValueError):
+        return {"value": json.dumps(str(value)), "value_encoding": "str"}
+
+class TaskResultStore:
+    """
+    Resultados de tareas en Redis
+
+    Cada resultado es un hash (estado, tiempos, error y valor completo) con TTL.
+    Si el valor serializado supera inline_limit bytes se guarda en una clave
+    aparte y el hash solo lleva la referencia. Al escribir un resultado final se
+    publica el task_id en vokaflow:notify:result; los listeners de notificación
+    del manager despiertan a los waiters locales de ese task_id.
+    """
+
+    def __init__(self, manager, ttl: int = 3600, inline_limit: int = 64 * 1024):
+        self.manager = manager
+        self.ttl = ttl
+        self.inline_limit = inline_limit
+        self.waiters: Dict[str, List[asyncio.Future]] = defaultdict(list)
+        self.stats = defaultdict(int)
+
+    def add_to_pipeline(self, pipe, record: Dict[str, Any]):
+        """Añadir la escritura de un registro de completación a un pipeline del nodo de la tarea"""
+        task_id = record["task_id"]
+        partition = self.manager._partition_for_task(task_id)
+        key = result_key(task_id, partition)
+
+        fields = {k: v for k, v in record.items() if v is not None and k not in ("value", "final")}
+        fields["final"] = int(record.get("final", True))
+        if "value" in record:
+            encoded = encode_result_value(record["value"])
+            if len(encoded["value"]) > self.inline_limit:
+                blob_key = result_blob_key(task_id, partition)
+                pipe.set(blob_key, encoded["value"], ex=self.ttl)
+                fields["value_ref"] = blob_key
+                fields["value_size"] = len(encoded["value"])
+                fields["value_encoding"] = encoded["value_encoding"]
+                self.stats["out_of_line_results"] += 1
+            else:
+                fields.update(encoded)
+
+        pipe.delete(key)  # un intento anterior no debe dejar campos (error, value_ref...)
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, self.ttl)
+        if fields["final"]:
+            pipe.publish(RESULT_CHANNEL, task_id)
+
+    async def get_result(self, task_id: str, include_value: bool = True) -> Optional[Dict[str, Any]]:
+        partition = self.manager._partition_for_task(task_id)
+        redis_client = self.manager._select_redis_node(partition)
+        if redis_client is None:
+            return None
+
+        raw = await redis_client.hgetall(result_key(task_id, partition))
+        if not raw:
+            return None
+        record = {_to_str(k): _to_str(v) for k, v in raw.items()}
+        record["final"] = record.get("final", "1") == "1"
+        for numeric in ("processing_time", "priority", "value_size"):
+            if numeric in record:
+                record[numeric] = float(record[numeric]) if numeric == "processing_time" else int(record[numeric])
+
+        value_ref = record.pop("value_ref", None)
+        encoded = record.pop("value", None)
+        if include_value:
+            if value_ref:
+                encoded = _to_str(await redis_client.get(value_ref))
+            if encoded is not None:
+                record["value"] = json.loads(encoded)
+        return record
+
+    async def wait_for_result(self, task_id: str, timeout: float = 30.0) -> Optional[Dict[str, Any]]:
+        """
+        Esperar el resultado final de una tarea (None si vence el timeout)
+
+        El waiter se registra antes de consultar Redis: una publicación que llegue
+        entre la consulta y la espera no se pierde.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[task_id].append(future)
+        self.stats["waits"] += 1
+        try:
+            record = await self.get_result(task_id)
+            if record is not None and record["final"]:
+                return record
+            try:
+                await asyncio.wait_for(future, timeout=timeout)
+            except asyncio.TimeoutError:
+                self.stats["wait_timeouts"] += 1
+                return None
+            self.stats["wait_wakeups"] += 1
+            return await self.get_result(task_id)
+        finally:
+            waiters = self.waiters.get(task_id)
+            if waiters is not None:
+                if future in waiters:
+                    waiters.remove(future)
+                if not waiters:
+                    del self.waiters[task_id]
+
+    def notify(self, task_id: str):
+        """Llamado por el listener de notificaciones al recibir un task_id terminado"""
+        for future in self.waiters.get(task_id, ()):
+            if not future.done():
+                future.set_result(True)
+
+def _to_str(value):
+    return value.decode() if isinstance(value, bytes) else value
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Scheduler distribuido de tareas diferidas y recurrentes
+Sorted set "delayed" por partición (score = epoch ms) + script Lua atómico,
+ejecutado por un único líder elegido con lock distribuido
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from .task_dequeue import NOTIFY_CHANNEL_PREFIX
+from .task_partitioning import delayed_key, encode_queue_member
+
+logger = logging.getLogger("vokaflow.task_scheduler")
+
+SCHEDULER_LOCK_KEY = "scheduler_leader"
+SCHEDULER_NOTIFY_TYPE = "scheduler"
+RECURRING_KEY = "vokaflow:{scheduler}:recurring"          # schedule_id -> definición JSON
+RECURRING_DUE_KEY = "vokaflow:{scheduler}:recurring_due"  # schedule_id -> próxima ejecución (ms)
+
+# KEYS[1] = delayed de la partición, KEYS[2..] = colas de la partición.
+# Miembro: "<índice de cola>\0<score de cola>\0<payload>"; el índice apunta a KEYS[índice + 2].
+# Devuelve los índices de cola que recibieron tareas (para notificar a los workers).
+MOVE_DUE_TASKS_LUA = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local touched = {}
+for i = 1, #due do
+    local member = due[i]
+    local sep1 = string.find(member, '\\0', 1, true)
+    local sep2 = string.find(member, '\\0', sep1 + 1, true)
+    local queue_index = tonumber(string.sub(member, 1, sep1 - 1))
+    local score = string.sub(member, sep1 + 1, sep2 - 1)
+    redis.call('ZADD', KEYS[queue_index + 2], score, string.sub(member, sep2 + 1))
+    redis.call('ZREM', KEYS[1], member)
+    touched[#touched + 1] = queue_index
+end
+return touched
+"""
+
+class CronSchedule:
+    """
+    Expresión cron de 5 campos: minuto hora día-del-mes mes día-de-la-semana
+
+    Soporta '*', listas 'a,b', rangos 'a-b', pasos '*/n' y 'a-b/n'.
+    Domingo es 0 (también se acepta 7). Si día-del-mes y día-de-la-semana
+    están restringidos a la vez, basta con que coincida uno (semántica cron).
+    """
+
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Expresión cron inválida (se esperan 5 campos): {expression}")
+        self.expression = expression
+        parsed = [self._parse_field(field, low, high) for field, (low, high) in zip(fields, self.RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {0 if d == 7 else d for d in weekdays}
+        self.day_restricted = fields[2] != "*"
+        self.weekday_restricted = fields[4] != "*"
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> Set[int]:
+        values = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step_text = part.split("/", 1)
+                step = int(step_text)
+                if step <= 0:
+                    raise ValueError(f"Paso cron inválido: {field}")
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start, end = (int(v) for v in part.split("-", 1))
+            else:
+                start = end = int(part)
+                if step > 1:
+                    end = high
+            if start < low or end > high or start > end:
+                raise ValueError(f"Valor cron fuera de rango ({low}-{high}): {field}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.isoweekday() % 7) in self.weekdays
+        if self.day_restricted and self.weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        """Primer instante (al minuto) estrictamente posterior a moment que cumple la expresión"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                year = candidate.year + (1 if candidate.month == 12 else 0)
+                month = 1 if candidate.month == 12 else candidate.month + 1
+                candidate = candidate.replace(year=year, month=month, day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+        raise ValueError(f"La expresión cron no tiene próximas ejecuciones: {self.expression}")
+
+class DistributedTaskScheduler:
+    """
+    Scheduler de tareas diferidas para HighScaleTaskManager
+
+    Cualquier proceso puede programar tareas (ZADD en el sorted set delayed de la
+    partición). Solo el líder mueve las tareas vencidas a las colas de prioridad,
+    durmiendo exactamente hasta el próximo vencimiento (o hasta que llegue una
+    notificación de una tarea más temprana).
+    """
+
+    def __init__(self, manager, max_idle: float = 1.0, lease_seconds: int = 10, move_batch: int = 500):
+        self.manager = manager
+        self.instance_id = f"scheduler-{uuid.uuid4().hex[:12]}"
+        self.max_idle = max_idle
+        self.lease_seconds = lease_seconds
+        self.move_batch = move_batch
+        self.is_leader = False
+        self.move_scripts = {}
+        self.stats = {"moved_tasks": 0, "recurring_fired": 0, "leader_ticks": 0}
+
+    # Programación (cualquier proceso)
+
+    async def schedule(self, partition: int, queue_key: str, queue_score: float,
+                       task_data, due_at: float) -> None:
+        """Guardar una tarea serializada para que pase a queue_key en due_at (epoch s)"""
+        queue_index = self.manager.queue_routes[queue_key][1]
+        redis_client = self.manager._select_redis_node(partition)
+        await redis_client.zadd(
+            delayed_key(partition),
+            {encode_queue_member(queue_index, queue_score, task_data): int(due_at * 1000)}
+        )
+        # Despertar al líder por si esta tarea vence antes de su próximo tick
+        await redis_client.publish(f"{NOTIFY_CHANNEL_PREFIX}{SCHEDULER_NOTIFY_TYPE}", "")
+
+    async def schedule_recurring(self, definition: Dict[str, Any]) -> str:
+        """Registrar una tarea recurrente (definición serializable con 'cron')"""
+        cron = CronSchedule(definition["cron"])
+        schedule_id = definition.setdefault("schedule_id", str(uuid.uuid4()))
+        next_run = cron.next_after(datetime.now())
+        definition["next_run"] = next_run.isoformat()
+
+        redis_client = self.manager._coordinator_client()
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hset(RECURRING_KEY, schedule_id, json.dumps(definition))
+        pipe.zadd(RECURRING_DUE_KEY, {schedule_id: int(next_run.timestamp() * 1000)})
+        await pipe.execute()
+        return schedule_id
+
+    async def cancel_recurring(self, schedule_id: str) -> bool:
+        redis_client = self.manager._coordinator_client()
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hdel(RECURRING_KEY, schedule_id)
+        pipe.zrem(RECURRING_DUE_KEY, schedule_id)
+        removed, _ = await pipe.execute()
+        return bool(removed)
+
+    async def list_recurring(self) -> List[Dict[str, Any]]:
+        redis_client = self.manager._coordinator_client()
+        definitions = await redis_client.hgetall(RECURRING_KEY)
+        return [json.loads(data) for data in definitions.values()]
+
+    async def pending_delayed(self) -> int:
+        total = 0
+        for partition in range(self.manager.partition_count):
+            if self.manager._partition_unavailable(partition):
+                continue
+            total += await self.manager._select_redis_node(partition).zcard(delayed_key(partition))
+        return total
+
+    # Bucle del líder
+
+    async def run(self):
+        """Elección de líder + traslado de tareas vencidas"""
+        lock_key = SCHEDULER_LOCK_KEY
+        notifier = self.manager.queue_notifiers[SCHEDULER_NOTIFY_TYPE]
+
+        while self.manager.running:
+            try:
+                if self.is_leader:
+                    self.is_leader = await self.manager.renew_distributed_lock(
+                        lock_key, self.instance_id, self.lease_seconds
+                    )
+                else:
+                    self.is_leader = await self.manager.acquire_distributed_lock(
+                        lock_key, self.instance_id, self.lease_seconds
+                    )
+                    if self.is_leader:
+                        logger.info(f"👑 {self.instance_id} es el líder del scheduler")
+
+                if not self.is_leader:
+                    await asyncio.sleep(self.lease_seconds / 3)
+                    continue
+
+                generation = notifier.generation
+                await self._move_due_tasks()
+                await self._fire_recurring()
+                self.stats["leader_ticks"] += 1
+
+                # Dormir hasta el próximo vencimiento, sin superar el plazo de renovación del lease
+                next_due = await self._next_due_at()
+                sleep_for = min(self.max_idle, self.lease_seconds / 3)
+                if next_due is not None:
+                    sleep_for = max(0.0, min(sleep_for, next_due - time.time()))
+                if sleep_for > 0:
+                    await notifier.wait(generation, sleep_for)
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Error en scheduler distribuido: {e}")
+                await asyncio.sleep(1)
+
+        if self.is_leader:
+            await self.manager.release_distributed_lock(lock_key, self.instance_id)
+            self.is_leader = False
+
+    async def _move_due_tasks(self):
+        now_ms = int(time.time() * 1000)
+        touched_types = set()
+
+        for partition in range(self.manager.partition_count):
+            if self.manager._partition_unavailable(partition):
+                continue
+            node_name = self.manager._node_name_for_partition(partition)
+            script = self.move_scripts.get(node_name)
+            if script is None:
+                script = self.manager.redis_pools[node_name].register_script(MOVE_DUE_TASKS_LUA)
+                self.move_scripts[node_name] = script
+
+            queues = self.manager._partition_queues(partition)
+            keys = [delayed_key(partition)] + [key for _, key in queues]
+            touched = await script(keys=keys, args=[now_ms, self.move_batch])
+            for queue_index in touched or []:
+                touched_types.add(queues[int(queue_index)][0])
+            self.stats["moved_tasks"] += len(touched or [])
+
+        redis_client = self.manager._coordinator_client()
+        for worker_type_value in touched_types:
+            await redis_client.publish(f"{NOTIFY_CHANNEL_PREFIX}{worker_type_value}", "scheduler")
+
+    async def _fire_recurring(self):
+        redis_client = self.manager._coordinator_client()
+        now = datetime.now()
+        due_ids = await redis_client.zrangebyscore(RECURRING_DUE_KEY, "-inf", int(now.timestamp() * 1000))
+
+        for schedule_id in due_ids:
+            raw = await redis_client.hget(RECURRING_KEY, schedule_id)
+            if raw is None:
+                await redis_client.zrem(RECURRING_DUE_KEY, schedule_id)
+                continue
+
+            definition = json.loads(raw)
+            try:
+                await self.manager.submit_recurring_instance(definition)
+                self.stats["recurring_fired"] += 1
+            except Exception as e:
+                logger.error(f"❌ Error lanzando tarea recurrente {definition.get('name')}: {e}")
+
+            # Ejecuciones perdidas (caída del líder) no se recuperan en ráfaga: siguiente desde ahora
+            next_run = CronSchedule(definition["cron"]).next_after(now)
+            definition["next_run"] = next_run.isoformat()
+            definition["last_run"] = now.isoformat()
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hset(RECURRING_KEY, schedule_id, json.dumps(definition))
+            pipe.zadd(RECURRING_DUE_KEY, {schedule_id: int(next_run.timestamp() * 1000)})
+            await pipe.execute()
+
+    async def _next_due_at(self) -> Optional[float]:
+        """Próximo vencimiento (epoch s) entre todas las particiones y las recurrentes"""
+        candidates = []
+        for partition in range(self.manager.partition_count):
+            if self.manager._partition_unavailable(partition):
+                continue  # Nodo caído: sus vencimientos se recuperan al reconectar
+            first = await self.manager._select_redis_node(partition).zrange(
+                delayed_key(partition), 0, 0, withscores=True
+            )
+            if first:
+                candidates.append(first[0][1] / 1000.0)
+        first = await self.manager._coordinator_client().zrange(RECURRING_DUE_KEY, 0, 0, withscores=True)
+        if first:
+            candidates.append(first[0][1] / 1000.0)
+        return min(candidates) if candidates else None
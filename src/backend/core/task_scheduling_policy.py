@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Políticas de planificación entre prioridades para el High Scale Task Manager
+Prioridad estricta, weighted round-robin y deficit round-robin, aging de colas
+e histogramas de tiempo de espera por prioridad
+"""
+
+import bisect
+from enum import Enum
+from typing import Dict, List, Optional, Sequence
+
+class SchedulingPolicy(Enum):
+    """Orden en el que un pool de workers consulta las colas de prioridad"""
+    STRICT = "strict"                        # Siempre la prioridad más alta con tareas
+    WEIGHTED_ROUND_ROBIN = "wrr"             # Turnos proporcionales a los pesos
+    DEFICIT_ROUND_ROBIN = "drr"              # Tareas servidas proporcionales a los pesos
+
+# Pesos por defecto (índice = valor de TaskPriority): cada nivel recibe la mitad que el anterior
+DEFAULT_PRIORITY_WEIGHTS = (128, 64, 32, 16, 8, 4, 2, 1)
+
+# KEYS = por cada tipo de worker, sus colas desde el techo de aging hasta la prioridad más baja
+# ARGV[1] = score límite (encoladas antes de), ARGV[2] = máximo por cola, ARGV[3] = colas por grupo
+# Sube un nivel (KEYS[i] -> KEYS[i-1]) lo que lleva esperando más del umbral; conserva el score
+# (instante de encolado), así que la tarea entra por delante en la cola destino.
+PROMOTE_AGED_TASKS_LUA = """
+local group = tonumber(ARGV[3])
+local promoted = 0
+for base = 0, #KEYS - group, group do
+    for i = base + 2, base + group do
+        local aged = redis.call('ZRANGEBYSCORE', KEYS[i], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, tonumber(ARGV[2]))
+        for j = 1, #aged, 2 do
+            redis.call('ZADD', KEYS[i - 1], aged[j + 1], aged[j])
+            redis.call('ZREM', KEYS[i], aged[j])
+        end
+        promoted = promoted + #aged / 2
+    end
+end
+return promoted
+"""
+
+class PriorityScheduler:
+    """
+    Estado de la política de un pool de workers (un tipo de worker)
+
+    order() devuelve las prioridades en el orden en que deben consultarse; la
+    primera es el turno elegido por la política y el resto sigue el orden
+    estricto, así que un turno vacío nunca deja al worker parado (la política
+    es work-conserving). record() informa de qué prioridad sirvió realmente
+    y cuántas tareas: WRR cuenta turnos, DRR cuenta tareas (un lote de 16
+    tareas BACKGROUND consume 16 de su déficit).
+    """
+
+    def __init__(self, policy: SchedulingPolicy, priorities: Sequence[int],
+                 weights: Optional[Dict[int, int]] = None):
+        self.policy = policy
+        self.priorities = sorted(priorities)
+        weights = weights or {}
+        self.weights = {
+            p: max(1, int(weights.get(p, DEFAULT_PRIORITY_WEIGHTS[min(p, len(DEFAULT_PRIORITY_WEIGHTS) - 1)])))
+            for p in self.priorities
+        }
+        self.total_weight = sum(self.weights.values())
+        self.current = {p: 0 for p in self.priorities}   # WRR suave (pesos efectivos)
+        self.deficit = {p: 0 for p in self.priorities}   # DRR
+        self.pointer = 0
+        self.turns = {p: 0 for p in self.priorities}
+
+    def order(self) -> List[int]:
+        if self.policy == SchedulingPolicy.STRICT:
+            return list(self.priorities)
+
+        if self.policy == SchedulingPolicy.WEIGHTED_ROUND_ROBIN:
+            # Smooth WRR: reparte los turnos de cada nivel a lo largo del ciclo, sin ráfagas
+            for p in self.priorities:
+                self.current[p] += self.weights[p]
+            turn = max(self.priorities, key=lambda p: self.current[p])
+            self.current[turn] -= self.total_weight
+        else:
+            turn = self.priorities[self.pointer]
+            if self.deficit[turn] <= 0:
+                self.deficit[turn] += self.weights[turn]
+
+        self.turns[turn] += 1
+        return [turn] + [p for p in self.priorities if p != turn]
+
+    def record(self, turn: int, served: Optional[int], count: int):
+        """turn = primera prioridad de order(); served = prioridad que entregó tareas (None si ninguna)"""
+        if self.policy != SchedulingPolicy.DEFICIT_ROUND_ROBIN:
+            return
+        if served == turn:
+            self.deficit[turn] -= count
+            if self.deficit[turn] > 0:
+                return
+        else:
+            # Cola vacía en su turno: en DRR no acumula crédito
+            self.deficit[turn] = 0
+        self.pointer = (self.pointer + 1) % len(self.priorities)
+
+    def snapshot(self) -> Dict[str, Dict[int, int]]:
+        return {"weights": dict(self.weights), "turns": dict(self.turns)}
+
+class WaitTimeHistogram:
+    """Histograma de esperas en cola (segundos) con buckets fijos y percentiles aproximados"""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        seconds = max(0.0, seconds)
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        """Límite superior del bucket que contiene el percentil (max para el bucket abierto)"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.BUCKETS[index] if index < len(self.BUCKETS) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+            "buckets": {
+                (f"le_{bound}" if index < len(self.BUCKETS) else "inf"): bucket_count
+                for index, (bound, bucket_count) in enumerate(zip(self.BUCKETS + (None,), self.counts))
+            }
+        }
@@ -5,13 +5,15 @@ Gestión de tareas de alta escala con Redis distribuido
 """
 
 import asyncio
+import json
 import logging
+import time
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Union
 from enum import Enum
 
 from fastapi import APIRouter, HTTPException, Depends, Query, Path, Body, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field, validator
 
 # Importar el High Scale Task Manager
@@ -24,8 +26,11 @@ from src.backend.core.high_scale_task_manager import (
     get_scale_metrics,
     initialize_high_scale_system,
     shutdown_high_scale_system,
+    get_high_scale_manager,
     high_scale_task_manager
 )
+from src.backend.core.task_scheduler import CronSchedule
+from src.backend.core.task_rate_limit import RateLimitExceeded
 
 logger = logging.getLogger("vokaflow.routers.high_scale_tasks")
 
@@ -47,8 +52,11 @@ class TaskSubmissionRequest(BaseModel):
     worker_type: str = Field(default="GENERAL_PURPOSE", description="Tipo de worker especializado")
     name: Optional[str] = Field(None, description="Nombre personalizado para la tarea")
     category: str = Field(default="general", description="Categoría de la tarea")
+    tenant: Optional[str] = Field(None, description="Tenant que envía la tarea (límite propio por categoría)")
     max_retries: int = Field(default=3, ge=0, le=10, description="Número máximo de reintentos")
     timeout: Optional[float] = Field(None, ge=1, le=300, description="Timeout en segundos")
+    delay_seconds: Optional[float] = Field(None, gt=0, description="Ejecutar tras este retraso (segundos)")
+    scheduled_for: Optional[datetime] = Field(None, description="Ejecutar en esta fecha/hora (hora local)")
     
     @validator('priority')
     def validate_priority(cls, v):
@@ -68,6 +76,62 @@ class TaskSubmissionRequest(BaseModel):
             valid_types = [wt.name for wt in WorkerType]
             raise ValueError(f"Tipo de worker inválido. Opciones válidas: {valid_types}")
 
+class RecurringTaskRequest(BaseModel):
+    """Solicitud para registrar una tarea recurrente"""
+    function_name: str = Field(..., description="Nombre de la función a ejecutar (e.g., 'math.sqrt')")
+    cron: str = Field(..., description="Expresión cron de 5 campos (e.g., '*/5 * * * *')")
+    args: List[Any] = Field(default=[], description="Argumentos posicionales para la función")
+    kwargs: Dict[str, Any] = Field(default={}, description="Argumentos con nombre para la función")
+    priority: str = Field(default="NORMAL", description="Prioridad de la tarea")
+    worker_type: str = Field(default="GENERAL_PURPOSE", description="Tipo de worker especializado")
+    name: Optional[str] = Field(None, description="Nombre de la tarea recurrente")
+    category: str = Field(default="general", description="Categoría de la tarea")
+    
+    @validator('cron')
+    def validate_cron(cls, v):
+        CronSchedule(v)
+        return v
+    
+    @validator('priority')
+    def validate_priority(cls, v):
+        try:
+            TaskPriority[v.upper()]
+            return v.upper()
+        except KeyError:
+            valid_priorities = [p.name for p in TaskPriority]
+            raise ValueError(f"Prioridad inválida. Opciones válidas: {valid_priorities}")
+    
+    @validator('worker_type')
+    def validate_worker_type(cls, v):
+        try:
+            WorkerType[v.upper()]
+            return v.upper()
+        except KeyError:
+            valid_types = [wt.name for wt in WorkerType]
+            raise ValueError(f"Tipo de worker inválido. Opciones válidas: {valid_types}")
+
+class GraphNodeRequest(BaseModel):
+    """Nodo de un grafo de tareas"""
+    function_name: str = Field(..., description="Nombre de la función a ejecutar (e.g., 'math.sqrt')")
+    args: List[Any] = Field(default=[], description="Argumentos posicionales para la función")
+    kwargs: Dict[str, Any] = Field(default={}, description="Argumentos con nombre para la función")
+    priority: str = Field(default="NORMAL", description="Prioridad de la tarea")
+    worker_type: str = Field(default="GENERAL_PURPOSE", description="Tipo de worker especializado")
+    max_retries: int = Field(default=3, ge=0, le=10, description="Número máximo de reintentos")
+    timeout: Optional[float] = Field(None, ge=1, le=300, description="Timeout en segundos")
+    results_arg: str = Field(default="parent_results", description="Kwarg que recibe los resultados de los padres")
+
+class GraphSubmissionRequest(BaseModel):
+    """Solicitud para enviar un grafo (DAG) de tareas"""
+    nodes: Dict[str, GraphNodeRequest] = Field(..., description="Nodos del grafo por nombre")
+    edges: List[List[str]] = Field(default=[], description="Dependencias [padre, hijo]")
+    
+    @validator('edges')
+    def validate_edges(cls, v):
+        if any(len(edge) != 2 for edge in v):
+            raise ValueError("Cada arista debe ser [padre, hijo]")
+        return v
+
 class TaskSubmissionResponse(BaseModel):
     """Respuesta al enviar una tarea"""
     task_id: str
@@ -88,6 +152,12 @@ class TaskMetricsResponse(BaseModel):
     worker_pools: Dict[str, Any]
     redis_status: Dict[str, Any]
     recent_tasks: List[Dict[str, Any]]
+    dequeue: Dict[str, Any] = {}
+    batching: Dict[str, Any] = {}
+    scheduler: Dict[str, Any] = {}
+    scheduling: Dict[str, Any] = {}
+    leases: Dict[str, Any] = {}
+    rate_limits: Dict[str, Any] = {}
     timestamp: float
 
 class SystemControlRequest(BaseModel):
@@ -100,6 +170,18 @@ class DLQTaskResponse(BaseModel):
     total_tasks: int
     tasks: List[Dict[str, Any]]
     worker_types: List[str]
+    next_cursor: Optional[str] = None
+
+class DLQReplayRequest(BaseModel):
+    """Solicitud de replay masivo de la Dead Letter Queue"""
+    worker_type: Optional[str] = Field(None, description="Filtrar por tipo de worker")
+    error_class: Optional[str] = Field(None, description="Filtrar por clase de error (e.g., 'TimeoutError')")
+    function_name: Optional[str] = Field(None, description="Filtrar por función")
+    since: Optional[float] = Field(None, description="Fallos desde este instante (epoch s)")
+    until: Optional[float] = Field(None, description="Fallos hasta este instante (epoch s)")
+    max_tasks: Optional[int] = Field(None, ge=1, description="Máximo de tareas a reencolar")
+    rate_per_second: Optional[float] = Field(None, gt=0, description="Ritmo máximo de reencolado")
+    batch_size: int = Field(default=500, ge=1, le=5000, description="Tareas por lote pipelined")
 
 # Funciones de utilidad
 
@@ -159,15 +241,21 @@ async def submit_task(request: TaskSubmissionRequest):
             worker_type=worker_type,
             name=request.name,
             category=request.category,
+            tenant=request.tenant,
             max_retries=request.max_retries,
-            timeout=request.timeout
+            timeout=request.timeout,
+            delay=request.delay_seconds,
+            scheduled_for=request.scheduled_for
         )
         
         # Estimar tiempo de completación (básico)
         estimated_completion = None
         if request.timeout:
             from datetime import datetime, timedelta
-            estimated_completion = (datetime.now() + timedelta(seconds=request.timeout)).isoformat()
+            start = request.scheduled_for or datetime.now()
+            if request.delay_seconds:
+                start = datetime.now() + timedelta(seconds=request.delay_seconds)
+            estimated_completion = (start + timedelta(seconds=request.timeout)).isoformat()
         
         logger.info(f"🚀 Tarea enviada: {request.function_name} -> {task_id}")
         
@@ -178,6 +266,12 @@ async def submit_task(request: TaskSubmissionRequest):
             estimated_completion=estimated_completion
         )
         
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, int(e.retry_after + 0.999)))}
+        )
     except ValueError as e:
         logger.error(f"Error de validación: {e}")
         raise HTTPException(
@@ -224,6 +318,12 @@ async def get_system_metrics():
                 "memory_mode": metrics.get("memory_mode", {})
             },
             recent_tasks=metrics.get("recent_tasks", []),
+            dequeue=metrics.get("dequeue", {}),
+            batching=metrics.get("batching", {}),
+            scheduler=metrics.get("scheduler", {}),
+            scheduling=metrics.get("scheduling", {}),
+            leases=metrics.get("leases", {}),
+            rate_limits=metrics.get("rate_limits", {}),
             timestamp=metrics.get("timestamp", 0)
         )
         
@@ -333,41 +433,62 @@ async def control_system(request: SystemControlRequest):
             detail=f"Error ejecutando acción {request.action}: {str(e)}"
         )
 
+def _validate_worker_type(worker_type: Optional[str]) -> Optional[str]:
+    if not worker_type:
+        return None
+    try:
+        WorkerType[worker_type.upper()]
+        return worker_type.upper()
+    except KeyError:
+        valid_types = [wt.name for wt in WorkerType]
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tipo de worker inválido. Opciones válidas: {valid_types}"
+        )
+
+def _require_manager():
+    manager = get_high_scale_manager()
+    if manager is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sistema de alta escala no inicializado"
+        )
+    return manager
+
 @router.get("/dlq", response_model=DLQTaskResponse)
 async def get_dead_letter_queue_tasks(
     worker_type: Optional[str] = Query(None, description="Filtrar por tipo de worker"),
+    error_class: Optional[str] = Query(None, description="Filtrar por clase de error"),
+    function_name: Optional[str] = Query(None, description="Filtrar por función"),
+    since: Optional[float] = Query(None, description="Fallos desde este instante (epoch s)"),
+    until: Optional[float] = Query(None, description="Fallos hasta este instante (epoch s)"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto por la página anterior"),
     limit: int = Query(50, ge=1, le=500, description="Número máximo de tareas a retornar")
 ):
     """
-    Obtener tareas de Dead Letter Queue (tareas fallidas)
+    Obtener tareas de Dead Letter Queue (tareas fallidas), más recientes primero
+    
+    Paginación por cursor: se pasa next_cursor de la respuesta para la página siguiente.
     """
     try:
-        global high_scale_task_manager
-        
-        if high_scale_task_manager is None:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Sistema de alta escala no inicializado"
-            )
-        
-        # Validar worker_type si se proporciona
-        if worker_type:
-            try:
-                WorkerType[worker_type.upper()]
-                worker_type = worker_type.upper()
-            except KeyError:
-                valid_types = [wt.name for wt in WorkerType]
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Tipo de worker inválido. Opciones válidas: {valid_types}"
-                )
+        manager = _require_manager()
         
-        dlq_tasks = await high_scale_task_manager.get_dlq_tasks(worker_type, limit)
+        page = await manager.query_dlq(
+            worker_type=_validate_worker_type(worker_type),
+            error_class=error_class,
+            func_name=function_name,
+            since=since,
+            until=until,
+            limit=limit,
+            cursor=cursor
+        )
+        dlq_tasks = page["tasks"]
         
         return DLQTaskResponse(
             total_tasks=len(dlq_tasks),
             tasks=dlq_tasks,
-            worker_types=list(set(task.get("worker_type", "unknown") for task in dlq_tasks))
+            worker_types=list(set(task.get("worker_type", "unknown") for task in dlq_tasks)),
+            next_cursor=page["next_cursor"]
         )
         
     except HTTPException:
@@ -379,21 +500,52 @@ async def get_dead_letter_queue_tasks(
             detail=f"Error obteniendo tareas DLQ: {str(e)}"
         )
 
+@router.get("/dlq/stats")
+async def get_dead_letter_queue_stats():
+    """Totales de la DLQ por clase de error, función y tipo de worker"""
+    manager = _require_manager()
+    return await manager.get_dlq_stats()
+
+@router.post("/dlq/replay")
+async def replay_dead_letter_queue(request: DLQReplayRequest):
+    """
+    Reencolar en bloque las tareas de la DLQ que cumplen los filtros
+    
+    Lotes pipelined por partición; rate_per_second evita saturar a los workers.
+    """
+    try:
+        manager = _require_manager()
+        
+        result = await manager.replay_dlq(
+            worker_type=_validate_worker_type(request.worker_type),
+            error_class=request.error_class,
+            func_name=request.function_name,
+            since=request.since,
+            until=request.until,
+            max_tasks=request.max_tasks,
+            rate_per_second=request.rate_per_second,
+            batch_size=request.batch_size
+        )
+        return {"status": "success", **result}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error en replay de DLQ: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error en replay de DLQ: {str(e)}"
+        )
+
 @router.post("/dlq/{task_id}/retry")
 async def retry_dlq_task(task_id: str = Path(..., description="ID de la tarea a reintentar")):
     """
     Reintentar una tarea desde Dead Letter Queue
     """
     try:
-        global high_scale_task_manager
+        manager = _require_manager()
         
-        if high_scale_task_manager is None:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Sistema de alta escala no inicializado"
-            )
-        
-        success = await high_scale_task_manager.retry_dlq_task(task_id)
+        success = await manager.retry_dlq_task(task_id)
         
         if success:
             return {
@@ -416,6 +568,195 @@ async def retry_dlq_task(task_id: str = Path(..., description="ID de la tarea a
             detail=f"Error reintentando tarea DLQ: {str(e)}"
         )
 
+@router.get("/results/{task_id}")
+async def get_task_result(task_id: str = Path(..., description="ID de la tarea")):
+    """Resultado almacenado de una tarea (completo, sin truncar)"""
+    manager = get_high_scale_manager()
+    result = await manager.get_task_result(task_id) if manager else None
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Resultado de la tarea {task_id} no disponible"
+        )
+    return result
+
+@router.get("/results/{task_id}/wait")
+async def wait_task_result(
+    task_id: str = Path(..., description="ID de la tarea"),
+    timeout: float = Query(30.0, gt=0, le=120, description="Segundos máximos de espera")
+):
+    """
+    Long-poll: responde en cuanto la tarea termina (pub/sub, sin polling)
+    
+    Si vence el timeout devuelve 202 con status=pending; el cliente vuelve a llamar.
+    """
+    manager = get_high_scale_manager()
+    if manager is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sistema de alta escala no inicializado"
+        )
+    
+    result = await manager.wait_for_result(task_id, timeout)
+    if result is None:
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"task_id": task_id, "status": "pending"}
+        )
+    return result
+
+@router.get("/results/{task_id}/stream")
+async def stream_task_result(
+    task_id: str = Path(..., description="ID de la tarea"),
+    timeout: float = Query(300.0, gt=0, le=3600, description="Duración máxima del stream en segundos")
+):
+    """
+    Server-Sent Events: keepalive periódico y un evento 'result' al terminar la tarea
+    """
+    manager = get_high_scale_manager()
+    if manager is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sistema de alta escala no inicializado"
+        )
+    
+    async def event_stream():
+        deadline = time.time() + timeout
+        yield f"event: pending\ndata: {json.dumps({'task_id': task_id})}\n\n"
+        while time.time() < deadline:
+            result = await manager.wait_for_result(task_id, min(15.0, deadline - time.time()))
+            if result is not None:
+                yield f"event: result\ndata: {json.dumps(result, default=str)}\n\n"
+                return
+            yield ": keepalive\n\n"
+        yield f"event: timeout\ndata: {json.dumps({'task_id': task_id})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/graph")
+async def submit_task_graph(request: GraphSubmissionRequest):
+    """
+    Enviar un grafo de tareas (DAG)
+    
+    Cada nodo se encola cuando terminan todos sus padres; recibe sus resultados
+    en el kwarg indicado por results_arg.
+    """
+    manager = get_high_scale_manager()
+    if manager is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sistema de alta escala no inicializado"
+        )
+    
+    try:
+        nodes = {}
+        for node_name, node in request.nodes.items():
+            nodes[node_name] = {
+                "func": resolve_function_from_name(node.function_name),
+                "args": tuple(node.args),
+                "kwargs": node.kwargs,
+                "priority": TaskPriority[node.priority.upper()],
+                "worker_type": WorkerType[node.worker_type.upper()],
+                "max_retries": node.max_retries,
+                "timeout": node.timeout,
+                "results_arg": node.results_arg
+            }
+        
+        result = await manager.submit_graph(nodes, [tuple(edge) for edge in request.edges])
+        return {"status": "submitted", **result}
+        
+    except (ValueError, KeyError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ImportError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error enviando grafo de tareas: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error enviando grafo de tareas: {str(e)}"
+        )
+
+@router.get("/graph/{graph_id}")
+async def get_task_graph_status(graph_id: str = Path(..., description="ID del grafo")):
+    """Estado de un grafo de tareas y de cada uno de sus nodos"""
+    manager = get_high_scale_manager()
+    graph_status = await manager.get_graph_status(graph_id) if manager else None
+    if graph_status is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Grafo {graph_id} no encontrado"
+        )
+    return graph_status
+
+@router.post("/recurring")
+async def create_recurring_task(request: RecurringTaskRequest):
+    """
+    Registrar una tarea recurrente (cron)
+    
+    La lanza el líder del scheduler distribuido en cada vencimiento.
+    """
+    manager = get_high_scale_manager()
+    if manager is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sistema de alta escala no inicializado"
+        )
+    
+    try:
+        func = resolve_function_from_name(request.function_name)
+        schedule_id = await manager.schedule_recurring(
+            func,
+            request.cron,
+            args=tuple(request.args),
+            kwargs=request.kwargs,
+            priority=TaskPriority[request.priority],
+            worker_type=WorkerType[request.worker_type],
+            name=request.name,
+            category=request.category
+        )
+        return {
+            "status": "success",
+            "schedule_id": schedule_id,
+            "cron": request.cron,
+            "next_run": CronSchedule(request.cron).next_after(datetime.now()).isoformat()
+        }
+    except ImportError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Función no encontrada: {request.function_name}"
+        )
+    except Exception as e:
+        logger.error(f"Error registrando tarea recurrente: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error registrando tarea recurrente: {str(e)}"
+        )
+
+@router.get("/recurring")
+async def list_recurring_tasks():
+    """Listar tareas recurrentes registradas"""
+    manager = get_high_scale_manager()
+    if manager is None:
+        return {"total": 0, "recurring_tasks": []}
+    
+    recurring_tasks = await manager.list_recurring()
+    return {"total": len(recurring_tasks), "recurring_tasks": recurring_tasks}
+
+@router.delete("/recurring/{schedule_id}")
+async def cancel_recurring_task(schedule_id: str = Path(..., description="ID de la tarea recurrente")):
+    """Cancelar una tarea recurrente"""
+    manager = get_high_scale_manager()
+    if manager is None or not await manager.cancel_recurring(schedule_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Tarea recurrente {schedule_id} no encontrada"
+        )
+    return {"status": "success", "schedule_id": schedule_id}
+
 @router.get("/workers")
 async def get_worker_info():
     """
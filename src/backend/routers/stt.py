@@ -18,7 +18,7 @@ import hashlib
 
 # Importar servicios reales
 from src.backend.services.stt_service import stt_service, STTResult
-from src.backend.services.model_manager import model_manager
+from src.backend.services.model_manager import model_manager, ModelNotReady
 
 # Configuración de logging
 logger = logging.getLogger("vokaflow.stt")
@@ -232,7 +232,7 @@ async def transcribe_audio(
         logger.info(f"✅ Whisper STT completado en {response.processing_time:.3f}s con {stt_result.model_used}")
         return response
         
-    except HTTPException:
+    except (HTTPException, ModelNotReady):
         raise
     except Exception as e:
         logger.error(f"❌ Error en transcripción Whisper: {e}")
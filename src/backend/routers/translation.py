@@ -7,6 +7,7 @@ Servicios de traducción de texto y audio con soporte completo para múltiples i
 """
 
 import os
+import json
 import logging
 import asyncio
 import tempfile
@@ -14,17 +15,19 @@ from datetime import datetime
 from typing import Optional, Dict, Any, List
 from pathlib import Path
 
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse
-from pydantic import BaseModel, Field, validator
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Form, BackgroundTasks, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, validator
 from sqlalchemy.orm import Session
 
 # Importaciones locales
 from src.backend.database import get_db
 from src.backend.models import TranslationDB, UserDB
-from src.backend.services.translation_service import TranslationService
-from src.backend.services.stt_service import STTService
-from src.backend.services.tts_service import TTSService
+# Instancias compartidas: un solo batcher (y contador de carga) por proceso
+from src.backend.services.translation_service import translation_service
+from src.backend.services.stt_service import stt_service
+from src.backend.services.tts_service import tts_service
+from src.backend.services.model_manager import ModelNotReady
 from src.backend.auth import get_current_user_optional
 
 logger = logging.getLogger("vokaflow.translation")
@@ -32,16 +35,12 @@ logger = logging.getLogger("vokaflow.translation")
 # Crear router
 router = APIRouter()
 
-# Inicializar servicios
-translation_service = TranslationService()
-stt_service = STTService()
-tts_service = TTSService()
-
 # Modelos Pydantic
 class TranslationRequest(BaseModel):
     text: str = Field(..., min_length=1, max_length=5000, description="Texto a traducir")
     source_lang: str = Field("auto", description="Idioma origen (código ISO 639-1 o 'auto')")
     target_lang: str = Field(..., description="Idioma destino (código ISO 639-1)")
+    num_beams: Optional[int] = Field(None, ge=1, le=8, description="Haces de búsqueda (vacío = política adaptativa)")
     
     @validator('text')
     def validate_text(cls, v):
@@ -62,6 +61,9 @@ class TranslationRequest(BaseModel):
             raise ValueError(f'Código de idioma no soportado: {v}')
         return v
 
+class StreamTranslationRequest(TranslationRequest):
+    text: str = Field(..., min_length=1, max_length=200000, description="Documento a traducir frase a frase")
+
 class TranslationResponse(BaseModel):
     translated_text: str
     source_lang: str
@@ -120,7 +122,8 @@ async def translate_text(
         result = await translation_service.translate_text(
             text=request.text,
             source_lang=request.source_lang,
-            target_lang=request.target_lang
+            target_lang=request.target_lang,
+            num_beams=request.num_beams
         )
         
         processing_time = (datetime.now() - start_time).total_seconds()
@@ -145,10 +148,128 @@ async def translate_text(
         logger.info(f"Traducción completada en {processing_time:.2f}s")
         return response
         
+    except ModelNotReady:
+        raise
     except Exception as e:
         logger.error(f"Error en traducción de texto: {e}")
         raise HTTPException(status_code=500, detail=f"Error en traducción: {str(e)}")
 
+def _segment_event(index: int, total: int, sentence: str, separator: str, result) -> Dict[str, Any]:
+    return {
+        "index": index,
+        "total": total,
+        "source_text": sentence,
+        "translated_text": result.translated_text,
+        "separator": separator,
+        "confidence": result.confidence,
+        "cache_tier": result.cache_tier
+    }
+
+@router.post("/text/stream")
+async def translate_text_stream(request: StreamTranslationRequest):
+    """
+    Traducción de documentos por frases con Server-Sent Events
+    
+    Eventos: 'segment' por frase (en orden, con el separador original para
+    recomponer el documento) y 'done' con el texto completo
+    """
+    start_time = datetime.now()
+    source_lang = None if request.source_lang == "auto" else request.source_lang
+    segments = translation_service.translate_stream(
+        text=request.text,
+        source_lang=source_lang,
+        target_lang=request.target_lang,
+        num_beams=request.num_beams
+    )
+    
+    # La primera frase se espera aquí: si el modelo aún carga, el cliente recibe 503 + Retry-After
+    try:
+        first = await segments.__anext__()
+    except StopAsyncIteration:
+        raise HTTPException(status_code=400, detail="No hay texto que traducir")
+    
+    async def event_stream():
+        parts = []
+        try:
+            async for index, total, sentence, separator, result in _prepend(first, segments):
+                parts.append(result.translated_text + separator)
+                event = _segment_event(index, total, sentence, separator, result)
+                yield f"event: segment\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+        except ModelNotReady as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e), 'retry_after': e.retry_after})}\n\n"
+            return
+        except Exception as e:
+            logger.error(f"Error en traducción en streaming: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)}, ensure_ascii=False)}\n\n"
+            return
+        finally:
+            # Cliente desconectado: cancela las frases aún en traducción
+            await segments.aclose()
+        done = {
+            "segments": len(parts),
+            "translated_text": "".join(parts),
+            "processing_time": (datetime.now() - start_time).total_seconds()
+        }
+        yield f"event: done\ndata: {json.dumps(done, ensure_ascii=False)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def _prepend(first, iterator):
+    yield first
+    async for item in iterator:
+        yield item
+
+@router.websocket("/stream/ws")
+async def translate_stream_websocket(websocket: WebSocket):
+    """
+    Traducción en streaming por WebSocket
+    
+    Cada mensaje JSON del cliente ({text, source_lang, target_lang}) recibe
+    mensajes 'segment' en orden y un 'done'; la conexión admite varias peticiones
+    """
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                request = StreamTranslationRequest(**await websocket.receive_json())
+            except (ValidationError, ValueError, TypeError) as e:
+                await websocket.send_json({"event": "error", "error": str(e)})
+                continue
+            
+            start_time = datetime.now()
+            parts = []
+            try:
+                async for index, total, sentence, separator, result in translation_service.translate_stream(
+                    text=request.text,
+                    source_lang=None if request.source_lang == "auto" else request.source_lang,
+                    target_lang=request.target_lang,
+                    num_beams=request.num_beams
+                ):
+                    parts.append(result.translated_text + separator)
+                    await websocket.send_json({"event": "segment", **_segment_event(index, total, sentence, separator, result)})
+            except ModelNotReady as e:
+                await websocket.send_json({"event": "error", "error": str(e), "retry_after": e.retry_after})
+                continue
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                logger.error(f"Error en traducción en streaming (WebSocket): {e}")
+                await websocket.send_json({"event": "error", "error": str(e)})
+                continue
+            
+            await websocket.send_json({
+                "event": "done",
+                "segments": len(parts),
+                "translated_text": "".join(parts),
+                "processing_time": (datetime.now() - start_time).total_seconds()
+            })
+    except WebSocketDisconnect:
+        logger.info("Cliente de traducción en streaming desconectado")
+
 @router.post("/audio", response_model=AudioTranslationResponse)
 async def translate_audio(
     audio: UploadFile = File(..., description="Archivo de audio (WAV, MP3, M4A, FLAC)"),
@@ -262,7 +383,7 @@ async def translate_audio(
         logger.info(f"Traducción de audio completada en {processing_time:.2f}s")
         return response
         
-    except HTTPException:
+    except (HTTPException, ModelNotReady):
         raise
     except Exception as e:
         logger.error(f"Error en traducción de audio: {e}")
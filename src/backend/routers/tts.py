@@ -20,6 +20,7 @@ import hashlib
 
 # Importar servicio real
 from src.backend.services.tts_service import tts_service, TTSResult
+from src.backend.services.model_manager import ModelNotReady
 
 logger = logging.getLogger("vokaflow.tts")
 
@@ -162,7 +163,7 @@ async def synthesize_speech(
         logger.info(f"✅ XTTS TTS completado en {response.processing_time:.3f}s con {tts_result.model_used}")
         return response
         
-    except HTTPException:
+    except (HTTPException, ModelNotReady):
         raise
     except Exception as e:
         logger.error(f"❌ Error en síntesis XTTS: {e}")
@@ -216,6 +217,8 @@ async def batch_synthesize(
                     "status": "completed"
                 })
                 
+            except ModelNotReady:
+                raise
             except Exception as e:
                 logger.error(f"Error procesando texto {i}: {e}")
                 results.append({
@@ -233,7 +236,7 @@ async def batch_synthesize(
             "results": results
         }
         
-    except HTTPException:
+    except (HTTPException, ModelNotReady):
         raise
     except Exception as e:
         logger.error(f"Error en lote TTS: {e}")
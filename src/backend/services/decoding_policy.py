@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Política adaptativa de decodificación para NLLB
+Elige greedy o beam search según la longitud del texto y la presión de la
+cola, y acota max_new_tokens a partir de la longitud del origen
+"""
+
+import math
+import os
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+@dataclass(frozen=True)
+class DecodingParams:
+    """Parámetros de generate elegidos para una petición"""
+    num_beams: int
+    # override | short | pressure_high | pressure_medium | default (no cuenta al agrupar lotes)
+    reason: str = field(compare=False)
+    early_stopping: bool = True
+    use_cache: bool = True  # Reutiliza la KV-cache del decoder entre pasos
+    repetition_penalty: float = 1.1
+
+    def generate_kwargs(self) -> Dict[str, Any]:
+        return {
+            "num_beams": self.num_beams,
+            "early_stopping": self.early_stopping and self.num_beams > 1,
+            "use_cache": self.use_cache,
+            "repetition_penalty": self.repetition_penalty,
+            "do_sample": False
+        }
+
+class AdaptiveDecodingPolicy:
+    """
+    Greedy para textos cortos (el beam casi nunca cambia el resultado) y cuando
+    la cola crece; beam reducido con presión media; beam completo en reposo.
+    num_beams explícito en la petición siempre gana
+    """
+
+    def __init__(self, default_beams: int = 4, medium_beams: int = 2, short_chars: int = 40,
+                 pressure_medium: int = 8, pressure_high: int = 32,
+                 length_ratio: float = 1.6, length_margin: int = 16):
+        self.default_beams = default_beams
+        self.medium_beams = medium_beams
+        self.short_chars = short_chars
+        self.pressure_medium = pressure_medium
+        self.pressure_high = pressure_high
+        self.length_ratio = length_ratio
+        self.length_margin = length_margin
+        self.decisions: Counter = Counter()
+        self.beams: Counter = Counter()
+        self.generated_limits = {"requests": 0, "max_new_tokens_total": 0}
+
+    def choose(self, text: str, queue_depth: int, num_beams: Optional[int] = None) -> DecodingParams:
+        if num_beams is not None:
+            params = DecodingParams(num_beams=max(1, num_beams), reason="override")
+        elif queue_depth >= self.pressure_high:
+            params = DecodingParams(num_beams=1, reason="pressure_high")
+        elif len(text) <= self.short_chars:
+            params = DecodingParams(num_beams=1, reason="short")
+        elif queue_depth >= self.pressure_medium:
+            params = DecodingParams(num_beams=min(self.medium_beams, self.default_beams), reason="pressure_medium")
+        else:
+            params = DecodingParams(num_beams=self.default_beams, reason="default")
+        self.decisions[params.reason] += 1
+        self.beams[params.num_beams] += 1
+        return params
+
+    def max_new_tokens(self, source_tokens: int, max_length: int) -> int:
+        """Límite de salida proporcional al origen en lugar de max_length fijo"""
+        limit = min(max_length, math.ceil(source_tokens * self.length_ratio) + self.length_margin)
+        self.generated_limits["requests"] += 1
+        self.generated_limits["max_new_tokens_total"] += limit
+        return limit
+
+    def get_stats(self) -> Dict[str, Any]:
+        requests = self.generated_limits["requests"]
+        return {
+            "default_beams": self.default_beams,
+            "short_chars": self.short_chars,
+            "pressure_thresholds": {"medium": self.pressure_medium, "high": self.pressure_high},
+            "decisions": dict(self.decisions),
+            "num_beams": {str(beams): count for beams, count in sorted(self.beams.items())},
+            "avg_max_new_tokens": round(self.generated_limits["max_new_tokens_total"] / requests, 1) if requests else 0.0
+        }
+
+def policy_from_env() -> AdaptiveDecodingPolicy:
+    return AdaptiveDecodingPolicy(
+        default_beams=int(os.getenv("VOKAFLOW_DECODING_BEAMS", "4")),
+        medium_beams=int(os.getenv("VOKAFLOW_DECODING_MEDIUM_BEAMS", "2")),
+        short_chars=int(os.getenv("VOKAFLOW_DECODING_SHORT_CHARS", "40")),
+        pressure_medium=int(os.getenv("VOKAFLOW_DECODING_PRESSURE_MEDIUM", "8")),
+        pressure_high=int(os.getenv("VOKAFLOW_DECODING_PRESSURE_HIGH", "32")),
+        length_ratio=float(os.getenv("VOKAFLOW_DECODING_LENGTH_RATIO", "1.6")),
+        length_margin=int(os.getenv("VOKAFLOW_DECODING_LENGTH_MARGIN", "16"))
+    )
@@ -9,6 +9,8 @@ import re
 from typing import Tuple, Dict, List, Optional
 import time
 
+from .language_id import get_language_identifier
+
 logger = logging.getLogger("vokaflow.language_detection")
 
 class LanguageDetectionService:
@@ -54,6 +56,10 @@ class LanguageDetectionService:
             }
         }
         
+        # Identificador por n-gramas (None sin perfiles entrenados: se usan los patrones)
+        self.identifier = get_language_identifier()
+        self.candidates = tuple(self.supported_languages)
+        
         # Estadísticas de uso
         self.detection_stats = {
             "total_detections": 0,
@@ -76,6 +82,19 @@ class LanguageDetectionService:
         if not text or len(text.strip()) < 2:
             return "en", 0.3  # Default fallback
         
+        if self.identifier is not None:
+            detected_lang, confidence = self.identifier.identify(text, candidates=self.candidates)
+        else:
+            detected_lang, confidence = self._detect_with_patterns(text)
+        
+        # Actualizar estadísticas
+        self._update_stats(detected_lang, confidence)
+        
+        logger.debug(f"Idioma detectado: {detected_lang} (confianza: {confidence:.2f}) para texto: {text[:50]}...")
+        return detected_lang, confidence
+    
+    def _detect_with_patterns(self, text: str) -> Tuple[str, float]:
+        """Detección por caracteres especiales y palabras frecuentes"""
         text_lower = text.lower().strip()
         scores = {}
         
@@ -116,10 +135,6 @@ class LanguageDetectionService:
             else:
                 detected_lang, confidence = "en", 0.70
         
-        # Actualizar estadísticas
-        self._update_stats(detected_lang, confidence)
-        
-        logger.debug(f"Idioma detectado: {detected_lang} (confianza: {confidence:.2f}) para texto: {text[:50]}...")
         return detected_lang, confidence
     
     def detect_language_advanced(self, text: str, include_alternatives: bool = True) -> Dict:
@@ -165,6 +180,9 @@ class LanguageDetectionService:
     
     def _calculate_all_scores(self, text: str) -> Dict[str, float]:
         """Calcula puntuaciones para todos los idiomas"""
+        if self.identifier is not None:
+            return dict(self.identifier.rank(text, top_k=len(self.candidates), candidates=self.candidates))
+        
         text_lower = text.lower().strip()
         words = re.findall(r'\b\w+\b', text_lower)
         scores = {}
@@ -207,6 +225,7 @@ class LanguageDetectionService:
         return {
             "service_status": "active",
             "supported_languages": len(self.supported_languages),
+            "engine": "ngram" if self.identifier is not None else "patterns",
             "detection_stats": self.detection_stats.copy(),
             "top_languages": sorted(
                 self.detection_stats["language_counts"].items(),
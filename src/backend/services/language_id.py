@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Identificación de idioma por n-gramas de caracteres
+Los n-gramas (1-4 caracteres) del texto se agrupan por hash en un vector de
+tamaño fijo y se puntúan con un producto matriz-vector contra las
+log-probabilidades de cada idioma, precompiladas en un .npz
+
+Entrenamiento sobre un directorio local con un <idioma>.txt por idioma (una
+frase por línea; p. ej. Tatoeba, Leipzig o FLORES):
+    python -m src.backend.services.language_id --corpus-dir corpus/train --output /opt/vokaflow/models/langid/ngram_profiles.npz
+"""
+
+import argparse
+import logging
+import os
+import re
+import time
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("vokaflow.language_id")
+
+PROFILE_VERSION = 1
+DEFAULT_PROFILES_PATH = "/opt/vokaflow/models/langid/ngram_profiles.npz"
+NGRAM_ORDERS = (1, 2, 3, 4)
+MAX_CHARS = 1000  # Más texto apenas cambia el resultado y solo suma coste
+
+_NON_LETTERS = re.compile(r"[\W\d_]+")
+_MULTIPLIER = np.uint64(0x100000001B3)  # FNV-1a de 64 bits
+_FIBONACCI = np.uint64(0x9E3779B97F4A7C15)
+_ORDER_SEEDS = {n: np.uint64(0xCBF29CE484222325 + n * 0x9E3779B9) for n in range(1, 9)}
+
+# Bloques Unicode -> escritura; con la escritura se descartan idiomas imposibles antes de puntuar
+_SCRIPT_RANGES = [
+    (0x0041, 0x024F, "Latn"), (0x0370, 0x03FF, "Grek"), (0x0400, 0x052F, "Cyrl"), (0x0530, 0x058F, "Armn"),
+    (0x0590, 0x05FF, "Hebr"), (0x0600, 0x06FF, "Arab"), (0x0750, 0x077F, "Arab"), (0x0900, 0x097F, "Deva"),
+    (0x0980, 0x09FF, "Beng"), (0x0A00, 0x0A7F, "Guru"), (0x0A80, 0x0AFF, "Gujr"), (0x0B80, 0x0BFF, "Taml"),
+    (0x0C00, 0x0C7F, "Telu"), (0x0C80, 0x0CFF, "Knda"), (0x0D00, 0x0D7F, "Mlym"), (0x0D80, 0x0DFF, "Sinh"),
+    (0x0E00, 0x0E7F, "Thai"), (0x0E80, 0x0EFF, "Laoo"), (0x1000, 0x109F, "Mymr"), (0x10A0, 0x10FF, "Geor"),
+    (0x1100, 0x11FF, "Hang"), (0x1200, 0x139F, "Ethi"), (0x1780, 0x17FF, "Khmr"), (0x1E00, 0x1EFF, "Latn"),
+    (0x3040, 0x30FF, "Jpan"), (0x3400, 0x4DBF, "Hani"), (0x4E00, 0x9FFF, "Hani"), (0xAC00, 0xD7AF, "Hang"),
+    (0xF900, 0xFAFF, "Hani")
+]
+SCRIPTS = sorted({script for _, _, script in _SCRIPT_RANGES})
+_RANGE_STARTS = np.array([start for start, _, _ in _SCRIPT_RANGES], dtype=np.uint32)
+_RANGE_ENDS = np.array([end for _, end, _ in _SCRIPT_RANGES], dtype=np.uint32)
+_RANGE_SCRIPTS = np.array([SCRIPTS.index(script) for _, _, script in _SCRIPT_RANGES])
+
+def normalize(text: str) -> str:
+    """Minúsculas NFC, sin dígitos ni puntuación, con espacio en los extremos (bordes de palabra)"""
+    text = unicodedata.normalize("NFC", text[:MAX_CHARS]).lower()
+    return " " + _NON_LETTERS.sub(" ", text).strip() + " "
+
+def codepoints(normalized: str) -> np.ndarray:
+    return np.frombuffer(normalized.encode("utf-32-le"), dtype=np.uint32)
+
+def hash_ngrams(points: np.ndarray, bits: int, orders: Sequence[int] = NGRAM_ORDERS) -> np.ndarray:
+    """Bucket de cada n-grama (todas las posiciones y órdenes), vectorizado sobre el texto"""
+    values = points.astype(np.uint64)
+    buckets = []
+    for n in orders:
+        count = len(values) - n + 1
+        if count <= 0:
+            continue
+        h = np.full(count, _ORDER_SEEDS[n], dtype=np.uint64)
+        for k in range(n):
+            h = (h ^ values[k:k + count]) * _MULTIPLIER  # Desbordamiento = módulo 2^64
+        if n == 1:
+            h = h[values != 32]  # El espacio suelto no aporta nada
+        buckets.append((h * _FIBONACCI) >> np.uint64(64 - bits))
+    if not buckets:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate(buckets).astype(np.int64)
+
+def dominant_script(points: np.ndarray) -> Optional[str]:
+    """Escritura mayoritaria; kanji con algo de kana cuenta como japonés"""
+    slots = np.searchsorted(_RANGE_STARTS, points, side="right") - 1
+    valid = (slots >= 0) & (points <= _RANGE_ENDS[np.maximum(slots, 0)])
+    if not valid.any():
+        return None
+    counts = np.bincount(_RANGE_SCRIPTS[slots[valid]], minlength=len(SCRIPTS))
+    jpan, hani = SCRIPTS.index("Jpan"), SCRIPTS.index("Hani")
+    if counts[jpan] and counts[jpan] * 10 >= counts[hani]:
+        counts[jpan] += counts[hani]
+        counts[hani] = 0
+    return SCRIPTS[int(counts.argmax())]
+
+class NgramLanguageIdentifier:
+    """
+    Naive Bayes sobre n-gramas de caracteres con hashing
+
+    weights[bucket, idioma] = log P(bucket | idioma). La puntuación de un texto es
+    el producto de sus cuentas por bucket con esas filas; solo se leen las filas de
+    los buckets presentes (unos cientos), no la matriz entera
+    """
+
+    def __init__(self, weights: np.ndarray, languages: Sequence[str], scripts: Sequence[str],
+                 temperature: float = 1.0, orders: Sequence[int] = NGRAM_ORDERS, short_chars: int = 12):
+        buckets = weights.shape[0]
+        if buckets & (buckets - 1):
+            raise ValueError(f"El número de buckets debe ser potencia de 2 ({buckets})")
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self.bits = buckets.bit_length() - 1
+        self.languages = list(languages)
+        self.scripts = np.array(list(scripts))
+        self.temperature = temperature  # Calibración: logits = log-verosimilitud * temperature
+        self.orders = tuple(orders)
+        self.short_chars = short_chars
+        self.stats = {"detections": 0, "script_only": 0, "short_texts": 0, "empty": 0}
+
+    @classmethod
+    def from_file(cls, path: str, short_chars: int = 12) -> "NgramLanguageIdentifier":
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != PROFILE_VERSION:
+                raise ValueError(f"Versión de perfiles no soportada: {int(data['version'])}")
+            return cls(
+                data["weights"], [str(lang) for lang in data["languages"]], [str(s) for s in data["scripts"]],
+                temperature=float(data["temperature"]), orders=tuple(int(n) for n in data["orders"]),
+                short_chars=short_chars
+            )
+
+    def save(self, path: str, **metadata):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path, version=PROFILE_VERSION, weights=self.weights.astype(np.float16),
+            languages=np.array(self.languages), scripts=self.scripts, temperature=self.temperature,
+            orders=np.array(self.orders), **metadata
+        )
+
+    @lru_cache(maxsize=32)
+    def _candidate_mask(self, candidates: Optional[Tuple[str, ...]], script: Optional[str]) -> np.ndarray:
+        mask = np.ones(len(self.languages), dtype=bool)
+        if candidates is not None and np.isin(self.languages, candidates).any():
+            mask &= np.isin(self.languages, candidates)
+        if script is not None and (mask & (self.scripts == script)).any():
+            mask &= self.scripts == script  # Escritura sin ningún idioma entrenado: no se filtra
+        return mask
+
+    def log_likelihoods(self, points: np.ndarray) -> np.ndarray:
+        """Log-verosimilitud por idioma de un texto normalizado, sin filtrar por escritura"""
+        buckets = hash_ngrams(points, self.bits, self.orders)
+        if len(buckets) == 0:
+            return np.zeros(len(self.languages), dtype=np.float32)
+        indices, counts = np.unique(buckets, return_counts=True)
+        return counts.astype(np.float32) @ self.weights[indices]
+
+    def probabilities(self, text: str, candidates: Optional[Tuple[str, ...]] = None
+                      ) -> Tuple[np.ndarray, np.ndarray, int]:
+        """(probabilidades calibradas, máscara de candidatos, letras del texto)"""
+        points = codepoints(normalize(text))
+        mask = self._candidate_mask(candidates, dominant_script(points))
+        logits = np.where(mask, self.log_likelihoods(points) * self.temperature, -np.inf)
+        logits -= logits[mask].max()
+        probs = np.exp(logits)
+        return probs / probs.sum(), mask, int((points != 32).sum())
+
+    def identify(self, text: str, candidates: Optional[Tuple[str, ...]] = None,
+                 default: str = "en") -> Tuple[str, float]:
+        """(idioma, confianza); candidates limita la respuesta a esos idiomas"""
+        self.stats["detections"] += 1
+        probs, mask, letters = self.probabilities(text, candidates)
+        if letters == 0:
+            self.stats["empty"] += 1
+            return default, 0.3
+        best = int(probs.argmax())
+        confidence = float(probs[best])
+        if mask.sum() == 1:
+            # Escritura propia de un solo idioma (hangul, tailandés, georgiano...): no hay duda
+            self.stats["script_only"] += 1
+            return self.languages[best], 0.99
+        if letters < self.short_chars:
+            # Pocas letras: la calibración viene de frases completas, aquí se atenúa
+            self.stats["short_texts"] += 1
+            confidence *= 0.5 + 0.5 * letters / self.short_chars
+        return self.languages[best], min(0.99, confidence)
+
+    def rank(self, text: str, top_k: int = 3, candidates: Optional[Tuple[str, ...]] = None
+             ) -> List[Tuple[str, float]]:
+        probs, mask, letters = self.probabilities(text, candidates)
+        if letters == 0:
+            return []
+        order = [int(i) for i in np.argsort(-probs) if mask[i]][:top_k]
+        return [(self.languages[i], float(probs[i])) for i in order]
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            "engine": "ngram",
+            "languages": len(self.languages),
+            "buckets": self.weights.shape[0],
+            "orders": list(self.orders),
+            **self.stats
+        }
+
+# --- Instancia global -------------------------------------------------------------
+
+_identifier: Optional[NgramLanguageIdentifier] = None
+_identifier_checked = False
+
+def get_language_identifier() -> Optional[NgramLanguageIdentifier]:
+    """Identificador cargado desde VOKAFLOW_LANGID_PROFILES; None si no hay perfiles (se usan patrones)"""
+    global _identifier, _identifier_checked
+    if not _identifier_checked:
+        _identifier_checked = True
+        path = os.getenv("VOKAFLOW_LANGID_PROFILES", DEFAULT_PROFILES_PATH)
+        if not os.path.exists(path):
+            logger.info(f"ℹ️ Sin perfiles de n-gramas en {path}: detección de idioma por patrones")
+            return None
+        try:
+            _identifier = NgramLanguageIdentifier.from_file(
+                path, short_chars=int(os.getenv("VOKAFLOW_LANGID_SHORT_CHARS", "12"))
+            )
+            logger.info(f"✅ Identificación de idioma por n-gramas: {len(_identifier.languages)} idiomas ({path})")
+        except Exception as e:
+            logger.error(f"❌ Error cargando perfiles de idioma {path}: {e}")
+    return _identifier
+
+# --- Entrenamiento ----------------------------------------------------------------
+
+def read_corpus(corpus_dir: str, max_lines: int = 0) -> Dict[str, List[str]]:
+    """{idioma: frases} desde <corpus_dir>/<idioma>.txt"""
+    corpus = {}
+    for file_path in sorted(Path(corpus_dir).glob("*.txt")):
+        with open(file_path, encoding="utf-8") as f:
+            lines = [line.strip() for line in f if line.strip()]
+        corpus[file_path.stem] = lines[:max_lines] if max_lines else lines
+    return corpus
+
+def fit_temperature(identifier: NgramLanguageIdentifier, dev: Dict[str, List[str]]) -> float:
+    """Temperatura que minimiza la log-pérdida en el conjunto de validación"""
+    index = {lang: i for i, lang in enumerate(identifier.languages)}
+    rows, targets, masks = [], [], []
+    for lang, sentences in dev.items():
+        for sentence in sentences:
+            points = codepoints(normalize(sentence))
+            mask = identifier._candidate_mask(None, dominant_script(points))
+            if (points != 32).any() and mask[index[lang]]:
+                rows.append(identifier.log_likelihoods(points))
+                masks.append(mask)
+                targets.append(index[lang])
+    if not rows:
+        return 1.0
+    scores, masks, targets = np.stack(rows), np.stack(masks), np.array(targets)
+
+    def loss(temperature: float) -> float:
+        logits = np.where(masks, scores * temperature, -np.inf)
+        logits -= logits.max(axis=1, keepdims=True)
+        log_norm = np.log(np.exp(logits).sum(axis=1))
+        return float(np.mean(log_norm - logits[np.arange(len(targets)), targets]))
+
+    candidates = np.logspace(-3, 0.5, 36)
+    return float(min(candidates, key=loss))
+
+def train(corpus: Dict[str, List[str]], bits: int = 16, alpha: float = 0.1, dev_fraction: float = 0.1,
+          orders: Sequence[int] = NGRAM_ORDERS) -> Tuple[NgramLanguageIdentifier, Dict[str, List[str]]]:
+    """Perfiles por idioma + temperatura; devuelve también las frases apartadas para validación"""
+    languages = sorted(corpus)
+    buckets = 1 << bits
+    weights = np.zeros((buckets, len(languages)), dtype=np.float32)
+    scripts, dev = [], {}
+    step = max(2, round(1 / dev_fraction)) if dev_fraction > 0 else 0
+
+    for column, lang in enumerate(languages):
+        sentences = corpus[lang]
+        dev[lang] = sentences[::step] if step else []
+        train_sentences = [s for i, s in enumerate(sentences) if not step or i % step]
+        counts = np.zeros(buckets, dtype=np.float64)
+        script_counts: Dict[Optional[str], int] = {}
+        for sentence in train_sentences:
+            points = codepoints(normalize(sentence))
+            counts += np.bincount(hash_ngrams(points, bits, orders), minlength=buckets)
+            script = dominant_script(points)
+            script_counts[script] = script_counts.get(script, 0) + int((points != 32).sum())
+        # Suavizado aditivo: un n-grama nunca visto penaliza, pero no anula el idioma
+        weights[:, column] = np.log((counts + alpha) / (counts.sum() + alpha * buckets))
+        scripts.append((max(script_counts, key=script_counts.get) if script_counts else None) or "")
+        logger.info(f"📚 {lang}: {len(train_sentences)} frases, escritura {scripts[-1]}")
+
+    identifier = NgramLanguageIdentifier(weights, languages, scripts, orders=orders)
+    identifier.temperature = fit_temperature(identifier, dev)
+    return identifier, dev
+
+def main():
+    parser = argparse.ArgumentParser(description="Entrena perfiles de n-gramas para identificación de idioma")
+    parser.add_argument("--corpus-dir", required=True, help="Directorio con un <idioma>.txt por idioma")
+    parser.add_argument("--output", default=DEFAULT_PROFILES_PATH)
+    parser.add_argument("--bits", type=int, default=16, help="log2 del número de buckets")
+    parser.add_argument("--alpha", type=float, default=0.1, help="Suavizado aditivo")
+    parser.add_argument("--dev-fraction", type=float, default=0.1, help="Fracción apartada para calibrar")
+    parser.add_argument("--max-lines", type=int, default=0, help="Frases por idioma (0 = todas)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    start = time.perf_counter()
+    corpus = read_corpus(args.corpus_dir, args.max_lines)
+    if len(corpus) < 2:
+        parser.error(f"Se necesitan al menos dos idiomas en {args.corpus_dir}")
+    identifier, dev = train(corpus, args.bits, args.alpha, args.dev_fraction)
+    identifier.save(args.output, alpha=args.alpha, trained_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+
+    correct = sum(identifier.identify(s)[0] == lang for lang, sentences in dev.items() for s in sentences)
+    total = sum(len(sentences) for sentences in dev.values())
+    print(f"✅ {len(corpus)} idiomas, {1 << args.bits} buckets, temperatura {identifier.temperature:.4f}, "
+          f"{os.path.getsize(args.output) / 1e6:.1f} MB en {time.perf_counter() - start:.1f}s")
+    if total:
+        print(f"   Exactitud en validación: {correct / total:.4f} ({total} frases)")
+
+if __name__ == "__main__":
+    main()
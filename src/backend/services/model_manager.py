@@ -6,14 +6,23 @@ Maneja carga, cache y gestión eficiente de modelos locales
 
 import os
 import logging
+import contextlib
 import gc
+import hashlib
+import math
+import shutil
+import time
+import asyncio
 import torch
 import psutil
 from typing import Dict, Any, Optional, Union
 from pathlib import Path
 import threading
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timedelta
+from enum import Enum
 import json
 
 logger = logging.getLogger("vokaflow.model_manager")
@@ -31,9 +40,92 @@ class ModelInfo:
     memory_usage: float = 0.0  # GB
     is_gpu: bool = False
     config: Dict[str, Any] = None
+    size_bytes: int = 0        # Parámetros + buffers medidos al cargar
+    load_seconds: float = 0.0  # Coste de recarga (tiempo de carga medido)
+    hits: int = 0              # Accesos desde que se cargó
+    priority: float = 0.0      # Prioridad GreedyDual-Size-Frequency (se expulsa la menor)
+    language_table: Any = None  # NLLB: idioma -> token id, resuelto y validado al cargar
+    
+    @property
+    def device(self) -> str:
+        return "cuda" if self.is_gpu else "cpu"
+
+class ModelState(Enum):
+    """Estado de carga de un modelo"""
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+@dataclass
+class ModelLoadState:
+    """Progreso de la carga (o del último intento) de un modelo"""
+    state: ModelState
+    started_at: float
+    finished_at: Optional[float] = None
+    load_seconds: Optional[float] = None
+    error: Optional[str] = None
+
+class ModelAdmissionError(MemoryError):
+    """La carga no cabe en el presupuesto de memoria (ni expulsando modelos ni esperando)"""
+
+WEIGHT_FILE_SUFFIXES = (".safetensors", ".bin", ".pt", ".pth", ".ckpt", ".onnx")  # Orden de preferencia
+
+# Bytes por parámetro según la precisión de los pesos (en disco o ya cargados)
+DTYPE_BYTES = {"float32": 4, "float16": 2, "bfloat16": 2, "int8": 1}
+# Bytes por parámetro en memoria según el modo de inferencia: en int8/onnx solo las
+# Linear se cuantizan, los embeddings (una parte grande de NLLB) siguen en fp32
+INFERENCE_MODE_BYTES = {"fp32": 4.0, "fp16": 2.0, "int8": 1.6, "onnx": 1.6}
+
+def measure_model_bytes(model: Any) -> int:
+    """Bytes de parámetros y buffers de un módulo torch (los tensores compartidos cuentan una vez)"""
+    if model is None or not hasattr(model, "parameters"):
+        return 0
+    tensors = list(model.parameters())
+    if hasattr(model, "buffers"):
+        tensors.extend(model.buffers())
+    # Las capas con cuantización dinámica guardan pesos empaquetados fuera de parameters()
+    for module in model.modules() if hasattr(model, "modules") else ():
+        if hasattr(module, "_packed_params") and hasattr(module, "_weight_bias"):
+            tensors.extend(t for t in module._weight_bias() if t is not None)
+    seen = set()
+    total = 0
+    for tensor in tensors:
+        key = (str(tensor.device), tensor.data_ptr())
+        if key in seen:
+            continue
+        seen.add(key)
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+class ModelNotReady(Exception):
+    """El modelo se está cargando: el endpoint debe responder 503 con Retry-After"""
+    
+    def __init__(self, model_name: str, retry_after: int):
+        super().__init__(f"Modelo {model_name} cargándose, reintentar en {retry_after}s")
+        self.model_name = model_name
+        self.retry_after = retry_after
 
 class ModelManager:
-    """Gestor centralizado de modelos AI"""
+    """
+    Gestor centralizado de modelos AI
+    
+    Las cargas se ejecutan en un executor propio, nunca en el hilo del event loop
+    ni bajo un lock global: cada modelo tiene su lock de carga/descarga y las
+    peticiones concurrentes del mismo modelo comparten un único Future de carga
+    (single-flight). self.lock solo protege el registro y nunca se mantiene
+    durante una carga, así que un Whisper cargándose no bloquea el acceso a un
+    NLLB ya en memoria.
+    
+    Memoria: cada modelo cuenta los bytes de sus parámetros y buffers (medidos al
+    cargar) contra el presupuesto de su dispositivo. Antes de cargar se reserva
+    el tamaño estimado y se expulsan modelos por GreedyDual-Size-Frequency:
+    prioridad = L + accesos * segundos_de_carga / GB, se expulsa la menor y L
+    pasa a valer su prioridad (envejecimiento). Un modelo grande, barato de
+    recargar y poco usado sale antes que uno pequeño y caro. Si no cabe ni
+    expulsando, la carga espera admission_timeout a que se libere memoria y
+    después se rechaza con ModelAdmissionError; la primera carga de un modelo
+    (tamaño solo estimado) no se rechaza, se admite con un aviso y se mide.
+    """
     
     def __init__(self, models_dir: str = "/opt/vokaflow/models"):
         self.models_dir = Path(models_dir)
@@ -47,7 +139,8 @@ class ModelManager:
                 "tokenizer": "transformers.M2M100Tokenizer",
                 "device_map": "auto",
                 "torch_dtype": "torch.float16",
-                "trust_remote_code": True
+                "trust_remote_code": True,
+                "cpu_inference": os.getenv("VOKAFLOW_NLLB_CPU_MODE", "fp32")  # Sin GPU: fp32 | int8 | onnx (opt-in, ver nllb_cpu_benchmark)
             },
             "whisper-large-v3": {
                 "type": "stt",
@@ -70,10 +163,34 @@ class ModelManager:
                 "device": "cuda" if torch.cuda.is_available() else "cpu"
             }
         }
-        self.lock = threading.Lock()
-        self.max_memory_gb = 8.0  # Máximo 8GB en cache
+        self.lock = threading.Lock()  # Registro (modelos, estados, futures); nunca durante una carga
+        self.model_locks = defaultdict(threading.Lock)  # Carga/descarga de cada modelo
+        self.load_futures: Dict[str, Future] = {}
+        self.load_states: Dict[str, ModelLoadState] = {}
+        self.load_times: Dict[str, float] = {}  # Última carga medida (estimación de Retry-After)
+        self.converted_dir = Path(os.getenv("VOKAFLOW_CONVERTED_MODELS_DIR", str(self.models_dir / ".converted")))
+        self.load_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="vokaflow-model-load")
+        self.load_wait_timeout = float(os.getenv("VOKAFLOW_MODEL_WAIT_TIMEOUT", "5"))  # Espera de una petición antes del 503
+        self.default_load_seconds = 30.0
+        self.retry_failed_after = 30.0  # Un fallo reciente no se reintenta en cada petición
+        self.max_memory_gb = float(os.getenv("VOKAFLOW_MODEL_MEMORY_BUDGET_GB", "8"))  # Pesos en RAM
         self.unload_after_minutes = 30  # Descargar después de 30 min sin uso
         
+        # Presupuesto por dispositivo (bytes de modelos contabilizados, no RSS del proceso)
+        self.memory_budgets = {"cpu": int(self.max_memory_gb * 1024**3)}
+        if torch.cuda.is_available():
+            gpu_budget_gb = os.getenv("VOKAFLOW_MODEL_GPU_BUDGET_GB")
+            self.memory_budgets["cuda"] = (
+                int(float(gpu_budget_gb) * 1024**3) if gpu_budget_gb
+                else int(torch.cuda.get_device_properties(0).total_memory * 0.9)
+            )
+        self.memory_condition = threading.Condition(threading.RLock())  # Admisión: espera a que se libere memoria
+        self.reservations: Dict[str, tuple] = {}  # modelo -> (dispositivo, bytes estimados) de cargas en curso
+        self.model_bytes: Dict[str, int] = {}     # Último tamaño medido (estimación de la próxima carga)
+        self.gdsf_inflation = 0.0                 # L de GreedyDual: prioridad del último expulsado
+        self.admission_timeout = float(os.getenv("VOKAFLOW_MODEL_ADMISSION_TIMEOUT", "60"))
+        self.eviction_stats = defaultdict(int)
+        
         logger.info(f"ModelManager iniciado. Directorio: {self.models_dir}")
         logger.info(f"GPU disponible: {torch.cuda.is_available()}")
         if torch.cuda.is_available():
@@ -100,7 +217,9 @@ class ModelManager:
         current_time = datetime.now()
         to_unload = []
         
-        for name, model_info in self.loaded_models.items():
+        with self.lock:
+            loaded = list(self.loaded_models.items())
+        for name, model_info in loaded:
             if model_info.last_used:
                 minutes_unused = (current_time - model_info.last_used).total_seconds() / 60
                 if minutes_unused > self.unload_after_minutes:
@@ -110,41 +229,222 @@ class ModelManager:
             self.unload_model(name)
     
     def check_memory_and_cleanup(self):
-        """Verifica memoria y limpia si es necesario"""
-        current_memory = self.get_memory_usage()
+        """Expulsa modelos (GreedyDual-Size-Frequency) hasta que cada dispositivo cumpla su presupuesto"""
+        with self.memory_condition:
+            for device in self.memory_budgets:
+                self._evict_for(device, 0)
+    
+    def accounted_bytes(self, device: str) -> int:
+        """Bytes de modelos cargados y reservas de cargas en curso en un dispositivo"""
+        with self.lock:
+            loaded = sum(info.size_bytes for info in self.loaded_models.values() if info.device == device)
+        reserved = sum(size for reserved_device, size in self.reservations.values() if reserved_device == device)
+        return loaded + reserved
+    
+    def _gdsf_priority(self, model_info: ModelInfo) -> float:
+        size_gb = max(model_info.size_bytes / 1024**3, 0.01)
+        return self.gdsf_inflation + model_info.hits * max(model_info.load_seconds, 0.1) / size_gb
+    
+    def _evict_for(self, device: str, needed_bytes: int) -> bool:
+        """Expulsar por menor prioridad hasta que quepan needed_bytes (con memory_condition tomado)"""
+        budget = self.memory_budgets.get(device)
+        if budget is None:
+            return True
+        skipped = set()
+        while self.accounted_bytes(device) + needed_bytes > budget:
+            with self.lock:
+                candidates = sorted(
+                    (info for name, info in self.loaded_models.items()
+                     if info.device == device and name not in skipped),
+                    key=lambda info: info.priority
+                )
+            if not candidates:
+                return False
+            victim = candidates[0]
+            # Sin esperar: un modelo en plena carga/descarga no se toca (y no hay espera cruzada entre cargas)
+            if not self.unload_model(victim.name, blocking=False):
+                skipped.add(victim.name)
+                continue
+            self.gdsf_inflation = max(self.gdsf_inflation, victim.priority)
+            self.eviction_stats["evictions"] += 1
+            self.eviction_stats["evicted_bytes"] += victim.size_bytes
+            logger.info(f"♻️ Expulsado {victim.name} ({victim.size_bytes / 1024**3:.2f}GB, "
+                        f"prioridad {victim.priority:.2f}) para liberar memoria en {device}")
+        return True
+    
+    def estimate_model_bytes(self, model_name: str) -> int:
+        """
+        Tamaño previsto: el medido en la última carga o, si no, el de los pesos en disco
+        escalado a la precisión con la que se va a cargar
         
-        if current_memory > self.max_memory_gb:
-            logger.warning(f"Memoria alta: {current_memory:.2f}GB. Limpiando modelos...")
-            
-            # Ordenar por último uso (más antiguos primero)
-            models_by_usage = sorted(
-                self.loaded_models.items(),
-                key=lambda x: x[1].last_used or datetime.min
-            )
-            
-            for name, _ in models_by_usage:
-                self.unload_model(name)
-                current_memory = self.get_memory_usage()
-                if current_memory < self.max_memory_gb * 0.8:  # Dejar 20% de margen
-                    break
+        Solo cuenta un formato de pesos (los checkpoints suelen traer .safetensors y
+        .bin con los mismos tensores) y convierte de la precisión del checkpoint
+        (config.json torch_dtype, fp32 si no consta) a la de inferencia: fp16 en
+        GPU, cpu_inference (int8/onnx/fp32) en CPU. Es solo una estimación.
+        """
+        if model_name in self.model_bytes:
+            return self.model_bytes[model_name]
+        try:
+            model_path = self.get_model_path(model_name)
+        except (ValueError, FileNotFoundError):
+            return 0
+        
+        files_by_suffix = defaultdict(list)
+        for weight_file in model_path.rglob("*"):
+            if weight_file.suffix in WEIGHT_FILE_SUFFIXES and weight_file.is_file():
+                files_by_suffix[weight_file.suffix].append(weight_file)
+        suffix = next((suffix for suffix in WEIGHT_FILE_SUFFIXES if files_by_suffix[suffix]), None)
+        if suffix is None:
+            return 0
+        disk_bytes = sum(weight_file.stat().st_size for weight_file in files_by_suffix[suffix])
+        
+        target_bytes = INFERENCE_MODE_BYTES.get(self._inference_mode(model_name))
+        if target_bytes is None:
+            return disk_bytes
+        source_bytes = DTYPE_BYTES["float32"]
+        try:
+            with open(model_path / "config.json") as f:
+                source_bytes = DTYPE_BYTES.get(str(json.load(f).get("torch_dtype")), source_bytes)
+        except (OSError, ValueError, AttributeError):
+            pass
+        return int(disk_bytes / source_bytes * target_bytes)
+    
+    def _inference_mode(self, model_name: str) -> Optional[str]:
+        """Precisión con la que se cargará el modelo (None: la del checkpoint)"""
+        config = self.model_configs[model_name]
+        if config["type"] not in ("translation", "stt"):
+            return None
+        if torch.cuda.is_available():
+            return "fp16"
+        if config["type"] == "translation":
+            return config.get("cpu_inference", "fp32")
+        return "fp32"
+    
+    def _admit(self, model_name: str, device: str, estimated_bytes: int):
+        """
+        Reservar memoria para una carga: expulsa, espera admission_timeout o ModelAdmissionError
+        
+        Solo se rechaza con un tamaño medido en una carga anterior. Con una
+        estimación (primera carga) la admisión es blanda: se expulsa y se espera
+        igual, pero si no cabe se carga con un aviso y la medición posterior
+        decide las siguientes admisiones.
+        """
+        measured = model_name in self.model_bytes
+        budget = self.memory_budgets.get(device)
+        if budget is not None and estimated_bytes > budget:
+            if measured:
+                self.eviction_stats["admissions_refused"] += 1
+                raise ModelAdmissionError(
+                    f"{model_name} ({estimated_bytes / 1024**3:.2f}GB) excede el presupuesto de {device} "
+                    f"({budget / 1024**3:.2f}GB)"
+                )
+            logger.warning(f"⚠️ {model_name} estimado en {estimated_bytes / 1024**3:.2f}GB, por encima del "
+                           f"presupuesto de {device} ({budget / 1024**3:.2f}GB); se carga para medirlo")
+            estimated_bytes = budget
+        
+        deadline = time.time() + self.admission_timeout
+        with self.memory_condition:
+            while not self._evict_for(device, estimated_bytes):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    if not measured:
+                        self.eviction_stats["admissions_soft"] += 1
+                        logger.warning(f"⚠️ {model_name} admitido sin margen en {device} tras "
+                                       f"{self.admission_timeout:.0f}s (tamaño aún no medido)")
+                        break
+                    self.eviction_stats["admissions_refused"] += 1
+                    raise ModelAdmissionError(
+                        f"Sin memoria en {device} para {model_name} tras {self.admission_timeout:.0f}s de espera"
+                    )
+                self.eviction_stats["admissions_queued"] += 1
+                logger.warning(f"⏳ Carga de {model_name} en espera de memoria en {device}")
+                self.memory_condition.wait(remaining)
+            self.reservations[model_name] = (device, estimated_bytes)
+    
+    def _release_reservation(self, model_name: str):
+        with self.memory_condition:
+            self.reservations.pop(model_name, None)
+            self.memory_condition.notify_all()
     
     def load_model(self, model_name: str, force_reload: bool = False) -> ModelInfo:
-        """Carga un modelo en memoria"""
+        """Carga un modelo en memoria (bloquea solo a quien espera este modelo)"""
+        model_info = self._get_loaded(model_name)
+        if model_info is not None and not force_reload:
+            return model_info
+        return self._start_load(model_name, force_reload).result()
+    
+    async def aload_model(self, model_name: str, force_reload: bool = False) -> ModelInfo:
+        """Carga un modelo sin bloquear el event loop (espera hasta que termine)"""
+        model_info = self._get_loaded(model_name)
+        if model_info is not None and not force_reload:
+            return model_info
+        return await asyncio.wrap_future(self._start_load(model_name, force_reload))
+    
+    async def aget_model(self, model_name: str) -> ModelInfo:
+        """
+        Modelo para atender una petición
+        
+        Si no está en memoria se lanza (o se reutiliza) su carga en segundo plano y
+        se espera como mucho load_wait_timeout; después ModelNotReady con el tiempo
+        restante estimado, para responder 503 + Retry-After en lugar de colgar la
+        petición. La carga sigue en curso para las siguientes.
+        """
+        model_info = self._get_loaded(model_name)
+        if model_info is not None:
+            return model_info
+        
+        future = asyncio.wrap_future(self._start_load(model_name))
+        try:
+            # shield: el timeout de esta petición no cancela la carga compartida
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.load_wait_timeout)
+        except asyncio.TimeoutError:
+            raise ModelNotReady(model_name, self.estimate_retry_after(model_name))
+    
+    def _get_loaded(self, model_name: str) -> Optional[ModelInfo]:
         with self.lock:
-            # Si ya está cargado y no se fuerza recarga
-            if model_name in self.loaded_models and not force_reload:
-                model_info = self.loaded_models[model_name]
+            model_info = self.loaded_models.get(model_name)
+            if model_info is not None:
                 model_info.last_used = datetime.now()
-                logger.info(f"Modelo {model_name} ya cargado, reutilizando")
-                return model_info
+                model_info.hits += 1
+                model_info.priority = self._gdsf_priority(model_info)
+            return model_info
+    
+    def _start_load(self, model_name: str, force_reload: bool = False) -> Future:
+        """Future de la carga del modelo: la que ya está en curso o una nueva en el executor"""
+        if model_name not in self.model_configs:
+            raise ValueError(f"Modelo no configurado: {model_name}")
+        
+        with self.lock:
+            future = self.load_futures.get(model_name)
+            if future is not None:
+                return future
             
-            # Verificar memoria antes de cargar
-            self.check_memory_and_cleanup()
+            if model_name in self.loaded_models and not force_reload:
+                future = Future()
+                future.set_result(self.loaded_models[model_name])
+                return future
             
-            logger.info(f"Cargando modelo: {model_name}")
-            start_time = datetime.now()
+            previous = self.load_states.get(model_name)
+            if (previous and previous.state == ModelState.FAILED and not force_reload
+                    and time.time() - previous.finished_at < self.retry_failed_after):
+                raise RuntimeError(f"Carga de {model_name} fallida recientemente: {previous.error}")
             
+            self.load_states[model_name] = ModelLoadState(ModelState.LOADING, started_at=time.time())
+            future = self.load_executor.submit(self._load_model_sync, model_name, force_reload)
+            self.load_futures[model_name] = future
+            return future
+    
+    def _load_model_sync(self, model_name: str, force_reload: bool) -> ModelInfo:
+        """Carga efectiva (hilo del executor, con el lock de este modelo)"""
+        with self.model_locks[model_name]:
             try:
+                # Admisión: reservar el tamaño previsto (expulsando o esperando si no cabe)
+                device = "cuda" if torch.cuda.is_available() else "cpu"
+                self._admit(model_name, device, self.estimate_model_bytes(model_name))
+                
+                logger.info(f"Cargando modelo: {model_name}")
+                start_time = datetime.now()
+                
                 model_config = self.model_configs[model_name]
                 model_path = self.get_model_path(model_name)
                 
@@ -163,21 +463,77 @@ class ModelManager:
                 load_time = (datetime.now() - start_time).total_seconds()
                 model_info.loaded_at = start_time
                 model_info.last_used = datetime.now()
-                
-                self.loaded_models[model_name] = model_info
-                
-                logger.info(f"Modelo {model_name} cargado en {load_time:.2f}s")
-                logger.info(f"Memoria total: {self.get_memory_usage():.2f}GB")
-                
-                return model_info
+                model_info.size_bytes = measure_model_bytes(model_info.model) or model_info.size_bytes
+                model_info.memory_usage = model_info.size_bytes / 1024**3
+                model_info.load_seconds = load_time
+                model_info.hits = 1
+                model_info.priority = self._gdsf_priority(model_info)
                 
             except Exception as e:
                 logger.error(f"Error cargando modelo {model_name}: {e}")
+                with self.lock:
+                    state = self.load_states[model_name]
+                    state.state = ModelState.FAILED
+                    state.finished_at = time.time()
+                    state.error = str(e)
+                    self.load_futures.pop(model_name, None)
+                self._release_reservation(model_name)
                 raise
+            
+            with self.lock:
+                self.loaded_models[model_name] = model_info
+                self.load_times[model_name] = load_time
+                if model_info.size_bytes:
+                    self.model_bytes[model_name] = model_info.size_bytes
+                state = self.load_states[model_name]
+                state.state = ModelState.READY
+                state.finished_at = time.time()
+                state.load_seconds = load_time
+                self.load_futures.pop(model_name, None)
+            
+            self._release_reservation(model_name)
+            
+            logger.info(f"Modelo {model_name} cargado en {load_time:.2f}s "
+                        f"({model_info.memory_usage:.2f}GB en {model_info.device})")
+            logger.info(f"Memoria total: {self.get_memory_usage():.2f}GB")
+            return model_info
+    
+    def estimate_retry_after(self, model_name: str) -> int:
+        """Segundos estimados hasta que el modelo esté listo (según su última carga medida)"""
+        state = self.load_states.get(model_name)
+        expected = self.load_times.get(model_name, self.default_load_seconds)
+        elapsed = time.time() - state.started_at if state and state.state == ModelState.LOADING else 0.0
+        return max(1, math.ceil(expected - elapsed))
+    
+    def get_model_state(self, model_name: str) -> Dict[str, Any]:
+        """Estado de carga: loading (con progreso estimado), ready, failed o unloaded"""
+        with self.lock:
+            state = self.load_states.get(model_name)
+            loaded = model_name in self.loaded_models
+        if state is None or (state.state == ModelState.READY and not loaded):
+            return {"state": "unloaded"}
+        
+        info = {
+            "state": state.state.value,
+            "started_at": datetime.fromtimestamp(state.started_at).isoformat(),
+            "load_seconds": state.load_seconds,
+            "error": state.error
+        }
+        if state.state == ModelState.LOADING:
+            expected = self.load_times.get(model_name, self.default_load_seconds)
+            elapsed = time.time() - state.started_at
+            info.update({
+                "elapsed_seconds": round(elapsed, 1),
+                "expected_seconds": expected,
+                "progress": round(min(0.99, elapsed / expected), 2) if expected else None,
+                "retry_after": self.estimate_retry_after(model_name)
+            })
+        return info
     
     def _load_translation_model(self, name: str, path: Path, config: Dict) -> ModelInfo:
-        """Carga modelo de traducción NLLB"""
+        """Carga modelo de traducción NLLB (fp16 en GPU; en CPU según config['cpu_inference'])"""
         from transformers import NllbTokenizer, AutoModelForSeq2SeqLM
+        from .nllb_languages import NllbLanguageTable
         
         logger.info(f"Cargando NLLB desde {path}")
         
@@ -187,22 +543,58 @@ class ModelManager:
                 str(path),
                 local_files_only=True
             )
+            # Tokens de idioma resueltos una vez: la ruta de petición no recorre el vocabulario
+            language_table = NllbLanguageTable(tokenizer)
+            
+            # Sin GPU: int8 dinámico (torch) u ONNX Runtime, convertidos una vez y cacheados en disco
+            if not torch.cuda.is_available():
+                mode = config.get("cpu_inference", "fp32")
+                size_bytes = 0
+                if mode == "onnx":
+                    try:
+                        model, size_bytes = self._load_nllb_onnx(path)
+                    except ImportError as e:
+                        logger.warning(f"ONNX Runtime/optimum no disponible ({e}), usando int8 de torch")
+                        mode = "int8"
+                if mode == "int8":
+                    model = self._load_nllb_int8(path)
+                elif mode != "onnx":
+                    mode = "fp32"
+                    model = AutoModelForSeq2SeqLM.from_pretrained(
+                        str(path),
+                        local_files_only=True,
+                        torch_dtype=torch.float32,
+                        trust_remote_code=True,
+                        low_cpu_mem_usage=True
+                    )
+                
+                logger.info(f"✅ NLLB cargado exitosamente en cpu ({mode})")
+                
+                return ModelInfo(
+                    name=name,
+                    model_type="translation",
+                    model=model,
+                    tokenizer=tokenizer,
+                    config={**config, "inference_mode": mode},
+                    is_gpu=False,
+                    size_bytes=size_bytes,
+                    language_table=language_table
+                )
             
             # Cargar modelo usando AutoModel para mejor compatibilidad
-            device = "cuda" if torch.cuda.is_available() else "cpu"
+            device = "cuda"
             
             model = AutoModelForSeq2SeqLM.from_pretrained(
                 str(path),
                 local_files_only=True,
-                torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-                device_map=device if torch.cuda.is_available() else None,
+                torch_dtype=torch.float16,
+                device_map=device,
                 trust_remote_code=True,
                 low_cpu_mem_usage=True
             )
             
-            # Mover a GPU si está disponible
-            if torch.cuda.is_available():
-                model = model.to(device)
+            # Mover a GPU
+            model = model.to(device)
             
             logger.info(f"✅ NLLB cargado exitosamente en {device}")
             
@@ -211,14 +603,114 @@ class ModelManager:
                 model_type="translation",
                 model=model,
                 tokenizer=tokenizer,
-                config=config,
-                is_gpu=torch.cuda.is_available()
+                config={**config, "inference_mode": "fp16"},
+                is_gpu=True,
+                language_table=language_table
             )
             
         except Exception as e:
             logger.error(f"Error específico cargando NLLB: {e}")
             raise
     
+    def _conversion_key(self, path: Path, mode: str) -> str:
+        """Huella de los pesos de origen y de las versiones: si cambian, se reconvierte"""
+        import transformers
+        
+        digest = hashlib.sha1(f"{mode}:{torch.__version__}:{transformers.__version__}".encode())
+        for weight_file in sorted(path.rglob("*")):
+            if weight_file.suffix in WEIGHT_FILE_SUFFIXES and weight_file.is_file():
+                stat = weight_file.stat()
+                digest.update(f"{weight_file.relative_to(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return digest.hexdigest()[:12]
+    
+    def _load_nllb_int8(self, path: Path):
+        """
+        NLLB con cuantización dinámica int8 de las capas Linear
+        
+        La caché guarda solo el state_dict (tensores, leído con weights_only=True):
+        nunca se deserializa código desde converted_dir. Con caché, el módulo se
+        construye desde config.json sin leer los pesos fp32, se cuantiza vacío y
+        recibe los pesos int8.
+        """
+        from transformers import AutoConfig, AutoModelForSeq2SeqLM
+        
+        cache_file = self.converted_dir / f"{path.name}-int8-{self._conversion_key(path, 'int8')}.state.pt"
+        if cache_file.exists():
+            logger.info(f"📦 NLLB int8 desde caché: {cache_file}")
+            try:
+                from transformers.modeling_utils import no_init_weights
+            except ImportError:
+                no_init_weights = contextlib.nullcontext
+            with no_init_weights():
+                model = AutoModelForSeq2SeqLM.from_config(
+                    AutoConfig.from_pretrained(str(path), local_files_only=True),
+                    torch_dtype=torch.float32
+                )
+            model.eval()
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            try:
+                model.load_state_dict(torch.load(cache_file, weights_only=True))
+                return model
+            except Exception as e:
+                logger.warning(f"⚠️ Caché int8 inválida ({e}), se reconvierte: {cache_file}")
+        
+        logger.info("🔧 Cuantizando NLLB a int8 (solo la primera vez)...")
+        model = AutoModelForSeq2SeqLM.from_pretrained(
+            str(path),
+            local_files_only=True,
+            torch_dtype=torch.float32,
+            low_cpu_mem_usage=True
+        )
+        model.eval()
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        
+        self.converted_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_suffix(".tmp")
+        torch.save(model.state_dict(), tmp_file)
+        os.replace(tmp_file, cache_file)
+        logger.info(f"💾 NLLB int8 guardado en {cache_file}")
+        return model
+    
+    def _load_nllb_onnx(self, path: Path) -> tuple:
+        """NLLB exportado a ONNX Runtime con pesos int8 (optimum); devuelve (modelo, bytes de los .onnx)"""
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        
+        export_dir = self.converted_dir / f"{path.name}-onnx-{self._conversion_key(path, 'onnx')}"
+        if not (export_dir / ".complete").exists():
+            logger.info("🔧 Exportando NLLB a ONNX y cuantizando (solo la primera vez)...")
+            work_dir = export_dir.with_name(export_dir.name + ".tmp")
+            shutil.rmtree(work_dir, ignore_errors=True)
+            fp32_dir = work_dir / "fp32"
+            ORTModelForSeq2SeqLM.from_pretrained(str(path), export=True, local_files_only=True).save_pretrained(fp32_dir)
+            
+            quantization_config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+            for onnx_file in sorted(fp32_dir.glob("*.onnx")):
+                quantizer = ORTQuantizer.from_pretrained(fp32_dir, file_name=onnx_file.name)
+                quantizer.quantize(save_dir=work_dir, quantization_config=quantization_config)
+            for extra_file in fp32_dir.iterdir():
+                if extra_file.suffix == ".json":
+                    shutil.copy(extra_file, work_dir / extra_file.name)
+            shutil.rmtree(fp32_dir)
+            
+            shutil.rmtree(export_dir, ignore_errors=True)
+            os.replace(work_dir, export_dir)
+            (export_dir / ".complete").touch()
+            logger.info(f"💾 NLLB ONNX int8 guardado en {export_dir}")
+        
+        # Según la versión de optimum el decoder se exporta fusionado (merged) o en dos grafos
+        quantized = {onnx_file.name for onnx_file in export_dir.glob("*_quantized.onnx")}
+        file_names = {"encoder_file_name": "encoder_model_quantized.onnx"}
+        if "decoder_model_merged_quantized.onnx" in quantized:
+            file_names["decoder_file_name"] = "decoder_model_merged_quantized.onnx"
+        else:
+            file_names["decoder_file_name"] = "decoder_model_quantized.onnx"
+            if "decoder_with_past_model_quantized.onnx" in quantized:
+                file_names["decoder_with_past_file_name"] = "decoder_with_past_model_quantized.onnx"
+        model = ORTModelForSeq2SeqLM.from_pretrained(str(export_dir), provider="CPUExecutionProvider", **file_names)
+        size_bytes = sum((export_dir / file_name).stat().st_size for file_name in file_names.values())
+        return model, size_bytes
+    
     def _load_stt_model(self, name: str, path: Path, config: Dict) -> ModelInfo:
         """Carga modelo STT Whisper"""
         from transformers import WhisperForConditionalGeneration, WhisperProcessor
@@ -327,26 +819,38 @@ class ModelManager:
                 is_gpu=False
             )
     
-    def unload_model(self, model_name: str):
-        """Descarga un modelo de memoria"""
-        with self.lock:
-            if model_name in self.loaded_models:
-                logger.info(f"Descargando modelo: {model_name}")
-                
-                model_info = self.loaded_models[model_name]
-                
-                # Mover a CPU y limpiar
-                if model_info.model and hasattr(model_info.model, 'cpu'):
-                    model_info.model.cpu()
-                
-                del self.loaded_models[model_name]
-                
-                # Limpiar memoria
-                gc.collect()
-                if torch.cuda.is_available():
-                    torch.cuda.empty_cache()
-                
-                logger.info(f"Modelo {model_name} descargado")
+    def unload_model(self, model_name: str, blocking: bool = True) -> bool:
+        """Descarga un modelo de memoria (False si blocking=False y el modelo está ocupado)"""
+        model_lock = self.model_locks[model_name]
+        if not model_lock.acquire(blocking=blocking):
+            return False
+        try:
+            with self.lock:
+                model_info = self.loaded_models.pop(model_name, None)
+                state = self.load_states.get(model_name)
+                if state is not None and state.state != ModelState.LOADING:
+                    del self.load_states[model_name]
+            if model_info is None:
+                return True
+            
+            logger.info(f"Descargando modelo: {model_name}")
+            
+            # Mover a CPU y limpiar
+            if model_info.model and hasattr(model_info.model, 'cpu'):
+                model_info.model.cpu()
+            del model_info
+            
+            # Limpiar memoria
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            
+            logger.info(f"Modelo {model_name} descargado")
+            with self.memory_condition:
+                self.memory_condition.notify_all()
+            return True
+        finally:
+            model_lock.release()
     
     def get_model(self, model_name: str) -> ModelInfo:
         """Obtiene un modelo (lo carga si es necesario)"""
@@ -360,12 +864,32 @@ class ModelManager:
             "max_memory_gb": self.max_memory_gb,
             "gpu_available": torch.cuda.is_available(),
             "gpu_memory_allocated": torch.cuda.memory_allocated() / (1024**3) if torch.cuda.is_available() else 0,
-            "models_config": list(self.model_configs.keys())
+            "models_config": list(self.model_configs.keys()),
+            "models": {name: self.get_model_state(name) for name in self.model_configs},
+            "memory": {
+                device: {
+                    "budget_gb": round(budget / 1024**3, 2),
+                    "accounted_gb": round(self.accounted_bytes(device) / 1024**3, 2)
+                }
+                for device, budget in self.memory_budgets.items()
+            },
+            "cache": {
+                name: {
+                    "size_gb": round(info.memory_usage, 3),
+                    "device": info.device,
+                    "load_seconds": round(info.load_seconds, 2),
+                    "hits": info.hits,
+                    "priority": round(info.priority, 3)
+                }
+                for name, info in list(self.loaded_models.items())
+            },
+            "eviction": {"inflation": round(self.gdsf_inflation, 3), **self.eviction_stats}
         }
     
     def cleanup_all(self):
         """Descarga todos los modelos"""
-        model_names = list(self.loaded_models.keys())
+        with self.lock:
+            model_names = list(self.loaded_models.keys())
         for name in model_names:
             self.unload_model(name)
     
@@ -386,7 +910,7 @@ class ModelManager:
             model_start = datetime.now()
             
             try:
-                model_info = self.load_model(model_name)
+                model_info = await self.aload_model(model_name)
                 load_time = (datetime.now() - model_start).total_seconds()
                 
                 preload_results[model_name] = {
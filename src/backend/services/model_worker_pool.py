@@ -0,0 +1,551 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Pool de workers de modelos fuera de proceso
+Los pesos (NLLB, Whisper, XTTS) viven en unos pocos procesos dedicados; los
+workers de la API envían las inferencias por socket Unix y reciben los
+resultados multiplexados sobre la misma conexión
+
+Servir los modelos:
+    python -m src.backend.services.model_worker_pool --workers 2
+
+API (cada worker de uvicorn se conecta al pool en lugar de cargar pesos):
+    VOKAFLOW_MODEL_SERVING=remote uvicorn src.main:app --workers 4
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import signal
+import stat
+import struct
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependencia opcional
+    msgpack = None
+
+from .model_manager import ModelNotReady
+
+logger = logging.getLogger("vokaflow.model_workers")
+
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME_BYTES = 256 * 1024 * 1024  # Audio incluido; más que esto es un error de protocolo
+
+# Método remoto -> modelo que lo sirve (decide a qué worker va cada petición)
+METHOD_MODELS = {
+    "translate": "nllb-3.3b",
+    "transcribe": "whisper-large-v3",
+    "synthesize": "xtts-v2"
+}
+
+class ModelWorkerError(RuntimeError):
+    """Error del worker de modelos (excepción remota o timeout)"""
+
+class ModelWorkerUnavailable(ModelWorkerError):
+    """Conexión con el worker perdida: se está reiniciando o no existe"""
+
+def default_socket_dir() -> Path:
+    """Directorio de sockets: el runtime dir del usuario o, si no hay, uno propio por uid en /tmp"""
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / "vokaflow-model-workers"
+    return Path(f"/tmp/vokaflow-model-workers-{os.getuid()}")
+
+def check_owned(path: Path, expected_type) -> bool:
+    """
+    El path es del usuario del servicio y del tipo esperado (sin seguir symlinks)
+    
+    Cualquier usuario local puede crear ficheros en /tmp: un socket o directorio
+    ajeno no se usa nunca, aunque tenga el nombre esperado.
+    """
+    try:
+        info = path.lstat()
+    except FileNotFoundError:
+        return False
+    if not expected_type(info.st_mode) or info.st_uid != os.getuid():
+        logger.error(f"🚫 {path} no pertenece al usuario del servicio (uid {info.st_uid}) o no es del tipo esperado")
+        return False
+    return True
+
+def ensure_socket_dir(socket_dir: Path):
+    """Crear (o validar) el directorio de sockets: del usuario del servicio y 0700"""
+    socket_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+    if not check_owned(socket_dir, stat.S_ISDIR):
+        raise PermissionError(f"Directorio de sockets inseguro: {socket_dir}")
+    if stat.S_IMODE(socket_dir.lstat().st_mode) & 0o077:
+        os.chmod(socket_dir, 0o700)
+
+def _encode_default(value: Any) -> Any:
+    """Tipos sin equivalente msgpack que aparecen en los resultados (metadatos)"""
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, "tolist"):  # Escalares y arrays numpy
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    return str(value)
+
+def pack_frame(message: Any) -> bytes:
+    """Trama: longitud (4 bytes big-endian) + msgpack (nunca pickle: solo datos, sin objetos)"""
+    if msgpack is None:
+        raise ModelWorkerError("msgpack no instalado: requerido por el pool de workers de modelos")
+    payload = msgpack.packb(message, use_bin_type=True, default=_encode_default)
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+async def read_frame(reader: asyncio.StreamReader) -> Any:
+    header = await reader.readexactly(FRAME_HEADER.size)
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_BYTES:
+        raise ConnectionError(f"Trama de {length} bytes excede el máximo")
+    return msgpack.unpackb(await reader.readexactly(length), raw=False)
+
+def _result_types() -> Dict[str, Any]:
+    # Import diferido (como _service_methods): método remoto -> dataclass del resultado
+    from .translation_service import TranslationResult
+    from .stt_service import STTResult
+    from .tts_service import TTSResult
+    return {"translate": TranslationResult, "transcribe": STTResult, "synthesize": TTSResult}
+
+def assign_models(models: List[str], num_workers: int) -> List[List[str]]:
+    """Reparte los modelos entre workers: cada peso vive en un único proceso"""
+    num_workers = max(1, min(num_workers, len(models)))
+    assignment = [[] for _ in range(num_workers)]
+    for index, model_name in enumerate(models):
+        assignment[index % num_workers].append(model_name)
+    return assignment
+
+def _service_methods() -> Dict[str, Any]:
+    # Import diferido: los servicios importan este módulo para reenviar en modo remoto
+    from .translation_service import translation_service
+    from .stt_service import stt_service
+    from .tts_service import tts_service
+    return {
+        "translate": translation_service.translate_text,
+        "transcribe": stt_service.transcribe_audio,
+        "synthesize": tts_service.synthesize_speech
+    }
+
+class ModelWorkerServer:
+    """Proceso dueño de los pesos: atiende peticiones multiplexadas por socket Unix"""
+
+    def __init__(self, worker_id: int, socket_path: Path, models: List[str]):
+        self.worker_id = worker_id
+        self.socket_path = socket_path
+        self.models = models
+        self.methods: Dict[str, Any] = {}
+        self.in_flight = 0
+        self.served = 0
+        self.errors = 0
+        self.started_at = time.time()
+
+    async def serve(self):
+        from .model_manager import model_manager
+
+        self.methods = {**_service_methods(), "ping": self.ping}
+        ensure_socket_dir(self.socket_path.parent)
+        self.socket_path.unlink(missing_ok=True)
+        server = await asyncio.start_unix_server(self._handle_connection, path=str(self.socket_path))
+        os.chmod(self.socket_path, 0o600)
+        logger.info(f"🧠 Worker de modelos {self.worker_id} (pid {os.getpid()}) en {self.socket_path}: {self.models}")
+
+        # Precarga en segundo plano: el ping responde desde ya y las peticiones reciben 503 mientras carga
+        for model_name in self.models:
+            asyncio.create_task(self._preload(model_manager, model_name))
+
+        async with server:
+            await server.serve_forever()
+
+    async def _preload(self, model_manager, model_name: str):
+        try:
+            await model_manager.aload_model(model_name)
+            logger.info(f"✅ Worker {self.worker_id}: {model_name} listo")
+        except Exception as e:
+            logger.error(f"❌ Worker {self.worker_id}: error precargando {model_name}: {e}")
+
+    async def ping(self) -> Dict[str, Any]:
+        from .model_manager import model_manager
+
+        return {
+            "worker_id": self.worker_id,
+            "pid": os.getpid(),
+            "models": self.models,
+            "states": {name: model_manager.get_model_state(name)["state"] for name in self.models},
+            "in_flight": self.in_flight,
+            "served": self.served,
+            "errors": self.errors,
+            "uptime_seconds": round(time.time() - self.started_at, 1)
+        }
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                request_id, method, kwargs = await read_frame(reader)
+                task = asyncio.create_task(self._dispatch(request_id, method, kwargs, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # El proceso de la API cerró la conexión
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def _dispatch(self, request_id: int, method: str, kwargs: Dict[str, Any],
+                        writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        self.in_flight += 1
+        try:
+            handler = self.methods.get(method)
+            if handler is None:
+                response = (request_id, "error", f"Método desconocido: {method}")
+            else:
+                try:
+                    response = (request_id, "ok", await handler(**kwargs))
+                except ModelNotReady as e:
+                    response = (request_id, "not_ready", (e.model_name, e.retry_after))
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"❌ Worker {self.worker_id}: error en {method}: {e}")
+                    response = (request_id, "error", f"{type(e).__name__}: {e}")
+
+            try:
+                frame = pack_frame(response)
+            except Exception as e:
+                self.errors += 1
+                frame = pack_frame((request_id, "error", f"Resultado no serializable: {e}"))
+
+            async with write_lock:
+                writer.write(frame)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.in_flight -= 1
+            self.served += 1
+
+class ModelWorkerClient:
+    """Conexión multiplexada a un worker: muchas peticiones en vuelo sobre un mismo socket"""
+
+    def __init__(self, socket_path: Path):
+        self.socket_path = socket_path
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.reader_task: Optional[asyncio.Task] = None
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.request_ids = itertools.count(1)
+        self.connect_lock = asyncio.Lock()
+        self.write_lock = asyncio.Lock()
+        self.info: Dict[str, Any] = {}
+        self.healthy = False
+        self.last_seen = 0.0
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+    async def connect(self):
+        async with self.connect_lock:
+            if self.connected:
+                return
+            if not (check_owned(self.socket_path.parent, stat.S_ISDIR)
+                    and check_owned(self.socket_path, stat.S_ISSOCK)):
+                raise PermissionError(f"Socket {self.socket_path} ausente o de otro usuario")
+            self.reader, self.writer = await asyncio.open_unix_connection(str(self.socket_path))
+            self.reader_task = asyncio.create_task(self._read_responses(self.reader, self.writer))
+
+    async def _read_responses(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        error: Exception = ModelWorkerUnavailable(f"Conexión con {self.socket_path.name} cerrada")
+        try:
+            while True:
+                request_id, status, payload = await read_frame(reader)
+                future = self.pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue  # Timeout en el cliente: la respuesta llega tarde
+                if status == "ok":
+                    future.set_result(payload)
+                elif status == "not_ready":
+                    future.set_exception(ModelNotReady(*payload))
+                else:
+                    future.set_exception(ModelWorkerError(payload))
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            error = ModelWorkerUnavailable(f"Conexión con {self.socket_path.name} perdida: {e}")
+        finally:
+            # Las peticiones en vuelo no tendrán respuesta: fallan todas a la vez
+            self.healthy = False
+            pending, self.pending = self.pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            writer.close()
+
+    async def call(self, method: str, timeout: float, **kwargs) -> Any:
+        if not self.connected:
+            try:
+                await self.connect()
+            except OSError as e:
+                raise ModelWorkerUnavailable(f"No se pudo conectar con {self.socket_path.name}: {e}")
+        request_id = next(self.request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        try:
+            frame = pack_frame((request_id, method, kwargs))
+            async with self.write_lock:
+                self.writer.write(frame)
+                await self.writer.drain()
+            return await asyncio.wait_for(future, timeout)
+        except (ConnectionError, OSError) as e:
+            raise ModelWorkerUnavailable(f"Conexión con {self.socket_path.name} perdida: {e}")
+        except asyncio.TimeoutError:
+            raise ModelWorkerError(f"{method} sin respuesta de {self.socket_path.name} en {timeout}s")
+        finally:
+            self.pending.pop(request_id, None)
+
+    def close(self):
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+            self.reader_task = None
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+class ModelWorkerPool:
+    """
+    Cliente del pool en cada proceso de la API
+
+    Enruta por modelo al worker que lo posee (el de menos peticiones en vuelo si
+    hay varios), comprueba la salud con pings periódicos y reconecta cuando el
+    supervisor reinicia un worker. Sin worker sano para el modelo -> ModelNotReady (503)
+    """
+
+    def __init__(self, socket_dir: Path, enabled: bool = False,
+                 request_timeout: float = 300.0, health_interval: float = 5.0):
+        self.socket_dir = socket_dir
+        self.enabled = enabled
+        self.request_timeout = request_timeout
+        self.health_interval = health_interval
+        self.health_timeout = 2.0
+        self.clients: Dict[str, ModelWorkerClient] = {}
+        self.health_task: Optional[asyncio.Task] = None
+        self.stats = {"requests": 0, "not_ready": 0, "no_worker": 0, "errors": 0}
+
+    def discover(self):
+        # Solo sockets del usuario del servicio en un directorio suyo (ver check_owned)
+        if not check_owned(self.socket_dir, stat.S_ISDIR):
+            return
+        for path in sorted(self.socket_dir.glob("worker-*.sock")):
+            if path.name not in self.clients and check_owned(path, stat.S_ISSOCK):
+                self.clients[path.name] = ModelWorkerClient(path)
+
+    async def start(self):
+        if self.health_task is not None:
+            return
+        await self.check_health()
+        self.health_task = asyncio.create_task(self._health_loop())
+        healthy = [name for name, client in self.clients.items() if client.healthy]
+        logger.info(f"🔌 Pool de modelos: {len(healthy)}/{len(self.clients)} workers sanos en {self.socket_dir}")
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.error(f"Error en health check del pool de modelos: {e}")
+
+    async def check_health(self):
+        self.discover()
+        await asyncio.gather(*(self._ping(client) for client in list(self.clients.values())))
+
+    async def _ping(self, client: ModelWorkerClient):
+        try:
+            client.info = await client.call("ping", timeout=self.health_timeout)
+            if not client.healthy:
+                logger.info(f"✅ Worker de modelos {client.socket_path.name} disponible: {client.info['models']}")
+            client.healthy = True
+            client.last_seen = time.time()
+        except Exception as e:
+            if client.healthy:
+                logger.warning(f"⚠️ Worker de modelos {client.socket_path.name} no responde: {e}")
+            client.healthy = False
+            client.close()
+
+    def _candidates(self, model_name: str) -> List[ModelWorkerClient]:
+        return [
+            client for client in self.clients.values()
+            if client.healthy and model_name in client.info.get("models", ())
+        ]
+
+    async def call(self, method: str, **kwargs) -> Any:
+        """Ejecuta un método de servicio en el worker que posee su modelo"""
+        if self.health_task is None:
+            await self.start()
+
+        model_name = METHOD_MODELS[method]
+        candidates = self._candidates(model_name)
+        if not candidates:
+            await self.check_health()  # Un worker recién reiniciado aún no visto por el health check
+            candidates = self._candidates(model_name)
+        if not candidates:
+            self.stats["no_worker"] += 1
+            raise ModelNotReady(model_name, retry_after=math.ceil(self.health_interval))
+
+        client = min(candidates, key=lambda candidate: len(candidate.pending))
+        self.stats["requests"] += 1
+        try:
+            result = await client.call(method, self.request_timeout, **kwargs)
+            return _result_types()[method](**result)
+        except ModelNotReady:
+            self.stats["not_ready"] += 1
+            raise
+        except ModelWorkerUnavailable:
+            # El worker murió con la petición en vuelo: el supervisor lo reinicia
+            self.stats["no_worker"] += 1
+            client.healthy = False
+            raise ModelNotReady(model_name, retry_after=math.ceil(self.health_interval))
+        except ModelWorkerError:
+            self.stats["errors"] += 1
+            raise
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "socket_dir": str(self.socket_dir),
+            "workers": {
+                name: {
+                    "healthy": client.healthy,
+                    "last_seen": client.last_seen,
+                    "client_in_flight": len(client.pending),
+                    **client.info
+                }
+                for name, client in self.clients.items()
+            },
+            "stats": dict(self.stats)
+        }
+
+    async def close(self):
+        if self.health_task is not None:
+            self.health_task.cancel()
+            self.health_task = None
+        for client in self.clients.values():
+            client.close()
+
+def run_worker(worker_id: int, socket_path: str, models: List[str]):
+    """Punto de entrada de cada proceso worker (multiprocessing spawn)"""
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s [model-worker-{worker_id}] %(levelname)s %(message)s")
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # El supervisor decide cuándo parar (SIGTERM)
+    try:
+        asyncio.run(ModelWorkerServer(worker_id, Path(socket_path), models).serve())
+    finally:
+        Path(socket_path).unlink(missing_ok=True)
+
+class ModelWorkerSupervisor:
+    """Arranca los workers y los reinicia si mueren (backoff exponencial si fallan al arrancar)"""
+
+    def __init__(self, socket_dir: Path, assignment: List[List[str]],
+                 restart_backoff: float = 1.0, max_backoff: float = 30.0):
+        self.socket_dir = socket_dir
+        self.assignment = assignment
+        self.restart_backoff = restart_backoff
+        self.max_backoff = max_backoff
+        self.context = multiprocessing.get_context("spawn")  # Sin fork de un proceso con CUDA/hilos
+        self.processes: Dict[int, multiprocessing.Process] = {}
+        self.started_at: Dict[int, float] = {}
+        self.next_start: Dict[int, float] = {}
+        self.failures: Dict[int, int] = {}
+        self.restarts = 0
+        self.stopping = False
+
+    def socket_path(self, worker_id: int) -> Path:
+        return self.socket_dir / f"worker-{worker_id}.sock"
+
+    def _spawn(self, worker_id: int):
+        process = self.context.Process(
+            target=run_worker,
+            args=(worker_id, str(self.socket_path(worker_id)), self.assignment[worker_id]),
+            name=f"vokaflow-model-worker-{worker_id}"
+        )
+        process.start()
+        self.processes[worker_id] = process
+        self.started_at[worker_id] = time.time()
+        logger.info(f"🚀 Worker de modelos {worker_id} arrancado (pid {process.pid}): {self.assignment[worker_id]}")
+
+    def _check(self, worker_id: int):
+        process = self.processes.get(worker_id)
+        now = time.time()
+        if process is not None:
+            if process.is_alive():
+                if now - self.started_at[worker_id] > 60:
+                    self.failures[worker_id] = 0  # Estable: el siguiente fallo reinicia sin espera
+                return
+            logger.error(f"💥 Worker de modelos {worker_id} terminó (código {process.exitcode})")
+            self.processes.pop(worker_id)
+            failures = self.failures.get(worker_id, 0)
+            delay = 0.0 if failures == 0 else min(self.max_backoff, self.restart_backoff * 2 ** (failures - 1))
+            self.next_start[worker_id] = now + delay
+            self.failures[worker_id] = failures + 1
+        if now >= self.next_start.get(worker_id, 0):
+            if worker_id in self.next_start:
+                self.restarts += 1
+            self._spawn(worker_id)
+
+    def run(self):
+        ensure_socket_dir(self.socket_dir)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+
+        for worker_id in range(len(self.assignment)):
+            self._spawn(worker_id)
+
+        while not self.stopping:
+            for worker_id in range(len(self.assignment)):
+                self._check(worker_id)
+            time.sleep(0.5)
+
+        logger.info("🔄 Deteniendo workers de modelos...")
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            process.join(timeout=10)
+            if process.is_alive():
+                process.kill()
+
+    def _request_stop(self, signum, frame):
+        self.stopping = True
+
+# Instancia global (por proceso de la API)
+model_worker_pool = ModelWorkerPool(
+    socket_dir=Path(os.getenv("VOKAFLOW_MODEL_WORKER_DIR") or default_socket_dir()),
+    enabled=os.getenv("VOKAFLOW_MODEL_SERVING", "local") == "remote",
+    request_timeout=float(os.getenv("VOKAFLOW_MODEL_WORKER_TIMEOUT", "300"))
+)
+
+def main():
+    from .model_manager import model_manager
+
+    parser = argparse.ArgumentParser(description="Pool de workers de modelos de VokaFlow")
+    parser.add_argument("--workers", type=int, default=2, help="Procesos worker (cada modelo vive en uno)")
+    parser.add_argument("--models", default=",".join(model_manager.essential_models))
+    parser.add_argument("--socket-dir", default=str(model_worker_pool.socket_dir))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [model-supervisor] %(levelname)s %(message)s")
+    # Los workers sirven los modelos en local aunque el entorno de la API diga "remote"
+    os.environ["VOKAFLOW_MODEL_SERVING"] = "worker"
+
+    assignment = assign_models(args.models.split(","), args.workers)
+    ModelWorkerSupervisor(Path(args.socket_dir), assignment).run()
+
+if __name__ == "__main__":
+    main()
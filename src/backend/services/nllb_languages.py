@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Tabla de idiomas NLLB
+Códigos de idioma de VokaFlow -> códigos NLLB -> token id, resuelta y validada
+una vez al cargar el modelo, y codificación por lotes reutilizando los tokens
+especiales (prefijo/sufijo de idioma) ya calculados
+"""
+
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("vokaflow.translation.languages")
+
+# Mapeo de códigos de idioma a códigos NLLB
+NLLB_LANGUAGE_CODES: Dict[str, str] = {
+    "es": "spa_Latn",  # Español
+    "en": "eng_Latn",  # Inglés
+    "fr": "fra_Latn",  # Francés
+    "de": "deu_Latn",  # Alemán
+    "it": "ita_Latn",  # Italiano
+    "pt": "por_Latn",  # Portugués
+    "ru": "rus_Cyrl",  # Ruso
+    "zh": "zho_Hans",  # Chino simplificado
+    "ja": "jpn_Jpan",  # Japonés
+    "ko": "kor_Hang",  # Coreano
+    "ar": "arb_Arab",  # Árabe
+    "hi": "hin_Deva",  # Hindi
+    "tr": "tur_Latn",  # Turco
+    "nl": "nld_Latn",  # Holandés
+    "sv": "swe_Latn",  # Sueco
+    "no": "nob_Latn",  # Noruego
+    "da": "dan_Latn",  # Danés
+    "fi": "fin_Latn",  # Finlandés
+    "pl": "pol_Latn",  # Polaco
+    "cs": "ces_Latn",  # Checo
+    "hu": "hun_Latn",  # Húngaro
+    "ro": "ron_Latn",  # Rumano
+    "bg": "bul_Cyrl",  # Búlgaro
+    "hr": "hrv_Latn",  # Croata
+    "sk": "slk_Latn",  # Eslovaco
+    "sl": "slv_Latn",  # Esloveno
+    "et": "est_Latn",  # Estonio
+    "lv": "lvs_Latn",  # Letón
+    "lt": "lit_Latn",  # Lituano
+    "mt": "mlt_Latn",  # Maltés
+    "ga": "gle_Latn",  # Irlandés
+    "cy": "cym_Latn",  # Galés
+    "eu": "eus_Latn",  # Euskera
+    "ca": "cat_Latn",  # Catalán
+    "gl": "glg_Latn",  # Gallego
+    "is": "isl_Latn",  # Islandés
+    "mk": "mkd_Cyrl",  # Macedonio
+    "sr": "srp_Cyrl",  # Serbio
+    "uk": "ukr_Cyrl",  # Ucraniano
+    "be": "bel_Cyrl",  # Bielorruso
+    "th": "tha_Thai",  # Tailandés
+    "vi": "vie_Latn",  # Vietnamita
+    "id": "ind_Latn",  # Indonesio
+    "ms": "zsm_Latn",  # Malayo
+    "tl": "tgl_Latn",  # Tagalo
+    "sw": "swh_Latn",  # Swahili
+    "he": "heb_Hebr",  # Hebreo
+    "fa": "pes_Arab",  # Persa
+    "ur": "urd_Arab",  # Urdu
+    "bn": "ben_Beng",  # Bengalí
+    "gu": "guj_Gujr",  # Gujarati
+    "kn": "kan_Knda",  # Kannada
+    "ml": "mal_Mlym",  # Malayalam
+    "mr": "mar_Deva",  # Marathi
+    "ne": "npi_Deva",  # Nepalí
+    "pa": "pan_Guru",  # Punjabi
+    "si": "sin_Sinh",  # Cingalés
+    "ta": "tam_Taml",  # Tamil
+    "te": "tel_Telu",  # Telugu
+    "my": "mya_Mymr",  # Birmano
+    "km": "khm_Khmr",  # Jemer
+    "lo": "lao_Laoo",  # Lao
+    "ka": "kat_Geor",  # Georgiano
+    "hy": "hye_Armn",  # Armenio
+    "az": "azj_Latn",  # Azerbaiyano
+    "kk": "kaz_Cyrl",  # Kazajo
+    "ky": "kir_Cyrl",  # Kirguís
+    "tg": "tgk_Cyrl",  # Tayiko
+    "tk": "tuk_Latn",  # Turcomano
+    "uz": "uzn_Latn",  # Uzbeko
+    "mn": "khk_Cyrl",  # Mongol
+    "am": "amh_Ethi",  # Amhárico
+    "ig": "ibo_Latn",  # Igbo
+    "yo": "yor_Latn",  # Yoruba
+    "zu": "zul_Latn",  # Zulú
+    "af": "afr_Latn",  # Afrikáans
+    "sq": "als_Latn",  # Albanés
+}
+
+_NLLB_CODE = re.compile(r"^[a-z]{3}_[A-Z][a-z]{3}$")
+_LANG = -1  # Hueco del token de idioma en las plantillas de tokens especiales
+_PROBE_TEXT = "Hola, ¿qué tal? Hello 123."
+
+class NllbLanguageTable:
+    """
+    Token id de cada código de idioma NLLB del tokenizer, más la plantilla de
+    tokens especiales que el tokenizer añade alrededor del texto según src_lang
+
+    Se construye al cargar el modelo: en la ruta de petición solo hay búsquedas
+    en diccionario y una llamada de tokenización por lote y idioma origen
+    """
+
+    def __init__(self, tokenizer, language_codes: Dict[str, str] = NLLB_LANGUAGE_CODES):
+        self.token_ids: Dict[str, int] = {}
+        candidates = list(getattr(tokenizer, "additional_special_tokens", None) or [])
+        candidates += list(getattr(tokenizer, "lang_code_to_id", None) or {})
+        for code in candidates:
+            if not _NLLB_CODE.match(code) or code in self.token_ids:
+                continue
+            token_id = tokenizer.convert_tokens_to_ids(code)
+            # Validado en ambos sentidos: un código desconocido no puede colarse como unk
+            if token_id != tokenizer.unk_token_id and tokenizer.convert_ids_to_tokens(token_id) == code:
+                self.token_ids[code] = token_id
+
+        self.missing = sorted(lang for lang, code in language_codes.items() if code not in self.token_ids)
+        if self.missing:
+            logger.warning(f"⚠️ Idiomas sin token NLLB en el tokenizer: {', '.join(self.missing)}")
+
+        self.templates = self._special_templates(tokenizer)
+        self.prefixes: Dict[str, Tuple[List[int], List[int]]] = {}
+        logger.info(
+            f"🗂️ Tabla de idiomas NLLB: {len(self.token_ids)} códigos, "
+            f"tokenización por lotes {'activa' if self.templates else 'desactivada'}"
+        )
+
+    def _special_templates(self, tokenizer) -> Optional[Tuple[List[int], List[int]]]:
+        """Deduce dónde pone el tokenizer el idioma y el EOS (depende de legacy_behaviour)"""
+        probes = [code for code in ("eng_Latn", "spa_Latn") if code in self.token_ids]
+        if len(probes) < 2:
+            return None
+        original_src_lang = getattr(tokenizer, "src_lang", None)
+        templates = []
+        try:
+            body = tokenizer(_PROBE_TEXT, add_special_tokens=False)["input_ids"]
+            for code in probes:
+                tokenizer.src_lang = code
+                full = tokenizer(_PROBE_TEXT)["input_ids"]
+                offsets = [k for k in range(len(full) - len(body) + 1) if full[k:k + len(body)] == body]
+                if not offsets:
+                    return None
+                lang_id = self.token_ids[code]
+                prefix, suffix = full[:offsets[0]], full[offsets[0] + len(body):]
+                templates.append((
+                    [_LANG if token == lang_id else token for token in prefix],
+                    [_LANG if token == lang_id else token for token in suffix]
+                ))
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo validar la tokenización por lotes de NLLB: {e}")
+            return None
+        finally:
+            if original_src_lang is not None:
+                tokenizer.src_lang = original_src_lang
+        # La misma plantilla para dos idiomas y con el idioma presente: si no, ruta estándar
+        if templates[0] != templates[1] or _LANG not in templates[0][0] + templates[0][1]:
+            return None
+        return templates[0]
+
+    def token_id(self, nllb_code: str) -> Optional[int]:
+        """Token del idioma (forced BOS del decoder); None si el tokenizer no lo tiene"""
+        return self.token_ids.get(nllb_code)
+
+    def _special_tokens(self, source_lang: str) -> Tuple[List[int], List[int]]:
+        special = self.prefixes.get(source_lang)
+        if special is None:
+            lang_id = self.token_ids[source_lang]
+            prefix, suffix = self.templates
+            special = (
+                [lang_id if token == _LANG else token for token in prefix],
+                [lang_id if token == _LANG else token for token in suffix]
+            )
+            self.prefixes[source_lang] = special
+        return special
+
+    def encode(self, tokenizer, texts: List[str], source_lang: str, max_length: int) -> List[List[int]]:
+        """
+        input_ids de varios textos del mismo idioma origen, idénticos a tokenizer(text,
+        truncation=True, max_length=max_length) con src_lang=source_lang
+        """
+        if self.templates is None or source_lang not in self.token_ids:
+            tokenizer.src_lang = source_lang
+            return [tokenizer(text, truncation=True, max_length=max_length)["input_ids"] for text in texts]
+        prefix, suffix = self._special_tokens(source_lang)
+        bodies = tokenizer(
+            texts, add_special_tokens=False, truncation=True, max_length=max_length - len(prefix) - len(suffix)
+        )["input_ids"]
+        return [prefix + body + suffix for body in bodies]
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Segmentación de texto en frases por idioma
+Divide documentos en frases traducibles por separado: terminadores por
+escritura, abreviaturas por idioma y troceo de frases demasiado largas
+"""
+
+import re
+from typing import Dict, List, Set, Tuple
+
+# Terminadores por escritura; los latinos necesitan espacio o fin de texto detrás
+LATIN_TERMINATORS = ".!?…"
+UNSPACED_TERMINATORS = "。！？｡؟۔।॥။።։"  # CJK, árabe/urdu, devanagari, birmano, etíope, armenio
+CLOSING_CHARS = "\"'»”’)]}」』"
+
+# Abreviaturas frecuentes (en minúsculas, sin el punto final) tras las que no se corta
+ABBREVIATIONS: Dict[str, Set[str]] = {
+    "es": {"sr", "sra", "srta", "dr", "dra", "ud", "uds", "etc", "pág", "núm", "art", "av", "avda",
+           "p. ej", "ej", "aprox", "dpto", "ee.uu", "tel", "vol", "cap", "prof", "lic", "ing"},
+    "en": {"mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "e.g", "i.e", "u.s", "u.k",
+           "no", "approx", "dept", "est", "fig", "inc", "ltd", "co", "jan", "feb", "aug", "sept", "oct", "nov", "dec"},
+    "fr": {"m", "mme", "mlle", "dr", "etc", "p. ex", "cf", "env", "av", "bd", "st", "ste"},
+    "de": {"z.b", "d.h", "u.a", "usw", "bzw", "ca", "nr", "str", "dr", "hr", "fr", "vgl", "evtl", "ggf"},
+    "it": {"sig", "sigg", "dott", "prof", "ecc", "es", "pag", "n"},
+    "pt": {"sr", "sra", "dr", "dra", "etc", "ex", "pág", "av", "nº"},
+}
+COMMON_ABBREVIATIONS = {"etc", "dr", "prof"}
+
+_SPLIT_PATTERN = re.compile(
+    rf"([{re.escape(LATIN_TERMINATORS)}]+[{re.escape(CLOSING_CHARS)}]*)(\s+)"
+    rf"|([{re.escape(UNSPACED_TERMINATORS)}]+[{re.escape(CLOSING_CHARS)}]*)(\s*)"
+    rf"|(\n\s*\n\s*|\n)"
+)
+_LAST_WORD = re.compile(r"(\S+)$")
+_SOFT_BREAKS = re.compile(r"(?<=[;:,、，；])\s*")
+
+def _is_abbreviation(before: str, terminator: str, abbreviations: Set[str]) -> bool:
+    if not terminator.startswith(".") or terminator.startswith("..."):
+        return False
+    match = _LAST_WORD.search(before)
+    if match is None:
+        return False
+    word = match.group(1).lower().lstrip("(\"'«¿¡")
+    if len(word) == 1 and word.isalpha():
+        return True  # Iniciales: "J. K. Rowling"
+    if word in abbreviations:
+        return True
+    # Abreviaturas de dos palabras ("p. ej.")
+    two_words = re.search(r"(\S+\s\S+)$", before)
+    return bool(two_words and two_words.group(1).lower() in abbreviations)
+
+def _split_long(sentence: str, max_chars: int) -> List[str]:
+    """Trocea una frase demasiado larga por pausas (; : ,) y, si no basta, por espacios"""
+    if len(sentence) <= max_chars:
+        return [sentence]
+    pieces, current = [], ""
+    for part in _SOFT_BREAKS.split(sentence):
+        candidate = f"{current} {part}".strip() if current else part
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+        if current:
+            pieces.append(current)
+        while len(part) > max_chars:
+            cut = part.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(part[:cut].strip())
+            part = part[cut:].strip()
+        current = part
+    if current:
+        pieces.append(current)
+    return pieces
+
+def split_sentences(text: str, lang: str = "en", max_chars: int = 400) -> List[Tuple[str, str]]:
+    """
+    Divide un texto en (frase, separador) conservando el separador original
+    (espacio, salto de línea o párrafo) para poder recomponer el documento
+    """
+    abbreviations = ABBREVIATIONS.get(lang, set()) | COMMON_ABBREVIATIONS
+    segments: List[Tuple[str, str]] = []
+    start = 0
+
+    for match in _SPLIT_PATTERN.finditer(text):
+        if match.group(1) is not None:
+            terminator, separator = match.group(1), match.group(2)
+            before = text[start:match.start()]
+            if _is_abbreviation(before, terminator, abbreviations):
+                continue
+        elif match.group(3) is not None:
+            terminator, separator = match.group(3), match.group(4)
+        else:
+            terminator, separator = "", match.group(5)
+
+        sentence = (text[start:match.start()] + terminator).strip()
+        start = match.end()
+        if sentence:
+            segments.append((sentence, separator if "\n" in separator else (" " if separator else "")))
+        elif segments and "\n" in separator:
+            # Líneas en blanco seguidas: conservar el salto más largo
+            previous, previous_separator = segments[-1]
+            if len(separator) > len(previous_separator):
+                segments[-1] = (previous, separator)
+
+    tail = text[start:].strip()
+    if tail:
+        segments.append((tail, ""))
+    if segments:
+        last, _ = segments[-1]
+        segments[-1] = (last, "")
+
+    result = []
+    for sentence, separator in segments:
+        pieces = _split_long(sentence, max_chars)
+        result.extend((piece, " ") for piece in pieces[:-1])
+        result.append((pieces[-1], separator))
+    return result
+
+def join_sentences(segments: List[Tuple[str, str]]) -> str:
+    return "".join(sentence + separator for sentence, separator in segments)
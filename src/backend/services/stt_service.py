@@ -18,7 +18,8 @@ from datetime import datetime
 from dataclasses import dataclass
 from pathlib import Path
 
-from .model_manager import model_manager, ModelInfo
+from .model_manager import model_manager, ModelInfo, ModelNotReady
+from .model_worker_pool import model_worker_pool
 
 # Configurar logger primero
 logger = logging.getLogger("vokaflow.stt")
@@ -207,6 +208,15 @@ class STTService:
         filter_profanity: bool = False
     ) -> STTResult:
         """Transcribe audio usando Whisper Large V3"""
+        if model_worker_pool.enabled:
+            # Los pesos viven en el pool de workers de modelos (VOKAFLOW_MODEL_SERVING=remote)
+            return await model_worker_pool.call(
+                "transcribe", audio_data=audio_data, filename=filename, language=language,
+                enable_word_timestamps=enable_word_timestamps,
+                enable_speaker_diarization=enable_speaker_diarization,
+                enable_punctuation=enable_punctuation, filter_profanity=filter_profanity
+            )
+        
         start_time = time.time()
         
         try:
@@ -233,9 +243,8 @@ class STTService:
                 logger.info(f"👤 Análisis de speaker: {speaker_analysis}")
             
             # Obtener modelo Whisper
-            model_info = await asyncio.get_event_loop().run_in_executor(
-                None, model_manager.get_model, self.model_name
-            )
+            # Carga en el executor del gestor; si tarda más de lo razonable -> ModelNotReady (503)
+            model_info = await model_manager.aget_model(self.model_name)
             
             if not model_info or not model_info.model:
                 # Fallback a transcripción simulada
@@ -287,6 +296,8 @@ class STTService:
             logger.info(f"✅ Whisper transcripción completada en {processing_time:.2f}s")
             return stt_result
             
+        except ModelNotReady:
+            raise
         except Exception as e:
             logger.error(f"❌ Error en transcripción Whisper: {e}")
             # Fallback en caso de error
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Micro-batching dinámico de traducciones NLLB
+Agrupa las peticiones concurrentes durante unos milisegundos (o hasta el
+tamaño máximo de lote), ejecuta un único generate y reparte los resultados
+a los futures de cada petición
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger("vokaflow.translation.batcher")
+
+@dataclass
+class BatchRequest:
+    """Una traducción pendiente dentro del batcher"""
+    text: str
+    source_lang: str  # Código NLLB (spa_Latn)
+    target_lang: str
+    max_length: int
+    future: asyncio.Future
+    decoding: Any = None  # DecodingParams: solo se agrupan peticiones con los mismos parámetros
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+class TranslationBatcher:
+    """
+    Cola de traducciones con un único consumidor por event loop
+
+    Los lotes se ejecutan de uno en uno en un hilo propio: el modelo no gana nada
+    con dos generate en paralelo en CPU, y lo que llega mientras un lote se
+    ejecuta forma el siguiente sin esperar más
+    """
+
+    def __init__(self, run_batch: Callable[[Any, List[BatchRequest]], List[Any]],
+                 max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.run_batch = run_batch  # (model_info, peticiones) -> resultado por petición, en el hilo del lote
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.pending: List[tuple] = []  # (model_info, BatchRequest)
+        self.wakeup: Optional[asyncio.Event] = None
+        self.worker_task: Optional[asyncio.Task] = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vokaflow-nllb-batch")
+        self.stats = {"requests": 0, "batches": 0, "errors": 0, "queue_wait_ms_total": 0.0}
+        self.batch_sizes: Counter = Counter()
+
+    async def submit(self, model_info: Any, text: str, source_lang: str, target_lang: str, max_length: int,
+                     decoding: Any = None) -> Any:
+        """Encola una traducción y espera su resultado"""
+        loop = asyncio.get_running_loop()
+        if self.worker_task is None or self.worker_task.done():
+            self.wakeup = asyncio.Event()
+            self.worker_task = loop.create_task(self._worker())
+        request = BatchRequest(text, source_lang, target_lang, max_length, loop.create_future(), decoding)
+        self.pending.append((model_info, request))
+        self.stats["requests"] += 1
+        self.wakeup.set()
+        return await request.future
+
+    def _take_batch(self) -> tuple:
+        # Un lote contiene un solo modelo (normalmente solo hay uno cargado) y una sola
+        # configuración de decodificación (generate no admite num_beams por fila)
+        model_info, first = self.pending[0]
+        batch, rest = [], []
+        for entry in self.pending:
+            if entry[0] is model_info and entry[1].decoding == first.decoding and len(batch) < self.max_batch_size:
+                batch.append(entry[1])
+            else:
+                rest.append(entry)
+        self.pending = rest
+        return model_info, batch
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.pending:
+                # Esperar a completar el lote, como mucho max_wait desde la petición más antigua
+                deadline = self.pending[0][1].enqueued_at + self.max_wait
+                while len(self.pending) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        await asyncio.wait_for(self.wakeup.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    self.wakeup.clear()
+
+                model_info, batch = self._take_batch()
+                now = time.perf_counter()
+                self.stats["queue_wait_ms_total"] += sum(now - request.enqueued_at for request in batch) * 1000
+                self.stats["batches"] += 1
+                self.batch_sizes[len(batch)] += 1
+                try:
+                    results = await loop.run_in_executor(self.executor, self.run_batch, model_info, batch)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    logger.error(f"❌ Error en lote de traducción ({len(batch)} textos): {e}")
+                    if len(batch) == 1:
+                        if not batch[0].future.done():
+                            batch[0].future.set_exception(e)
+                        continue
+                    # Aislar la petición culpable: el resto del lote no debe fallar con ella
+                    for request in batch:
+                        await self._run_single(loop, model_info, request)
+                    continue
+                for request, result in zip(batch, results):
+                    if not request.future.done():  # La petición pudo cancelarse mientras esperaba
+                        request.future.set_result(result)
+
+    async def _run_single(self, loop, model_info: Any, request: BatchRequest):
+        if request.future.done():
+            return
+        try:
+            result = (await loop.run_in_executor(self.executor, self.run_batch, model_info, [request]))[0]
+        except Exception as e:
+            if not request.future.done():
+                request.future.set_exception(e)
+            return
+        if not request.future.done():
+            request.future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        batches = self.stats["batches"]
+        batched = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queued": len(self.pending),
+            **{key: value for key, value in self.stats.items() if key != "queue_wait_ms_total"},
+            "avg_batch_size": round(batched / batches, 2) if batches else 0.0,
+            "avg_queue_wait_ms": round(self.stats["queue_wait_ms_total"] / batched, 2) if batched else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items()))
+        }
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+VokaFlow - Cache de traducciones en varios niveles
+LRU en proceso -> Redis compartido -> modelo, con clave por (texto normalizado,
+origen, destino, versión del modelo, parámetros de decodificación), cache
+negativa de corta duración y single-flight de fallos concurrentes idénticos
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger("vokaflow.translation.cache")
+
+KEY_PREFIX = "vokaflow:translation:v1:"
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """NFC + espacios colapsados; se conservan mayúsculas y puntuación (cambian la traducción)"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+class TranslationCache:
+    """
+    Cache de resultados de traducción
+
+    Los valores son diccionarios serializables (campos de TranslationResult).
+    Las entradas negativas (el modelo falló y se devolvió el fallback) solo viven
+    en memoria y durante negative_ttl segundos: evitan martillear un modelo roto
+    sin fijar el fallback en el tier compartido
+    """
+
+    def __init__(self, max_entries: int = 10000, redis_url: Optional[str] = None,
+                 redis_ttl: int = 7 * 24 * 3600, negative_ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.redis_url = redis_url
+        self.redis_ttl = redis_ttl
+        self.negative_ttl = negative_ttl
+        self.entries: "OrderedDict[str, Tuple[Dict[str, Any], Optional[float]]]" = OrderedDict()
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.redis_client = None
+        self.redis_disabled_until = 0.0
+        self.redis_retry_after = 30.0  # Tras un error, Redis se omite durante este tiempo
+        self.write_tasks = set()
+        self.stats = {
+            "requests": 0, "memory_hits": 0, "redis_hits": 0, "negative_hits": 0,
+            "coalesced": 0, "misses": 0, "identity": 0, "redis_errors": 0
+        }
+
+    def make_key(self, text: str, source_lang: str, target_lang: str,
+                 model_version: str, decoding: Dict[str, Any]) -> str:
+        material = json.dumps(
+            [model_version, decoding, source_lang, target_lang, normalize_text(text)],
+            sort_keys=True, ensure_ascii=False
+        )
+        return KEY_PREFIX + hashlib.sha1(material.encode()).hexdigest()
+
+    # --- Tier en memoria -------------------------------------------------------------
+
+    def _get_local(self, key: str) -> Optional[Tuple[Dict[str, Any], bool]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value, expires_at is not None
+
+    def _put_local(self, key: str, value: Dict[str, Any], negative: bool = False):
+        self.entries[key] = (value, time.monotonic() + self.negative_ttl if negative else None)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    # --- Tier Redis ------------------------------------------------------------------
+
+    def _redis(self):
+        if not self.redis_url or time.monotonic() < self.redis_disabled_until:
+            return None
+        if self.redis_client is None:
+            try:
+                import redis.asyncio as aioredis
+            except ImportError:
+                self.redis_url = None
+                return None
+            # Timeouts cortos: un Redis lento no debe costar más que la propia traducción
+            self.redis_client = aioredis.from_url(
+                self.redis_url, decode_responses=True, socket_timeout=0.1, socket_connect_timeout=0.2
+            )
+        return self.redis_client
+
+    def _redis_failed(self, error: Exception):
+        self.stats["redis_errors"] += 1
+        self.redis_disabled_until = time.monotonic() + self.redis_retry_after
+        logger.warning(f"⚠️ Cache de traducción: Redis no disponible ({error}), solo memoria durante {self.redis_retry_after:.0f}s")
+
+    async def _get_redis(self, key: str) -> Optional[Dict[str, Any]]:
+        client = self._redis()
+        if client is None:
+            return None
+        try:
+            raw = await client.get(key)
+        except Exception as e:
+            self._redis_failed(e)
+            return None
+        return json.loads(raw) if raw else None
+
+    def _put_redis(self, key: str, value: Dict[str, Any]):
+        client = self._redis()
+        if client is None:
+            return
+
+        async def write():
+            try:
+                await client.set(key, json.dumps(value, ensure_ascii=False), ex=self.redis_ttl)
+            except Exception as e:
+                self._redis_failed(e)
+
+        # Escritura en segundo plano: no suma latencia a la respuesta
+        task = asyncio.create_task(write())
+        self.write_tasks.add(task)
+        task.add_done_callback(self.write_tasks.discard)
+
+    # --- API -------------------------------------------------------------------------
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Tuple[Dict[str, Any], bool]]]
+                             ) -> Tuple[Dict[str, Any], str]:
+        """
+        Devuelve (valor, tier) con tier en memory | redis | negative | coalesced | model
+
+        compute() devuelve (valor, cacheable); lo no cacheable se guarda como negativo
+        """
+        self.stats["requests"] += 1
+
+        local = self._get_local(key)
+        if local is not None:
+            value, negative = local
+            self.stats["negative_hits" if negative else "memory_hits"] += 1
+            return value, "negative" if negative else "memory"
+
+        # Single-flight: un fallo idéntico en curso se comparte en lugar de traducirse dos veces
+        inflight = self.inflight.get(key)
+        if inflight is not None:
+            self.stats["coalesced"] += 1
+            try:
+                value, _ = await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # Se canceló la petición líder, no esta: calcular por cuenta propia
+                self.stats["requests"] -= 1
+                self.stats["coalesced"] -= 1
+                return await self.get_or_compute(key, compute)
+            return value, "coalesced"
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())  # Sin "exception never retrieved"
+        self.inflight[key] = future
+        try:
+            value = await self._get_redis(key)
+            if value is not None:
+                self.stats["redis_hits"] += 1
+                self._put_local(key, value)
+                tier = "redis"
+            else:
+                self.stats["misses"] += 1
+                value, cacheable = await compute()
+                self._put_local(key, value, negative=not cacheable)
+                if cacheable:
+                    self._put_redis(key, value)
+                tier = "model"
+            future.set_result((value, tier))
+            return value, tier
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self.inflight.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        requests = self.stats["requests"]
+        hits = self.stats["memory_hits"] + self.stats["redis_hits"] + self.stats["negative_hits"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "hit_rate": round(hits / requests, 4) if requests else 0.0,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "redis_enabled": bool(self.redis_url),
+            "redis_available": bool(self.redis_url) and time.monotonic() >= self.redis_disabled_until
+        }
+
+    def clear(self):
+        self.entries.clear()
+
+# Instancia global
+translation_cache = TranslationCache(
+    max_entries=int(os.getenv("VOKAFLOW_TRANSLATION_CACHE_SIZE", "10000")),
+    redis_url=os.getenv("VOKAFLOW_TRANSLATION_CACHE_REDIS_URL", os.getenv("REDIS_URL")),
+    redis_ttl=int(os.getenv("VOKAFLOW_TRANSLATION_CACHE_TTL", str(7 * 24 * 3600)))
+)
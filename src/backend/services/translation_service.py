@@ -5,15 +5,24 @@ Integración completa con NLLB-3.3B para traducción de alta calidad
 """
 
 import logging
+import os
 import time
 import asyncio
 import torch
-from typing import Dict, Any, Optional, List, Tuple
+from collections import deque
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator
 import re
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 
-from .model_manager import model_manager, ModelInfo
+from .model_manager import model_manager, ModelInfo, ModelNotReady
+from .model_worker_pool import model_worker_pool
+from .translation_batcher import BatchRequest, TranslationBatcher
+from .translation_cache import translation_cache
+from .decoding_policy import DecodingParams, policy_from_env
+from .nllb_languages import NLLB_LANGUAGE_CODES, NllbLanguageTable
+from .language_id import get_language_identifier
+from .sentence_splitter import split_sentences, join_sentences
 
 logger = logging.getLogger("vokaflow.translation")
 
@@ -30,95 +39,37 @@ class TranslationResult:
     detected_language: Optional[str] = None
     character_count: int = 0
     word_count: int = 0
+    cache_tier: Optional[str] = None  # memory | redis | negative | coalesced | model (None: sin cache)
 
 class TranslationService:
     """Servicio de traducción usando NLLB-3.3B"""
     
     def __init__(self):
         self.model_name = "nllb-3.3b"
+        self.model_version = os.getenv("VOKAFLOW_TRANSLATION_MODEL_VERSION", "1")  # Subirla invalida la cache
+        self.cache = translation_cache
+        self.cache_enabled = os.getenv("VOKAFLOW_TRANSLATION_CACHE", "1") == "1"
+        # Textos más largos se traducen frase a frase (sin truncar a max_length tokens)
+        self.segment_max_chars = int(os.getenv("VOKAFLOW_TRANSLATION_SEGMENT_CHARS", "400"))
+        
+        # Micro-batching: las peticiones concurrentes comparten un generate
+        self.batching_enabled = os.getenv("VOKAFLOW_TRANSLATION_BATCHING", "1") == "1"
+        self.max_batch_tokens = int(os.getenv("VOKAFLOW_TRANSLATION_BATCH_TOKENS", "4096"))  # Lote x longitud con padding
+        self.batcher = TranslationBatcher(
+            self._translate_batch_with_nllb,
+            max_batch_size=int(os.getenv("VOKAFLOW_TRANSLATION_BATCH_SIZE", "16")),
+            max_wait_ms=float(os.getenv("VOKAFLOW_TRANSLATION_BATCH_WAIT_MS", "5"))
+        )
+        # Frases en vuelo por documento/stream: uno grande no llena la cola ni dispara la presión de carga
+        self.segment_window = max(1, int(os.getenv("VOKAFLOW_TRANSLATION_SEGMENT_WINDOW", str(2 * self.batcher.max_batch_size))))
+        
+        # Greedy/beam según longitud y carga; la carga son las traducciones esperando al modelo
+        self.decoding_policy = policy_from_env()
+        self.pending_translations = 0
         
         # Mapeo de códigos de idioma a códigos NLLB
-        self.language_mapping = {
-            "es": "spa_Latn",  # Español
-            "en": "eng_Latn",  # Inglés
-            "fr": "fra_Latn",  # Francés
-            "de": "deu_Latn",  # Alemán
-            "it": "ita_Latn",  # Italiano
-            "pt": "por_Latn",  # Portugués
-            "ru": "rus_Cyrl",  # Ruso
-            "zh": "zho_Hans",  # Chino simplificado
-            "ja": "jpn_Jpan",  # Japonés
-            "ko": "kor_Hang",  # Coreano
-            "ar": "arb_Arab",  # Árabe
-            "hi": "hin_Deva",  # Hindi
-            "tr": "tur_Latn",  # Turco
-            "nl": "nld_Latn",  # Holandés
-            "sv": "swe_Latn",  # Sueco
-            "no": "nob_Latn",  # Noruego
-            "da": "dan_Latn",  # Danés
-            "fi": "fin_Latn",  # Finlandés
-            "pl": "pol_Latn",  # Polaco
-            "cs": "ces_Latn",  # Checo
-            "hu": "hun_Latn",  # Húngaro
-            "ro": "ron_Latn",  # Rumano
-            "bg": "bul_Cyrl",  # Búlgaro
-            "hr": "hrv_Latn",  # Croata
-            "sk": "slk_Latn",  # Eslovaco
-            "sl": "slv_Latn",  # Esloveno
-            "et": "est_Latn",  # Estonio
-            "lv": "lvs_Latn",  # Letón
-            "lt": "lit_Latn",  # Lituano
-            "mt": "mlt_Latn",  # Maltés
-            "ga": "gle_Latn",  # Irlandés
-            "cy": "cym_Latn",  # Galés
-            "eu": "eus_Latn",  # Euskera
-            "ca": "cat_Latn",  # Catalán
-            "gl": "glg_Latn",  # Gallego
-            "is": "isl_Latn",  # Islandés
-            "mk": "mkd_Cyrl",  # Macedonio
-            "sr": "srp_Cyrl",  # Serbio
-            "uk": "ukr_Cyrl",  # Ucraniano
-            "be": "bel_Cyrl",  # Bielorruso
-            "th": "tha_Thai",  # Tailandés
-            "vi": "vie_Latn",  # Vietnamita
-            "id": "ind_Latn",  # Indonesio
-            "ms": "zsm_Latn",  # Malayo
-            "tl": "tgl_Latn",  # Tagalo
-            "sw": "swh_Latn",  # Swahili
-            "he": "heb_Hebr",  # Hebreo
-            "fa": "pes_Arab",  # Persa
-            "ur": "urd_Arab",  # Urdu
-            "bn": "ben_Beng",  # Bengalí
-            "gu": "guj_Gujr",  # Gujarati
-            "kn": "kan_Knda",  # Kannada
-            "ml": "mal_Mlym",  # Malayalam
-            "mr": "mar_Deva",  # Marathi
-            "ne": "npi_Deva",  # Nepalí
-            "pa": "pan_Guru",  # Punjabi
-            "si": "sin_Sinh",  # Cingalés
-            "ta": "tam_Taml",  # Tamil
-            "te": "tel_Telu",  # Telugu
-            "my": "mya_Mymr",  # Birmano
-            "km": "khm_Khmr",  # Jemer
-            "lo": "lao_Laoo",  # Lao
-            "ka": "kat_Geor",  # Georgiano
-            "hy": "hye_Armn",  # Armenio
-            "az": "azj_Latn",  # Azerbaiyano
-            "kk": "kaz_Cyrl",  # Kazajo
-            "ky": "kir_Cyrl",  # Kirguís
-            "tg": "tgk_Cyrl",  # Tayiko
-            "tk": "tuk_Latn",  # Turcomano
-            "uz": "uzn_Latn",  # Uzbeko
-            "mn": "khk_Cyrl",  # Mongol
-            "am": "amh_Ethi",  # Amhárico
-            "ig": "ibo_Latn",  # Igbo
-            "yo": "yor_Latn",  # Yoruba
-            "zu": "zul_Latn",  # Zulú
-            "af": "afr_Latn",  # Afrikáans
-            "sq": "als_Latn",  # Albanés
-            "lv": "lvs_Latn",  # Letón
-            "lt": "lit_Latn",  # Lituano
-        }
+        self.language_mapping = dict(NLLB_LANGUAGE_CODES)
+        self.detectable_languages = tuple(self.language_mapping)
         
         # Patrones para detección de idioma
         self.language_patterns = {
@@ -150,6 +101,14 @@ class TranslationService:
         return self.language_mapping.get(lang_code, lang_code)
     
     def detect_language(self, text: str) -> Tuple[str, float]:
+        """Detecta el idioma del texto (n-gramas si hay perfiles entrenados, si no patrones)"""
+        identifier = get_language_identifier()
+        if identifier is not None:
+            # Solo idiomas que NLLB puede traducir desde aquí
+            return identifier.identify(text, candidates=self.detectable_languages)
+        return self._detect_language_patterns(text)
+    
+    def _detect_language_patterns(self, text: str) -> Tuple[str, float]:
         """Detecta el idioma del texto usando patrones"""
         text_lower = text.lower()
         scores = {}
@@ -183,9 +142,175 @@ class TranslationService:
         target_lang: str,
         source_lang: Optional[str] = None,
         context: Optional[str] = None,
-        max_length: int = 512
+        max_length: int = 512,
+        num_beams: Optional[int] = None
+    ) -> TranslationResult:
+        """Traduce texto usando NLLB-3.3B (a través de la cache de traducciones)"""
+        if len(text) > self.segment_max_chars:
+            return await self._translate_document(text, target_lang, source_lang, context, max_length, num_beams)
+        
+        if not self.cache_enabled:
+            return await self._translate_uncached(text, target_lang, source_lang, context, max_length, num_beams)
+        
+        start_time = time.time()
+        if source_lang and source_lang == target_lang:
+            # Identidad: nunca llega al modelo ni ocupa la cache
+            self.cache.stats["identity"] += 1
+            return await self._translate_uncached(text, target_lang, source_lang, context, max_length, num_beams)
+        
+        key = self.cache.make_key(text, source_lang or "auto", target_lang, *self._cache_namespace(max_length, num_beams))
+        
+        async def compute():
+            result = await self._translate_uncached(text, target_lang, source_lang, context, max_length, num_beams)
+            value = asdict(result)
+            del value["processing_time"], value["cache_tier"]
+            # Solo las traducciones del modelo se comparten; el fallback queda como entrada negativa
+            return value, result.model_used == self.model_name
+        
+        value, tier = await self.cache.get_or_compute(key, compute)
+        return TranslationResult(**value, processing_time=time.time() - start_time, cache_tier=tier)
+    
+    async def _translate_document(
+        self,
+        text: str,
+        target_lang: str,
+        source_lang: Optional[str],
+        context: Optional[str],
+        max_length: int,
+        num_beams: Optional[int] = None
+    ) -> TranslationResult:
+        """Documento largo: frases en paralelo (el batcher las agrupa) y recomposición"""
+        start_time = time.time()
+        detected_language = None
+        if not source_lang:
+            detected_language, _ = self.detect_language(text)
+            source_lang = detected_language
+        
+        segments = split_sentences(text, source_lang, self.segment_max_chars)
+        results = [
+            result async for result in self._translate_segments(
+                segments, target_lang, source_lang, context, max_length, num_beams
+            )
+        ]
+        
+        translated_text = join_sentences([
+            (result.translated_text, separator) for result, (_, separator) in zip(results, segments)
+        ])
+        weights = [max(1, len(sentence)) for sentence, _ in segments]
+        confidence = sum(result.confidence * weight for result, weight in zip(results, weights)) / sum(weights)
+        models = {result.model_used for result in results}
+        
+        return TranslationResult(
+            translated_text=translated_text,
+            source_lang=source_lang,
+            target_lang=target_lang,
+            confidence=confidence,
+            processing_time=time.time() - start_time,
+            model_used=models.pop() if len(models) == 1 else "mixed",
+            detected_language=detected_language,
+            character_count=len(text),
+            word_count=len(text.split()),
+            alternatives=[]
+        )
+    
+    async def translate_stream(
+        self,
+        text: str,
+        target_lang: str,
+        source_lang: Optional[str] = None,
+        context: Optional[str] = None,
+        max_length: int = 512,
+        num_beams: Optional[int] = None
+    ) -> AsyncIterator[Tuple[int, int, str, str, TranslationResult]]:
+        """
+        Traduce frase a frase y entrega (índice, total, frase, separador, resultado) en orden
+        
+        La primera frase se traduce sola para que llegue cuanto antes; el resto va
+        en una ventana de segment_window frases que el batcher agrupa mientras se
+        van entregando
+        """
+        if not source_lang:
+            source_lang, confidence = self.detect_language(text)
+            logger.info(f"Idioma detectado: {source_lang} (confianza: {confidence:.2f})")
+        
+        segments = split_sentences(text, source_lang, self.segment_max_chars)
+        if not segments:
+            return
+        
+        first_sentence, first_separator = segments[0]
+        first = await self.translate_text(first_sentence, target_lang, source_lang, context, max_length, num_beams)
+        yield 0, len(segments), first_sentence, first_separator, first
+        
+        results = self._translate_segments(segments[1:], target_lang, source_lang, context, max_length, num_beams)
+        try:
+            index = 1
+            async for result in results:
+                sentence, separator = segments[index]
+                yield index, len(segments), sentence, separator, result
+                index += 1
+        finally:
+            # Cliente desconectado: no seguir traduciendo lo que nadie va a leer
+            await results.aclose()
+    
+    async def _translate_segments(
+        self,
+        segments: List[Tuple[str, str]],
+        target_lang: str,
+        source_lang: str,
+        context: Optional[str],
+        max_length: int,
+        num_beams: Optional[int]
+    ) -> AsyncIterator[TranslationResult]:
+        """Resultados en orden con como mucho segment_window frases en vuelo"""
+        pending = deque()
+        sentences = iter(segments)
+        try:
+            while True:
+                while len(pending) < self.segment_window:
+                    sentence, _ = next(sentences, (None, None))
+                    if sentence is None:
+                        break
+                    pending.append(asyncio.create_task(
+                        self.translate_text(sentence, target_lang, source_lang, context, max_length, num_beams)
+                    ))
+                if not pending:
+                    return
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def _cache_namespace(self, max_length: int, num_beams: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+        """Versión del modelo y parámetros de decodificación que forman parte de la clave"""
+        config = model_manager.model_configs[self.model_name]
+        mode = "fp16" if torch.cuda.is_available() else config.get("cpu_inference", "fp32")
+        # Sin num_beams explícito la clave es la política, no la elección del momento (depende de
+        # la carga): un mismo texto no se duplica en cache por haberse traducido con cola llena
+        decoding = {
+            "num_beams": num_beams if num_beams is not None else "adaptive",
+            "default_beams": self.decoding_policy.default_beams,
+            "max_length": max_length,
+            "repetition_penalty": 1.1
+        }
+        return f"{self.model_name}:{mode}:{self.model_version}", decoding
+    
+    async def _translate_uncached(
+        self,
+        text: str,
+        target_lang: str,
+        source_lang: Optional[str] = None,
+        context: Optional[str] = None,
+        max_length: int = 512,
+        num_beams: Optional[int] = None
     ) -> TranslationResult:
-        """Traduce texto usando NLLB-3.3B"""
+        """Traducción efectiva (pool remoto o modelo local)"""
+        if model_worker_pool.enabled:
+            # Los pesos viven en el pool de workers de modelos (VOKAFLOW_MODEL_SERVING=remote)
+            return await model_worker_pool.call(
+                "translate", text=text, target_lang=target_lang, source_lang=source_lang,
+                context=context, max_length=max_length, num_beams=num_beams
+            )
+        
         start_time = time.time()
         
         try:
@@ -211,9 +336,8 @@ class TranslationService:
                 )
             
             # Obtener modelo NLLB
-            model_info = await asyncio.get_event_loop().run_in_executor(
-                None, model_manager.get_model, self.model_name
-            )
+            # Carga en el executor del gestor; si tarda más de lo razonable -> ModelNotReady (503)
+            model_info = await model_manager.aget_model(self.model_name)
             
             if not model_info or not model_info.model:
                 # Fallback a traducción simulada si el modelo no está disponible
@@ -226,11 +350,22 @@ class TranslationService:
             
             logger.info(f"Traduciendo: {nllb_source} -> {nllb_target}")
             
-            # Realizar traducción en hilo separado
-            translated_text, confidence = await asyncio.get_event_loop().run_in_executor(
-                None, self._translate_with_nllb, 
-                model_info, text, nllb_source, nllb_target, max_length
-            )
+            decoding = self.decoding_policy.choose(text, self.pending_translations, num_beams)
+            
+            # Realizar traducción en hilo separado (agrupada con las peticiones concurrentes)
+            self.pending_translations += 1
+            try:
+                if self.batching_enabled:
+                    translated_text, confidence = await self.batcher.submit(
+                        model_info, text, nllb_source, nllb_target, max_length, decoding
+                    )
+                else:
+                    translated_text, confidence = await asyncio.get_event_loop().run_in_executor(
+                        None, self._translate_with_nllb, 
+                        model_info, text, nllb_source, nllb_target, max_length, decoding
+                    )
+            finally:
+                self.pending_translations -= 1
             
             processing_time = time.time() - start_time
             
@@ -247,6 +382,8 @@ class TranslationService:
                 alternatives=[]  # TODO: Implementar alternativas
             )
             
+        except ModelNotReady:
+            raise
         except Exception as e:
             logger.error(f"Error en traducción NLLB: {e}")
             # Fallback a traducción simulada en caso de error
@@ -258,60 +395,38 @@ class TranslationService:
         text: str,
         source_lang: str,
         target_lang: str,
-        max_length: int
+        max_length: int,
+        decoding: Optional[DecodingParams] = None
     ) -> Tuple[str, float]:
         """Realiza la traducción usando el modelo NLLB cargado"""
+        decoding = decoding or DecodingParams(num_beams=self.decoding_policy.default_beams, reason="default")
         try:
             model = model_info.model
             tokenizer = model_info.tokenizer
             
             logger.info(f"🔄 Traduciendo con NLLB: {source_lang} -> {target_lang}")
             
-            # Configurar idioma origen en el tokenizer
-            tokenizer.src_lang = source_lang
+            # Tokenizar el texto de entrada (tokens de idioma precalculados al cargar el modelo)
+            language_table = self._language_table(model_info)
+            input_ids = language_table.encode(tokenizer, [text], source_lang, max_length)[0]
             
-            # Tokenizar el texto de entrada
-            inputs = tokenizer(
-                text,
-                return_tensors="pt",
-                padding=True,
-                truncation=True,
-                max_length=max_length
-            )
-            
-            # Mover a dispositivo correcto
-            device = next(model.parameters()).device
-            inputs = {k: v.to(device) for k, v in inputs.items()}
+            # Mover a dispositivo correcto (los modelos ONNX Runtime no tienen parameters())
+            device = model.device
+            inputs = {
+                "input_ids": torch.tensor([input_ids], device=device),
+                "attention_mask": torch.ones((1, len(input_ids)), dtype=torch.long, device=device)
+            }
             
             # Generar traducción
             with torch.no_grad():
-                # Obtener el token de idioma objetivo
-                target_lang_id = tokenizer.convert_tokens_to_ids(target_lang)
-                
-                # Si no se encuentra el idioma, usar el mapeo de códigos
-                if target_lang_id == tokenizer.unk_token_id:
-                    # Intentar con el formato completo del idioma
-                    target_token = target_lang
-                    if hasattr(tokenizer, 'lang_code_to_id') and target_lang in tokenizer.lang_code_to_id:
-                        target_lang_id = tokenizer.lang_code_to_id[target_lang]
-                    else:
-                        # Fallback: usar el primer token del vocabulario que coincida
-                        for token, token_id in tokenizer.get_vocab().items():
-                            if target_lang in token:
-                                target_lang_id = token_id
-                                break
-                
-                # Generar la traducción
+                # Generar la traducción (sin token de idioma destino no se fuerza el BOS)
                 outputs = model.generate(
                     **inputs,
-                    forced_bos_token_id=target_lang_id if target_lang_id != tokenizer.unk_token_id else None,
-                    max_length=max_length,
-                    num_beams=4,
-                    early_stopping=True,
-                    do_sample=False,
+                    forced_bos_token_id=language_table.token_id(target_lang),
+                    max_new_tokens=self.decoding_policy.max_new_tokens(len(input_ids), max_length),
                     pad_token_id=tokenizer.pad_token_id,
                     eos_token_id=tokenizer.eos_token_id,
-                    repetition_penalty=1.1
+                    **decoding.generate_kwargs()
                 )
             
             # Decodificar el resultado
@@ -320,20 +435,7 @@ class TranslationService:
                 skip_special_tokens=True
             ).strip()
             
-            # Remover el texto original si se repitió
-            if translated_text.startswith(text):
-                translated_text = translated_text[len(text):].strip()
-            
-            # Calcular confianza basada en la calidad de la traducción
-            if len(translated_text) == 0:
-                confidence = 0.1
-            elif translated_text == text:
-                confidence = 0.3  # Probable que no se tradujo
-            else:
-                # Confianza basada en longitud relativa y diferencia del texto original
-                length_ratio = len(translated_text) / max(1, len(text))
-                similarity = 1.0 if translated_text != text else 0.5
-                confidence = min(0.95, 0.7 + (length_ratio * 0.15) + (similarity * 0.1))
+            translated_text, confidence = self._finalize_translation(text, translated_text)
             
             logger.info(f"✅ NLLB traducción completada: '{text[:30]}...' -> '{translated_text[:30]}...'")
             
@@ -343,6 +445,106 @@ class TranslationService:
             logger.error(f"❌ Error en _translate_with_nllb: {e}")
             raise
     
+    def _translate_batch_with_nllb(
+        self,
+        model_info: ModelInfo,
+        requests: List[BatchRequest]
+    ) -> List[Tuple[str, float]]:
+        """Traduce un lote con un solo generate por sub-lote; admite pares de idiomas mezclados"""
+        model = model_info.model
+        tokenizer = model_info.tokenizer
+        results: List[Optional[Tuple[str, float]]] = [None] * len(requests)
+        
+        language_table = self._language_table(model_info)
+        
+        # El idioma origen es un prefijo de cada secuencia: una llamada al tokenizer por
+        # (idioma origen, max_length) con los tokens especiales ya calculados
+        encoded: List[Optional[List[int]]] = [None] * len(requests)
+        groups: Dict[Tuple[str, int], List[int]] = {}
+        for i, request in enumerate(requests):
+            groups.setdefault((request.source_lang, request.max_length), []).append(i)
+        for (source_lang, max_length), indices in groups.items():
+            texts = [requests[i].text for i in indices]
+            for i, input_ids in zip(indices, language_table.encode(tokenizer, texts, source_lang, max_length)):
+                encoded[i] = input_ids
+        
+        # El idioma destino va en el prefijo del decoder de cada fila ([inicio, idioma]), que es
+        # exactamente lo que forced_bos_token_id fuerza en la ruta individual
+        target_ids = [language_table.token_id(request.target_lang) for request in requests]
+        batchable = []
+        for i, request in enumerate(requests):
+            if target_ids[i] is None:
+                # Idioma sin token: misma ruta individual que sin batching (generate sin forzar idioma)
+                results[i] = self._translate_with_nllb(
+                    model_info, request.text, request.source_lang, request.target_lang, request.max_length,
+                    request.decoding
+                )
+            else:
+                batchable.append(i)
+        
+        # Ordenar por longitud y trocear por tokens con padding: sub-lotes homogéneos
+        batchable.sort(key=lambda i: len(encoded[i]))
+        chunks, chunk = [], []
+        for i in batchable:
+            if chunk and (len(chunk) + 1) * len(encoded[i]) > self.max_batch_tokens:
+                chunks.append(chunk)
+                chunk = []
+            chunk.append(i)
+        if chunk:
+            chunks.append(chunk)
+        
+        device = model.device
+        decoder_start = model.config.decoder_start_token_id
+        # El batcher solo agrupa peticiones con los mismos parámetros de decodificación
+        decoding = requests[0].decoding or DecodingParams(num_beams=self.decoding_policy.default_beams, reason="default")
+        for chunk in chunks:
+            features = tokenizer.pad({"input_ids": [encoded[i] for i in chunk]}, return_tensors="pt")
+            decoder_input_ids = torch.tensor([[decoder_start, target_ids[i]] for i in chunk])
+            # Límite de salida de la fila más larga del sub-lote
+            max_new_tokens = max(
+                self.decoding_policy.max_new_tokens(len(encoded[i]), requests[i].max_length) for i in chunk
+            )
+            with torch.no_grad():
+                outputs = model.generate(
+                    input_ids=features["input_ids"].to(device),
+                    attention_mask=features["attention_mask"].to(device),
+                    decoder_input_ids=decoder_input_ids.to(device),
+                    max_new_tokens=max_new_tokens,
+                    pad_token_id=tokenizer.pad_token_id,
+                    eos_token_id=tokenizer.eos_token_id,
+                    **decoding.generate_kwargs()
+                )
+            for i, translated_text in zip(chunk, tokenizer.batch_decode(outputs, skip_special_tokens=True)):
+                results[i] = self._finalize_translation(requests[i].text, translated_text.strip())
+        
+        logger.info(f"✅ NLLB lote completado: {len(requests)} textos en {len(chunks)} generate")
+        return results
+    
+    def _language_table(self, model_info: ModelInfo) -> NllbLanguageTable:
+        """Tabla de idiomas del modelo; el gestor la crea al cargar, aquí solo si vino de otra vía"""
+        if model_info.language_table is None:
+            model_info.language_table = NllbLanguageTable(model_info.tokenizer, self.language_mapping)
+        return model_info.language_table
+    
+    def _finalize_translation(self, text: str, translated_text: str) -> Tuple[str, float]:
+        """Limpia la salida decodificada y estima la confianza"""
+        # Remover el texto original si se repitió
+        if translated_text.startswith(text):
+            translated_text = translated_text[len(text):].strip()
+        
+        # Calcular confianza basada en la calidad de la traducción
+        if len(translated_text) == 0:
+            confidence = 0.1
+        elif translated_text == text:
+            confidence = 0.3  # Probable que no se tradujo
+        else:
+            # Confianza basada en longitud relativa y diferencia del texto original
+            length_ratio = len(translated_text) / max(1, len(text))
+            similarity = 1.0 if translated_text != text else 0.5
+            confidence = min(0.95, 0.7 + (length_ratio * 0.15) + (similarity * 0.1))
+        
+        return translated_text, confidence
+    
     async def _fallback_translation(
         self,
         text: str,
@@ -446,12 +648,19 @@ class TranslationService:
         """Traduce múltiples textos en lote"""
         results = []
         
-        for text in texts:
-            try:
-                result = await self.translate_text(text, target_lang, source_lang)
-                results.append(result)
-            except Exception as e:
-                logger.error(f"Error traduciendo texto en lote: {e}")
+        # Concurrentes: el batcher los agrupa en el mismo generate
+        outcomes = await asyncio.gather(
+            *(self.translate_text(text, target_lang, source_lang) for text in texts),
+            return_exceptions=True
+        )
+        
+        for text, outcome in zip(texts, outcomes):
+            if isinstance(outcome, ModelNotReady):
+                raise outcome
+            if not isinstance(outcome, Exception):
+                results.append(outcome)
+            else:
+                logger.error(f"Error traduciendo texto en lote: {outcome}")
                 # Agregar resultado de error
                 results.append(TranslationResult(
                     translated_text=f"[ERROR] {text}",
@@ -482,6 +691,7 @@ class TranslationService:
     async def get_service_status(self) -> Dict[str, Any]:
         """Obtiene estado del servicio de traducción"""
         model_loaded = self.model_name in model_manager.loaded_models
+        identifier = get_language_identifier()
         
         return {
             "status": "operational" if model_loaded else "ready",
@@ -489,7 +699,11 @@ class TranslationService:
             "model_loaded": model_loaded,
             "supported_languages": len(self.language_mapping),
             "gpu_available": torch.cuda.is_available(),
-            "memory_usage": model_manager.get_memory_usage()
+            "memory_usage": model_manager.get_memory_usage(),
+            "batching": {"enabled": self.batching_enabled, **self.batcher.get_stats()},
+            "decoding": {"pending": self.pending_translations, **self.decoding_policy.get_stats()},
+            "cache": {"enabled": self.cache_enabled, **self.cache.get_stats()},
+            "language_id": identifier.get_stats() if identifier else {"engine": "patterns"}
         }
 
 # Instancia global del servicio de traducción
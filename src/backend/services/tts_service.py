@@ -21,7 +21,8 @@ from dataclasses import dataclass
 import librosa
 import soundfile as sf
 
-from .model_manager import model_manager, ModelInfo
+from .model_manager import model_manager, ModelInfo, ModelNotReady
+from .model_worker_pool import model_worker_pool
 
 logger = logging.getLogger("vokaflow.tts")
 
@@ -306,6 +307,13 @@ class TTSService:
         output_format: str = "wav"
     ) -> TTSResult:
         """Sintetiza voz usando XTTS-V2"""
+        if model_worker_pool.enabled:
+            # Los pesos viven en el pool de workers de modelos (VOKAFLOW_MODEL_SERVING=remote)
+            return await model_worker_pool.call(
+                "synthesize", text=text, voice_id=voice_id, language=language, speed=speed,
+                temperature=temperature, output_format=output_format
+            )
+        
         start_time = time.time()
         
         try:
@@ -323,9 +331,8 @@ class TTSService:
                 return await self._fallback_synthesis(text, language, start_time)
             
             # Obtener modelo XTTS
-            model_info = await asyncio.get_event_loop().run_in_executor(
-                None, model_manager.get_model, self.model_name
-            )
+            # Carga en el executor del gestor; si tarda más de lo razonable -> ModelNotReady (503)
+            model_info = await model_manager.aget_model(self.model_name)
             
             if not model_info or not model_info.model:
                 # Fallback a síntesis simulada
@@ -365,6 +372,8 @@ class TTSService:
                 }
             )
             
+        except ModelNotReady:
+            raise
         except Exception as e:
             logger.error(f"❌ Error en síntesis XTTS: {e}")
             # Fallback en caso de error
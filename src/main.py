@@ -66,6 +66,7 @@ from src.backend.routers.files import router as files_router
 from src.backend.routers.high_scale_tasks import router as high_scale_tasks_router
 from src.backend.routers.translation import router as translation_router
 from src.backend.routers.chat import router as chat_router
+from src.backend.services.model_manager import ModelNotReady
 
 # Configuración de logging
 logs_dir = os.path.join(os.getcwd(), 'logs')
@@ -305,16 +306,23 @@ async def lifespan(app: FastAPI):
     
     # Importar el gestor de modelos
     from src.backend.services.model_manager import model_manager
+    from src.backend.services.model_worker_pool import model_worker_pool
     
-    # Precargar modelos esenciales en GPU
-    logger.info("📥 Iniciando precarga de modelos AI esenciales...")
-    try:
-        preload_summary = await model_manager.preload_essential_models()
-        logger.info(f"✅ Precarga de modelos completada - Éxito: {preload_summary['success_rate']:.1f}%")
-        logger.info(f"🖥️ Modelos en GPU: {preload_summary['models_on_gpu']}/{len(preload_summary['preload_results'])}")
-    except Exception as e:
-        logger.error(f"❌ Error en precarga de modelos: {e}")
-        preload_summary = {"error": str(e), "success_rate": 0}
+    if model_worker_pool.enabled:
+        # Modo remoto: los pesos viven en el pool de workers de modelos, este proceso no carga nada
+        logger.info("🔌 Modelos servidos por el pool de workers, omitiendo precarga local")
+        await model_worker_pool.start()
+        preload_summary = {"mode": "remote", **model_worker_pool.get_status()}
+    else:
+        # Precargar modelos esenciales en GPU
+        logger.info("📥 Iniciando precarga de modelos AI esenciales...")
+        try:
+            preload_summary = await model_manager.preload_essential_models()
+            logger.info(f"✅ Precarga de modelos completada - Éxito: {preload_summary['success_rate']:.1f}%")
+            logger.info(f"🖥️ Modelos en GPU: {preload_summary['models_on_gpu']}/{len(preload_summary['preload_results'])}")
+        except Exception as e:
+            logger.error(f"❌ Error en precarga de modelos: {e}")
+            preload_summary = {"error": str(e), "success_rate": 0}
     
     # Registrar evento de inicio
     async with database.transaction():
@@ -341,9 +349,12 @@ async def lifespan(app: FastAPI):
     
     # Limpiar modelos de memoria
     try:
-        logger.info("🧹 Limpiando modelos AI de memoria...")
-        model_manager.cleanup_all()
-        logger.info("✅ Modelos AI limpiados correctamente")
+        if model_worker_pool.enabled:
+            await model_worker_pool.close()
+        else:
+            logger.info("🧹 Limpiando modelos AI de memoria...")
+            model_manager.cleanup_all()
+            logger.info("✅ Modelos AI limpiados correctamente")
     except Exception as e:
         logger.error(f"❌ Error limpiando modelos: {e}")
     
@@ -497,6 +508,15 @@ async def custom_http_exception_handler(request: Request, exc: HTTPException):
     logger.error(f"HTTP error: {exc.status_code} - {exc.detail}")
     return await http_exception_handler(request, exc)
 
+@app.exception_handler(ModelNotReady)
+async def model_not_ready_handler(request: Request, exc: ModelNotReady):
+    """Modelo aún cargándose: 503 con Retry-After en lugar de mantener la petición colgada"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "model": exc.model_name, "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)